@@ -0,0 +1,176 @@
+"""Memory held by discord.py's caches under each intents profile
+
+Run from the repository root:
+    python benchmarks/intents_memory.py [--members N] [--online N] [--voice N]
+                                        [--messages N] [--profile NAME ...]
+
+Builds a synthetic guild of --members members and feeds it to a client
+configured from Config.INTENT_PROFILES, the way the gateway would:
+GUILD_CREATE carries the bot, members in voice and (with the presences
+intent) --online online members, and profiles that chunk at startup
+then receive every member in 1000-member chunks. --messages
+MESSAGE_CREATE events from random members follow.
+
+Each profile runs in its own interpreter so RSS figures don't mix.
+Reports cached members, users and messages, Python memory still
+allocated afterwards (tracemalloc) and peak RSS.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from replay import BOT_ID, GUILD_BASE, USER_BASE, member_payload, message_payload, user_payload
+
+CHUNK_SIZE = 1000
+
+def guild_payload(members, voice_members, online_members, presences):
+    guild_id = GUILD_BASE
+    voice_channel = guild_id + 2
+    gateway_members = [member_payload(BOT_ID)]
+    gateway_members[0]["user"]["bot"] = True
+    gateway_members += [member_payload(user_id) for user_id in voice_members]
+    if presences:
+        gateway_members += [member_payload(user_id) for user_id in online_members]
+    return {
+        "id": str(guild_id),
+        "name": "Big Guild",
+        "owner_id": str(USER_BASE),
+        "roles": [{
+            "id": str(guild_id),
+            "name": "@everyone",
+            "permissions": "1071698660929",
+            "position": 0,
+            "color": 0,
+            "hoist": False,
+            "managed": False,
+            "mentionable": False,
+            "flags": 0,
+        }],
+        "channels": [
+            {"id": str(guild_id + 1), "type": 0, "name": "general", "position": 0,
+             "permission_overwrites": [], "nsfw": False, "parent_id": None},
+            {"id": str(voice_channel), "type": 2, "name": "Music", "position": 1,
+             "permission_overwrites": [], "nsfw": False, "parent_id": None,
+             "bitrate": 64000, "user_limit": 0},
+        ],
+        "voice_states": [{
+            "user_id": str(user_id),
+            "channel_id": str(voice_channel),
+            "session_id": "x",
+            "deaf": False, "mute": False, "self_deaf": False, "self_mute": False,
+            "self_video": False, "suppress": False, "request_to_speak_timestamp": None,
+        } for user_id in voice_members],
+        "members": gateway_members,
+        "presences": [{
+            "user": {"id": str(user_id)},
+            "status": "online",
+            "activities": [],
+            "client_status": {"desktop": "online"},
+        } for user_id in online_members] if presences else [],
+        "member_count": members,
+        "emojis": [],
+        "stickers": [],
+        "features": [],
+        "premium_tier": 0,
+        "large": True,
+    }
+
+async def load_guild(profile, args):
+    import discord
+    from discord.ext import commands
+    from utils.intents import client_options
+
+    options = client_options(profile)
+    bot = commands.Bot(command_prefix="x!", help_command=None, **options)
+    await bot._async_setup_hook()
+    state = bot._connection
+    state.user = discord.ClientUser(state=state, data=user_payload(BOT_ID, bot=True))
+
+    rng = random.Random(1234)
+    member_ids = [USER_BASE + i for i in range(args.members)]
+    voice_members = member_ids[:args.voice]
+    online_members = rng.sample(member_ids, args.online)
+
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+
+    state._add_guild_from_data(guild_payload(args.members, voice_members, online_members, options["intents"].presences))
+    guild = state._get_guild(GUILD_BASE)
+
+    # What the chunker does with GUILD_MEMBERS_CHUNK for a cached chunk request
+    if options["chunk_guilds_at_startup"]:
+        for start in range(0, args.members, CHUNK_SIZE):
+            for user_id in member_ids[start:start + CHUNK_SIZE]:
+                guild._add_member(discord.Member(data=member_payload(user_id), guild=guild, state=state))
+
+    for message_id in range(args.messages):
+        author_id = rng.choice(member_ids)
+        state.parse_message_create(message_payload(BOT_ID + 1 + message_id, 0, author_id, "hello everyone"))
+        if message_id % 100 == 0:
+            await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "profile": profile,
+        "seconds": elapsed,
+        "members": len(guild._members),
+        "users": len(state._users),
+        "messages": len(state._messages or ()),
+        "retained_mb": retained / 1024 / 1024,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+def run_profile(profile, args):
+    """Measure one profile in a fresh interpreter"""
+    command = [
+        sys.executable, os.path.abspath(__file__), "--child", profile,
+        "--members", str(args.members), "--online", str(args.online),
+        "--voice", str(args.voice), "--messages", str(args.messages),
+    ]
+    result = subprocess.run(command, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    from config import Config
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--members", type=int, default=100000)
+    parser.add_argument("--online", type=int, default=5000, help="online members sent with GUILD_CREATE (presences intent)")
+    parser.add_argument("--voice", type=int, default=50, help="members in a voice channel")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--profile", action="append", choices=list(Config.INTENT_PROFILES),
+                        help="profile to measure (default: all)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(load_guild(args.child, args))))
+        return
+
+    print(f"{args.members:,} members, {args.online:,} online, {args.voice} in voice, {args.messages:,} messages")
+    print(f"{'profile':<10}{'members':>10}{'users':>10}{'messages':>10}{'retained MB':>13}{'peak RSS MB':>13}{'load s':>9}")
+    for profile in args.profile or Config.INTENT_PROFILES:
+        result = run_profile(profile, args)
+        print(f"{result['profile']:<10}{result['members']:>10,}{result['users']:>10,}{result['messages']:>10,}"
+              f"{result['retained_mb']:>13.1f}{result['peak_rss_mb']:>13.1f}{result['seconds']:>9.2f}")
+
+if __name__ == "__main__":
+    main()
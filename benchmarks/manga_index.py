@@ -0,0 +1,126 @@
+"""Sync and lookup cost of the local manga title index
+
+Run from the repository root:
+    python benchmarks/manga_index.py [title_count]
+
+Builds a synthetic catalogue of MangaDex-shaped entities as a fixture
+file (no network), then times a full first sync, an incremental sync
+after 1% of titles changed and 0.5% were added, and the lookups the
+commands make: full-word search, fuzzy search for a typo and
+autocomplete. Everything lives in a temporary directory.
+"""
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.manga_index import FixtureSource, MangaIndex, MangaIndexSync
+
+SYLLABLES = (
+    "ka ki ku ke ko sa shi su se so ta chi tsu te to na ni nu ne no ha hi fu he ho ma mi mu me mo "
+    "ya yu yo ra ri ru re ro wa ga gi gu ge go ba bi bu be bo ryu kyo sho"
+).split()
+COMMON = ["no", "the", "of", "to", "a", "in", "wa"]
+START = datetime(2018, 1, 1, tzinfo=timezone.utc)
+
+def make_word(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+def make_manga(number, rng, updated):
+    words = [make_word(rng).title() for _ in range(rng.randint(1, 4))]
+    if len(words) > 1 and rng.random() < 0.5:
+        words.insert(rng.randint(1, len(words) - 1), rng.choice(COMMON))
+    title = " ".join(words)
+    return {
+        "id": f"00000000-0000-4000-8000-{number:012d}",
+        "type": "manga",
+        "attributes": {
+            "title": {"en": title},
+            "altTitles": [{"ja-ro": f"{title} no {make_word(rng)}"}, {"es": f"{title} {number}"}],
+            "description": {"en": "Synthetic entry"},
+            "contentRating": rng.choice(["safe", "safe", "suggestive", "erotica", "pornographic"]),
+            "status": "ongoing",
+            "updatedAt": updated.isoformat(timespec="seconds"),
+        },
+        "relationships": [],
+    }
+
+def write_fixture(path, mangas):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"data": mangas}, f)
+
+def summary(samples):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return f"p50 {statistics.median(samples) * 1000:6.2f} ms   p99 {p99 * 1000:6.2f} ms"
+
+async def run(count, directory):
+    rng = random.Random(42)
+    # Several titles per second of updatedAt, like bulk imports on MangaDex
+    mangas = [make_manga(number, rng, START + timedelta(seconds=number // 3)) for number in range(count)]
+    fixture = os.path.join(directory, "fixture.json")
+    write_fixture(fixture, mangas)
+
+    index = MangaIndex(os.path.join(directory, "index.db"), ["safe", "suggestive", "erotica"])
+    source = FixtureSource(fixture)
+    sync = MangaIndexSync(index, source, page_delay=0)
+
+    started = time.perf_counter()
+    fetched = await sync.sync_once()
+    full = time.perf_counter() - started
+    full_pages = sync.stats["pages"]
+    print(f"{count} titles")
+    print(f"  full sync:        {full:7.2f} s   {fetched} fetched in {full_pages} pages")
+
+    # 1% updated, 0.5% new
+    now = START + timedelta(days=3650)
+    for manga in rng.sample(mangas, count // 100):
+        manga["attributes"]["title"]["en"] += " Remastered"
+        manga["attributes"]["updatedAt"] = now.isoformat(timespec="seconds")
+    for number in range(count, count + count // 200):
+        mangas.append(make_manga(number, rng, now))
+    write_fixture(fixture, mangas)
+    source.reload()
+
+    started = time.perf_counter()
+    fetched = await sync.sync_once()
+    incremental = time.perf_counter() - started
+    print(f"  incremental sync: {incremental:7.2f} s   {fetched} fetched in {sync.stats['pages'] - full_pages} pages"
+          f" (a full resync would fetch {len(mangas)})")
+    print(f"  indexed:          {index.stats['titles']} titles, "
+          f"{os.path.getsize(os.path.join(directory, 'index.db')) / 1024 / 1024:.1f} MB on disk")
+
+    shown = [manga for manga in mangas if manga["attributes"]["contentRating"] in index.content_ratings]
+    titles = [manga["attributes"]["title"]["en"] for manga in rng.sample(shown, 200)]
+    searches, fuzzy, complete = [], [], []
+    for title in titles:
+        typo = title[:3] + title[4:]
+        started = time.perf_counter()
+        await index.search(title)
+        searches.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        await index.search(typo)
+        fuzzy.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        await index.autocomplete(title[:len(title) // 2])
+        complete.append(time.perf_counter() - started)
+
+    print(f"  search:           {summary(searches)}")
+    print(f"  fuzzy (typo):     {summary(fuzzy)}")
+    print(f"  autocomplete:     {summary(complete)}")
+    index.close()
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(count, directory))
+
+if __name__ == "__main__":
+    main()
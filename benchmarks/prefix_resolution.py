@@ -0,0 +1,112 @@
+"""Per-message cost of resolving the command prefix
+
+Run from the repository root:
+    python benchmarks/prefix_resolution.py [message_count]
+
+Compares the old path (awaiting the database twice per message and
+logging an INFO line each time) with PrefixResolver, and with the
+accepts() pre-filter that drops plain chat before resolving anything.
+The pre-filter's real saving is the Context that process_commands no
+longer builds for rejected messages, which is not included here.
+Logging goes to os.devnull so only formatting/handler overhead is
+measured. The database is a throwaway JSON store in a temporary
+directory.
+"""
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from database import Database
+from utils.prefixes import PrefixResolver
+
+GUILDS = 1000
+
+async def old_get_custom_prefix(db, message):
+    """The resolver before PrefixResolver (from main.py)"""
+    if not message.guild:
+        logging.info(f'Using DM prefix: x!')
+        return "x!"
+
+    prefix = await db.get_guild_prefix(message.guild.id)
+    final_prefix = prefix or "x!"
+    logging.info(f'Guild {message.guild.id} prefix: {final_prefix}')
+    return final_prefix
+
+async def old_path(db, messages):
+    for message in messages:
+        # Once from process_commands and once more for on_message's debug log
+        await old_get_custom_prefix(db, message)
+        await old_get_custom_prefix(db, message)
+
+async def db_path(db, messages):
+    for message in messages:
+        await db.get_guild_prefix(message.guild.id)
+
+async def resolver_path(resolver, messages):
+    for message in messages:
+        await resolver.resolve(message)
+
+async def filter_path(resolver, messages):
+    for message in messages:
+        if resolver.accepts(message):
+            await resolver.prefixes_for(message)
+
+async def timed(func, *args, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+async def main(count):
+    db = Database()
+    for guild_id in range(GUILDS):
+        await db.add_guild(10**17 + guild_id)
+        if guild_id % 3 == 0:
+            await db.set_guild_prefix(10**17 + guild_id, "?")
+
+    # Roughly one message in fifty is a command
+    messages = [
+        SimpleNamespace(
+            guild=SimpleNamespace(id=10**17 + i % GUILDS),
+            content="x!help" if i % 50 == 0 else "hello there"
+        )
+        for i in range(count)
+    ]
+
+    resolver = PrefixResolver(db)
+    resolver.set_user(10**18)
+    await resolver.load()
+
+    print(f"{count} messages across {GUILDS} guilds")
+    results = [
+        ("old (2x db + INFO log)", await timed(old_path, db, messages)),
+        ("db lookup only (1x)", await timed(db_path, db, messages)),
+        ("PrefixResolver", await timed(resolver_path, resolver, messages)),
+        ("accepts() pre-filter", await timed(filter_path, resolver, messages)),
+    ]
+    for label, elapsed in results:
+        print(f"  {label:<24} {elapsed * 1000:9.2f} ms  {elapsed / count * 1e9:8.0f} ns/message")
+    print(f"  resolver stats: {resolver.stats}")
+
+    await db.close()
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    logging.basicConfig(
+        level=logging.INFO,
+        handlers=[logging.StreamHandler(open(os.devnull, 'w'))]
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        Config.DATABASE_FILE = os.path.join(tmp, "data", "bot_database.json")
+        asyncio.run(main(count))
@@ -0,0 +1,63 @@
+"""Memory and lookup cost of guild settings: plain dicts vs GuildSettings records
+
+Run from the repository root:
+    python benchmarks/records_memory.py [guild_count]
+"""
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.records import GuildSettings
+
+def build_dicts(count):
+    return {
+        str(guild_id): {
+            "prefix": "x!",
+            "log_channel": None,
+            "created_at": "2025-06-10T04:23:40.783650"
+        }
+        for guild_id in range(10**17, 10**17 + count)
+    }
+
+def build_records(count):
+    return {
+        str(guild_id): GuildSettings("x!", None, "2025-06-10T04:23:40.783650")
+        for guild_id in range(10**17, 10**17 + count)
+    }
+
+def measure(builder, count):
+    tracemalloc.start()
+    data = builder(count)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return data, size
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    key = str(10**17 + count // 2)
+
+    dicts, dict_bytes = measure(build_dicts, count)
+    records, record_bytes = measure(build_records, count)
+
+    # The old lookup chain vs the record attribute access used by get_guild_prefix
+    def dict_prefix():
+        return dicts.get(key, {}).get("prefix", "x!")
+
+    def record_prefix():
+        guild = records.get(key)
+        return guild.prefix if guild is not None else "x!"
+
+    dict_lookup = min(timeit.repeat(dict_prefix, number=200_000, repeat=5))
+    record_lookup = min(timeit.repeat(record_prefix, number=200_000, repeat=5))
+
+    print(f"{count} guilds")
+    print(f"  dict settings:   {dict_bytes / 1024 / 1024:7.2f} MB  ({dict_bytes / count:6.1f} B/guild)")
+    print(f"  GuildSettings:   {record_bytes / 1024 / 1024:7.2f} MB  ({record_bytes / count:6.1f} B/guild)")
+    print(f"  prefix lookup (dict):   {dict_lookup / 200_000 * 1e9:6.1f} ns")
+    print(f"  prefix lookup (record): {record_lookup / 200_000 * 1e9:6.1f} ns")
+
+if __name__ == "__main__":
+    main()
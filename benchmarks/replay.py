@@ -0,0 +1,349 @@
+"""Offline end-to-end replay of message traffic through DiscordBot
+
+Run from the repository root:
+    python benchmarks/replay.py [--messages N] [--guilds N] [--command-ratio R]
+                                [--http-latency MS] [--backend NAME] [--input FILE]
+
+Builds a real DiscordBot (cogs, database, prefix resolver, metrics)
+without logging in. Discord's REST API is answered by FakeHTTP and the
+gateway by FakeGateway, and each message is pushed through
+ConnectionState.parse_message_create exactly as a MESSAGE_CREATE event
+would be. MangaDex and YouTube are not part of the default mix since
+they need the network.
+
+Messages are synthetic (commands mixed with chatter across --guilds
+guilds) unless --input names a JSON lines file of
+{"guild_id": ..., "channel_id": ..., "author_id": ..., "content": ...}
+records; ids in such a file are mapped onto the synthetic guilds.
+
+Reports messages/sec, per-command latency percentiles, REST calls,
+database flushes and peak RSS. Everything (database, bot.log) lives in
+a temporary directory.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+GUILD_BASE = 10**17
+USER_BASE = 10**16
+MEMBERS_PER_GUILD = 20
+BOT_ID = 10**18
+
+# (content template, issued by the guild owner)
+COMMANDS = [
+    ("{prefix}help", False),
+    ("{prefix}ping", False),
+    ("{prefix}userinfo", False),
+    ("{prefix}serverinfo", False),
+    ("{prefix}avatar <@{target}>", False),
+    ("{prefix}warn <@{target}> spamming", True),
+    ("{prefix}warnings <@{target}>", True),
+    ("{prefix}settings", True),
+]
+
+CHATTER = [
+    "hello everyone",
+    "lol",
+    "has anyone read the new chapter?",
+    "brb",
+    "x! is the prefix right?",
+    "<@123> look at this",
+    "!play something",
+    "gg",
+]
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+def user_payload(user_id, bot=False):
+    return {
+        "id": str(user_id),
+        "username": f"user{user_id % 100000}",
+        "discriminator": "0",
+        "global_name": None,
+        "avatar": None,
+        "bot": bot,
+    }
+
+def member_payload(user_id):
+    return {
+        "user": user_payload(user_id),
+        "roles": [],
+        "joined_at": now_iso(),
+        "deaf": False,
+        "mute": False,
+        "flags": 0,
+    }
+
+def guild_payload(index):
+    guild_id = GUILD_BASE + index * 1000
+    owner_id = USER_BASE + index * MEMBERS_PER_GUILD
+    return {
+        "id": str(guild_id),
+        "name": f"Guild {index}",
+        "owner_id": str(owner_id),
+        "roles": [{
+            "id": str(guild_id),
+            "name": "@everyone",
+            "permissions": "1071698660929",
+            "position": 0,
+            "color": 0,
+            "hoist": False,
+            "managed": False,
+            "mentionable": False,
+            "flags": 0,
+        }],
+        "channels": [{
+            "id": str(guild_id + 1),
+            "type": 0,
+            "name": "general",
+            "position": 0,
+            "permission_overwrites": [],
+            "nsfw": False,
+            "parent_id": None,
+        }],
+        "members": [member_payload(owner_id + i) for i in range(MEMBERS_PER_GUILD)],
+        "member_count": MEMBERS_PER_GUILD,
+        "emojis": [],
+        "stickers": [],
+        "features": [],
+        "premium_tier": 0,
+        "large": False,
+    }
+
+class FakeGateway:
+    """Stands in for DiscordWebSocket: fixed heartbeat latency, never open"""
+
+    latency = 0.042
+    open = False
+
+    def is_ratelimited(self):
+        # Member lookups that miss the cache go through REST instead
+        return True
+
+class FakeHTTP:
+    """Answers the REST routes the cogs use with plausible payloads
+
+    Installed over HTTPClient.request, so everything above it (Messageable.send,
+    typing, DMs, message edits) runs unchanged.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.ids = itertools.count(int(time.time() * 1000 - 1420070400000) << 22)
+        self.dm_channels = {}
+
+    def message(self, channel_id, payload, message_id=None):
+        payload = payload or {}
+        message = {
+            "id": str(message_id or next(self.ids)),
+            "channel_id": str(channel_id),
+            "author": user_payload(BOT_ID, bot=True),
+            "content": payload.get("content") or "",
+            "timestamp": now_iso(),
+            "edited_timestamp": None,
+            "tts": False,
+            "mention_everyone": False,
+            "mentions": [],
+            "mention_roles": [],
+            "attachments": [],
+            "embeds": payload.get("embeds") or [],
+            "pinned": False,
+            "type": 0,
+        }
+        if int(channel_id) not in self.dm_channels:
+            message["guild_id"] = str(int(channel_id) - 1)
+        return message
+
+    async def request(self, route, *, files=None, form=None, **kwargs):
+        key = f"{route.method} {route.path}"
+        self.calls[key] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        payload = kwargs.get("json")
+        if route.path == "/channels/{channel_id}/messages" and route.method == "POST":
+            return self.message(route.channel_id, payload)
+        if route.path == "/channels/{channel_id}/messages/{message_id}" and route.method == "PATCH":
+            return self.message(route.channel_id, payload, route.url.rsplit("/", 1)[-1])
+        if route.path == "/guilds/{guild_id}/members/{member_id}" and route.method == "GET":
+            return member_payload(int(route.url.rsplit("/", 1)[-1]))
+        if route.path == "/users/@me/channels":
+            channel_id = next(self.ids)
+            self.dm_channels[channel_id] = payload["recipient_id"]
+            return {"id": str(channel_id), "type": 1, "recipients": [user_payload(payload["recipient_id"])]}
+        return None
+
+class TrafficGenerator:
+    """Synthetic mix of commands and chatter spread over the guilds"""
+
+    def __init__(self, guilds, command_ratio, seed=1234):
+        self.guilds = guilds
+        self.command_ratio = command_ratio
+        self.random = random.Random(seed)
+
+    def __iter__(self):
+        while True:
+            index = self.random.randrange(self.guilds)
+            owner_id = USER_BASE + index * MEMBERS_PER_GUILD
+            author_id = owner_id + self.random.randrange(MEMBERS_PER_GUILD)
+            if self.random.random() < self.command_ratio:
+                template, by_owner = self.random.choice(COMMANDS)
+                if by_owner:
+                    author_id = owner_id
+                target = owner_id + self.random.randrange(1, MEMBERS_PER_GUILD)
+                content = template.format(prefix="x!", target=target)
+            else:
+                content = self.random.choice(CHATTER)
+            yield index, author_id, content
+
+def recorded_traffic(path, guilds):
+    """Replay a JSON lines capture, mapping its ids onto the synthetic guilds"""
+    guild_map = {}
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    for record in itertools.cycle(records):
+        index = guild_map.setdefault(record["guild_id"], len(guild_map) % guilds)
+        owner_id = USER_BASE + index * MEMBERS_PER_GUILD
+        author_id = owner_id + int(record["author_id"]) % MEMBERS_PER_GUILD
+        yield index, author_id, record["content"]
+
+def message_payload(message_id, index, author_id, content):
+    guild_id = GUILD_BASE + index * 1000
+    member = member_payload(author_id)
+    del member["user"]
+    return {
+        "id": str(message_id),
+        "channel_id": str(guild_id + 1),
+        "guild_id": str(guild_id),
+        "author": user_payload(author_id),
+        "member": member,
+        "content": content,
+        "timestamp": now_iso(),
+        "edited_timestamp": None,
+        "tts": False,
+        "mention_everyone": False,
+        "mentions": [],
+        "mention_roles": [],
+        "attachments": [],
+        "embeds": [],
+        "pinned": False,
+        "type": 0,
+    }
+
+async def build_bot(guilds, http_latency):
+    import discord
+    from main import DiscordBot
+
+    bot = DiscordBot()
+    await bot._async_setup_hook()
+
+    fake_http = FakeHTTP(http_latency)
+    bot.http.request = fake_http.request
+    bot.ws = FakeGateway()
+
+    state = bot._connection
+    state.user = discord.ClientUser(state=state, data=user_payload(BOT_ID, bot=True))
+    for index in range(guilds):
+        state._add_guild_from_data(guild_payload(index))
+
+    await bot.setup_hook()
+    await bot.prefixes.load()
+    bot._ready.set()
+    return bot, fake_http
+
+async def drain():
+    """Wait until every event handler task the bot spawned has finished"""
+    current = asyncio.current_task()
+    while True:
+        pending = [
+            task for task in asyncio.all_tasks()
+            if task is not current and task.get_name().startswith("discord.py")
+        ]
+        if not pending:
+            return
+        await asyncio.gather(*pending, return_exceptions=True)
+
+async def replay(args):
+    bot, fake_http = await build_bot(args.guilds, args.http_latency / 1000)
+    state = bot._connection
+
+    traffic = recorded_traffic(args.input, args.guilds) if args.input else iter(TrafficGenerator(args.guilds, args.command_ratio))
+    payloads = [
+        message_payload(next(fake_http.ids), index, author_id, content)
+        for index, author_id, content in itertools.islice(traffic, args.messages)
+    ]
+
+    started = time.perf_counter()
+    for i, payload in enumerate(payloads, 1):
+        state.parse_message_create(payload)
+        # Let handlers run, like messages trickling in from the gateway
+        if i % args.batch == 0:
+            await asyncio.sleep(0)
+    await drain()
+    elapsed = time.perf_counter() - started
+
+    await bot.db.flush()
+    report(args, bot, fake_http, elapsed)
+    await bot.close()
+
+def report(args, bot, fake_http, elapsed):
+    dump = bot.metrics.to_dict()
+    calls = sum(stats["calls"] for stats in dump["commands"].values())
+    errors = sum(stats["errors"] for stats in dump["commands"].values())
+
+    print(f"{args.messages} messages across {args.guilds} guilds in {elapsed:.2f}s "
+          f"({args.messages / elapsed:,.0f} messages/sec)")
+    print(f"pre-filter: {bot.prefixes.stats}")
+    print(f"commands: {calls} run, {errors} failed (cooldowns and bad input are not failures)")
+    print(f"  {'command':<12}{'calls':>7}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'db p95':>9}")
+    for name, stats in dump["commands"].items():
+        wall = stats["wall"]
+        print(f"  {name:<12}{stats['calls']:>7}{stats['errors']:>8}"
+              f"{wall['p50'] * 1000:>9.2f}{wall['p95'] * 1000:>9.2f}{wall['p99'] * 1000:>9.2f}"
+              f"{stats['db']['p95'] * 1000:>9.2f}")
+    print("REST calls:")
+    for route, count in fake_http.calls.most_common():
+        print(f"  {route:<48}{count:>8}")
+    print(f"database ({args.backend}): {bot.db.stats}")
+    # ru_maxrss is in kilobytes on Linux
+    print(f"peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--guilds", type=int, default=2000)
+    parser.add_argument("--command-ratio", type=float, default=0.05)
+    parser.add_argument("--http-latency", type=float, default=0.0, help="simulated REST latency in ms")
+    parser.add_argument("--backend", default="json", help="DATABASE_BACKEND to use")
+    parser.add_argument("--batch", type=int, default=50, help="messages delivered between loop iterations")
+    parser.add_argument("--input", help="JSON lines capture to replay instead of synthetic traffic")
+    args = parser.parse_args()
+    if args.input:
+        args.input = os.path.abspath(args.input)
+
+    # Everything the bot writes goes to a scratch directory; settings
+    # are read from the environment when config is first imported
+    os.environ["DATABASE_BACKEND"] = args.backend
+    os.environ["STATUS_PORT"] = "0"
+    os.environ["WATCHDOG_ENABLED"] = "false"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        asyncio.run(replay(args))
+
+if __name__ == "__main__":
+    main()
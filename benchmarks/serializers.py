@@ -0,0 +1,83 @@
+"""Flush (serialize) and start-up (decode + rebuild) cost of the database formats
+
+Run from the repository root:
+    python benchmarks/serializers.py [record_count ...]
+
+Each size N means N guilds plus N warnings. Formats whose optional
+dependency (orjson, msgpack) is not installed are skipped.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import serializers
+from utils.records import GuildSettings, WarningEntry
+from utils.warnings_index import WarningsIndex
+
+def build_snapshot(count):
+    """A snapshot shaped like Database.snapshot_data()"""
+    guilds = {
+        str(10**17 + i): GuildSettings("x!", None, "2025-06-10T04:23:40.783650")
+        for i in range(count)
+    }
+    warnings = WarningsIndex()
+    for i in range(count):
+        guild_id = str(10**17 + i % max(count // 10, 1))
+        user_id = str(10**18 + i % 997)
+        warnings.add(guild_id, user_id, WarningEntry(10**18 + 1, f"Spam in #general ({i})", 1.7e9 + i))
+
+    return {
+        "guilds": guilds,
+        "users": {},
+        "warnings": warnings.to_dict(),
+        "music_queues": {}
+    }
+
+def load(payload):
+    """Decode a file and rebuild the in-memory records, like Database.__init__"""
+    data = serializers.loads(payload)
+    guilds = {guild_id: GuildSettings.from_dict(guild) for guild_id, guild in data["guilds"].items()}
+    warnings = WarningsIndex.from_dict(data["warnings"])
+    return guilds, warnings
+
+def timed(func, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def formats():
+    """(label, serializer, use orjson) for every format available here"""
+    yield "json (indent=2)", serializers.JSONSerializer(), False
+    yield "compact (json)", serializers.CompactJSONSerializer(), False
+    if serializers.orjson is not None:
+        yield "compact (orjson)", serializers.CompactJSONSerializer(), True
+    if serializers.msgpack is not None:
+        yield "msgpack", serializers.MsgpackSerializer(), True
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000]
+    orjson = serializers.orjson
+
+    for count in sizes:
+        snapshot = build_snapshot(count)
+        print(f"{count} guilds + {count} warnings")
+        print(f"  {'format':<18} {'size':>10} {'flush':>10} {'start-up':>10}")
+
+        for label, serializer, use_orjson in formats():
+            serializers.orjson = orjson if use_orjson else None
+            try:
+                payload, flush = timed(serializer.dumps, snapshot)
+                _, startup = timed(load, payload)
+            finally:
+                serializers.orjson = orjson
+            print(f"  {label:<18} {len(payload) / 1024:8.0f}KB {flush * 1000:8.1f}ms {startup * 1000:8.1f}ms")
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Scrape the status server's /healthz and /metrics on localhost
+
+Run from the repository root:
+    python benchmarks/status_server.py [scrape_count]
+
+Starts StatusServer on a free local port in front of a stand-in bot
+(no Discord connection) with a journal database in a temporary
+directory and a few recorded commands, then checks the /metrics
+exposition: every sample belongs to a declared family, counters are
+named *_total and values parse as numbers. Prints any problems (exit
+status 1) and the time a scrape takes.
+"""
+import asyncio
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from database import Database
+from utils.metrics import CommandMetrics, LoopLagMonitor
+from utils.status_server import StatusServer
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})? (\S+)$')
+
+def make_bot(db):
+    metrics = CommandMetrics()
+    for name in ("help", "warn", "manga"):
+        timing = metrics.start()
+        metrics.finish(name, timing)
+    metrics.record_error("manga")
+
+    return SimpleNamespace(
+        latency=0.042,
+        guilds=[object()] * 3,
+        voice_clients=[],
+        db=db,
+        metrics=metrics,
+        loop_lag=LoopLagMonitor(),
+        is_ready=lambda: True,
+        is_closed=lambda: False,
+        get_cog=lambda name: None,
+    )
+
+def check_exposition(text):
+    """Problems found in a Prometheus text exposition"""
+    problems = []
+    kinds = {}
+    family = None
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            family, kind = line[len("# TYPE "):].split(" ", 1)
+            kinds[family] = kind
+            if kind == "counter" and not family.endswith("_total"):
+                problems.append(f"counter {family} is not named *_total")
+            continue
+        if not line or line.startswith("#"):
+            continue
+
+        match = SAMPLE.match(line)
+        if match is None:
+            problems.append(f"unparseable sample: {line}")
+            continue
+        name, _, value = match.groups()
+        allowed = {family}
+        if kinds.get(family) == "summary":
+            allowed |= {f"{family}_sum", f"{family}_count"}
+        if name not in allowed:
+            problems.append(f"sample {name} outside its family ({family})")
+        try:
+            float(value)
+        except ValueError:
+            problems.append(f"{name} has a non-numeric value {value}")
+    return problems, kinds
+
+async def run(count):
+    db = Database(journal=True)
+    for guild_id in range(20):
+        await db.set_guild_prefix(guild_id, "?")
+        await db.add_warning(guild_id, 1, 2, "spam")
+    await db.flush()
+
+    server = StatusServer(make_bot(db), port=0)
+    await server.start()
+    port = server.runner.addresses[0][1]
+    base = f"http://127.0.0.1:{port}"
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{base}/healthz") as response:
+            print(f"/healthz: {response.status} {await response.json()}")
+
+        timings = []
+        for _ in range(count):
+            started = time.perf_counter()
+            async with session.get(f"{base}/metrics") as response:
+                status = response.status
+                text = await response.text()
+            timings.append(time.perf_counter() - started)
+
+    await server.stop()
+    await db.close()
+
+    problems, kinds = check_exposition(text)
+    if status != 200:
+        problems.append(f"/metrics returned {status}")
+    print(f"/metrics: {status}, {len(kinds)} families "
+          f"({sum(kind == 'counter' for kind in kinds.values())} counters), {len(text)} bytes")
+    for name in sorted(kinds):
+        if name.startswith("bot_db_"):
+            print(f"  {name:32} {kinds[name]}")
+    print(f"scrape: p50 {statistics.median(timings) * 1000:.2f} ms over {count} requests")
+    for problem in problems:
+        print(f"PROBLEM: {problem}")
+    return not problems
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        Config.DATABASE_FILE = os.path.join(tmp, "data", "bot_database.json")
+        Config.DATABASE_JOURNAL_FILE = os.path.join(tmp, "data", "bot_database.journal")
+        ok = asyncio.run(run(count))
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import discord
 from discord.ext import commands
+import io
+import json
 
 class Admin(commands.Cog):
     """Admin commands for server configuration"""
@@ -9,7 +11,7 @@ class Admin(commands.Cog):
     
     def has_admin_permissions(ctx):
         """Check if user has admin permissions"""
-        return ctx.author.guild_permissions.administrator or ctx.author == ctx.guild.owner
+        return ctx.author.guild_permissions.administrator or ctx.author.id == ctx.guild.owner_id
     
     @commands.command(name='setprefix')
     @commands.guild_only()
@@ -49,6 +51,7 @@ class Admin(commands.Cog):
         
         # Set new prefix
         await self.bot.db.set_guild_prefix(ctx.guild.id, new_prefix)
+        self.bot.prefixes.set(ctx.guild.id, new_prefix)
         
         embed = discord.Embed(
             title="✅ Prefix Updated",
@@ -79,7 +82,7 @@ class Admin(commands.Cog):
                 )
                 embed.add_field(
                     name="Usage",
-                    value=f"`{await self.bot.get_prefix(ctx.message)}setlogchannel #channel`",
+                    value=f"`{await self.bot.prefixes.resolve(ctx.message)}setlogchannel #channel`",
                     inline=False
                 )
                 return await ctx.send(embed=embed)
@@ -195,5 +198,92 @@ class Admin(commands.Cog):
         
         await ctx.send(embed=embed)
 
+    @commands.command(name='perf')
+    @commands.is_owner()
+    async def show_perf(self, ctx, output=None):
+        """Show per-command latency (add `json` for a machine-readable dump, `local` for this cluster only)"""
+        cluster = self.bot.cluster
+        if cluster and output != "local":
+            dump = cluster.merged_metrics().to_dict()
+            scope = f"All {len(cluster.clusters) or 1} clusters"
+        else:
+            dump = self.bot.metrics.to_dict()
+            scope = f"Cluster {cluster.cluster_id}" if cluster else None
+        
+        if output == "json":
+            payload = json.dumps(dump, indent=2).encode('utf-8')
+            return await ctx.send(file=discord.File(io.BytesIO(payload), filename="perf.json"))
+        
+        if not dump["commands"]:
+            embed = discord.Embed(
+                title="📊 Command Performance",
+                description="No commands have run yet.",
+                color=discord.Color.orange()
+            )
+            return await ctx.send(embed=embed)
+        
+        # Slowest (by p95) first
+        rows = sorted(dump["commands"].items(), key=lambda item: item[1]["wall"]["p95"], reverse=True)
+        lines = [f"{'command':<14}{'calls':>6}{'err':>5}{'p50':>8}{'p95':>8}{'p99':>8}{'db95':>8}{'http95':>8}"]
+        for name, stats in rows[:15]:
+            wall = stats["wall"]
+            lines.append(
+                f"{name[:14]:<14}{stats['calls']:>6}{stats['errors']:>5}"
+                f"{wall['p50'] * 1000:>8.0f}{wall['p95'] * 1000:>8.0f}{wall['p99'] * 1000:>8.0f}"
+                f"{stats['db']['p95'] * 1000:>8.0f}{stats['http']['p95'] * 1000:>8.0f}"
+            )
+        
+        embed = discord.Embed(
+            title="📊 Command Performance",
+            description="```\n" + "\n".join(lines) + "\n```",
+            color=discord.Color.blue()
+        )
+        footer = "Times in ms. Use perf json for the full dump."
+        embed.set_footer(text=f"{scope}. {footer}" if scope else footer)
+        
+        await ctx.send(embed=embed)
+
+    @commands.command(name='watchdog')
+    @commands.is_owner()
+    async def watchdog(self, ctx, setting=None):
+        """Turn the event loop watchdog on/off or set its threshold in seconds"""
+        watchdog = self.bot.watchdog
+        
+        if setting == "on":
+            watchdog.start()
+        elif setting == "off":
+            watchdog.stop()
+        elif setting is not None:
+            try:
+                threshold = float(setting)
+            except ValueError:
+                threshold = 0
+            if threshold <= 0:
+                embed = discord.Embed(
+                    title="❌ Invalid Setting",
+                    description="Use `on`, `off` or a threshold in seconds.",
+                    color=discord.Color.red()
+                )
+                return await ctx.send(embed=embed)
+            watchdog.threshold = threshold
+        
+        embed = discord.Embed(
+            title="🐶 Event Loop Watchdog",
+            color=discord.Color.green() if watchdog.enabled else discord.Color.orange()
+        )
+        embed.add_field(name="Status", value="On" if watchdog.enabled else "Off", inline=True)
+        embed.add_field(name="Threshold", value=f"{watchdog.threshold:g}s", inline=True)
+        embed.add_field(name="Stalls", value=str(watchdog.stalls), inline=True)
+        
+        if watchdog.recent:
+            lines = []
+            for stall in list(watchdog.recent)[-5:]:
+                duration = f"{stall['duration']:.2f}s" if stall["duration"] is not None else "ongoing"
+                command = (stall["context"] or {}).get("command", stall["task"])
+                lines.append(f"{duration} at {stall['location']} ({command})")
+            embed.add_field(name="Recent Stalls", value="```\n" + "\n".join(lines)[-1000:] + "\n```", inline=False)
+        
+        await ctx.send(embed=embed)
+
 async def setup(bot):
     await bot.add_cog(Admin(bot))
@@ -1,55 +1,177 @@
 import discord
 from discord.ext import commands
-import aiohttp
 import asyncio
+import logging
+import re
+import sqlite3
+from config import Config
+from utils.cache import SWRCache
+from utils.manga_index import APISource, FixtureSource, MangaIndex, MangaIndexSync
+from utils.mangadex import MangaDexClient, MangaDexError, MangaDexUnavailable, RandomMangaPool
+from utils.metrics import http_trace_config
+
+def normalize_query(query):
+    """Cache key for a search: ignores case and extra whitespace"""
+    return " ".join(query.casefold().split())
+
+# A MangaDex id, alone or in a title URL (mangadex.org/title/<id>/...)
+MANGA_ID_PATTERN = re.compile(
+    r'^(?:<?https?://(?:www\.)?mangadex\.org/title/)?'
+    r'([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})\b\S*$',
+    re.IGNORECASE
+)
+
+def parse_manga_id(query):
+    """MangaDex id in query (a bare id or a title URL), or None"""
+    match = MANGA_ID_PATTERN.match(query.strip())
+    return match.group(1).lower() if match else None
 
 class Manga(commands.Cog):
     """Manga lookup commands"""
     
     def __init__(self, bot):
         self.bot = bot
-        self.session = aiohttp.ClientSession()
+        self.api = MangaDexClient(
+            Config.MANGADEX_API,
+            rate=Config.MANGADEX_RATE_LIMIT / max(1, Config.CLUSTER_COUNT),
+            timeout=Config.MANGADEX_TIMEOUT,
+            connections=Config.MANGADEX_MAX_CONNECTIONS,
+            max_retries=Config.MANGADEX_MAX_RETRIES,
+            breaker_threshold=Config.MANGADEX_BREAKER_THRESHOLD,
+            breaker_reset=Config.MANGADEX_BREAKER_RESET,
+            user_agent=f"{Config.BOT_NAME}/{Config.BOT_VERSION}",
+            trace_configs=[http_trace_config(bot.metrics.http_stats("mangadex"))]
+        )
+        self.search_cache = SWRCache(
+            max_entries=Config.MANGA_CACHE_ENTRIES,
+            max_bytes=Config.MANGA_CACHE_MAX_BYTES,
+            ttl=Config.MANGA_CACHE_TTL,
+            stale_ttl=Config.MANGA_CACHE_STALE_TTL,
+            negative_ttl=Config.MANGA_CACHE_NEGATIVE_TTL,
+            name="manga search"
+        )
+        self.random_pool = RandomMangaPool(
+            self.api,
+            low=Config.MANGA_RANDOM_POOL_LOW,
+            high=Config.MANGA_RANDOM_POOL_HIGH,
+            content_ratings=Config.MANGA_CONTENT_RATINGS
+        )
+        # Local title index (see cog_load); details still come from MangaDex,
+        # or from the fixture in offline mode
+        self.index = None
+        self.index_sync = None
+        self.details = self.api
+    
+    async def cog_load(self):
+        """Prefetch random manga; open the local title index and start syncing it, if enabled"""
+        self.random_pool.start()
+        if not Config.MANGA_INDEX_ENABLED:
+            return
+        try:
+            self.index = MangaIndex(Config.MANGA_INDEX_FILE, Config.MANGA_CONTENT_RATINGS)
+        except sqlite3.OperationalError as e:
+            logging.error(f'Manga index disabled, SQLite has no FTS5 support: {e}')
+            return
+        
+        if Config.MANGA_INDEX_FIXTURE:
+            source = self.details = FixtureSource(Config.MANGA_INDEX_FIXTURE)
+        else:
+            source = APISource(self.api, Config.MANGA_CONTENT_RATINGS)
+        
+        # Clusters share the index file; the first one keeps it up to date
+        if Config.CLUSTER_ID == 0:
+            self.index_sync = MangaIndexSync(
+                self.index,
+                source,
+                page_delay=0 if Config.MANGA_INDEX_FIXTURE else Config.MANGA_INDEX_PAGE_DELAY,
+                interval=Config.MANGA_INDEX_SYNC_INTERVAL
+            )
+            self.index_sync.start()
+        logging.info(f'Manga index: {self.index.stats["titles"]} titles in {Config.MANGA_INDEX_FILE}')
     
     def cog_unload(self):
         """Clean up session when cog is unloaded"""
-        asyncio.create_task(self.session.close())
+        self.search_cache.close()
+        self.random_pool.stop()
+        if self.index_sync is not None:
+            self.index_sync.stop()
+        if self.index is not None:
+            self.index.close()
+        asyncio.create_task(self.api.close())
+    
+    async def fetch_search(self, query):
+        """First MangaDex search result for query, or None if nothing matched"""
+        results = await self.api.search(query, limit=1)
+        return results[0] if results else None
+    
+    async def fetch_manga(self, manga_id):
+        """MangaDex entry with this id, or None if there is none"""
+        return await self.details.manga(manga_id)
+    
+    async def search(self, query):
+        """Search for a manga, answering repeated queries from the cache
+        
+        With the local index enabled, titles are matched locally and
+        only the details are fetched. MangaDex's search is the fallback
+        for titles the index doesn't have (yet). Concurrent identical
+        searches share one request.
+        """
+        if self.index is not None:
+            hits = await self.index.search(query, limit=1)
+            if hits:
+                manga = await self.get_manga(hits[0].manga_id)
+                if manga is not None:
+                    return manga
+                # Gone from MangaDex since it was indexed
+                await self.index.remove(hits[0].manga_id)
+            if self.details is not self.api:
+                # Offline (fixture) mode
+                return None
+        
+        key = normalize_query(query)
+        return await self.search_cache.get_or_fetch(("title", key), lambda: self.fetch_search(key))
+    
+    async def get_manga(self, manga_id):
+        """Look up a manga by id, through the same cache as searches"""
+        return await self.search_cache.get_or_fetch(("id", manga_id), lambda: self.fetch_manga(manga_id))
     
     @commands.command(name='manga')
     @commands.cooldown(1, 5, commands.BucketType.user)
     async def manga_search(self, ctx, *, query):
-        """Search for manga information"""
+        """Search for manga information (by title, MangaDex id or link)"""
         async with ctx.typing():
             try:
-                # Search MangaDex for manga
-                search_url = "https://api.mangadex.org/manga"
-                params = {
-                    'title': query,
-                    'limit': 1,
-                    'includes[]': ['cover_art', 'author', 'artist']
-                }
+                manga_id = parse_manga_id(query)
+                if manga_id is not None:
+                    manga = await self.get_manga(manga_id)
+                else:
+                    # Search MangaDex for manga
+                    manga = await self.search(query)
+                
+                if manga is None:
+                    embed = discord.Embed(
+                        title="❌ No Results",
+                        description=f"No manga found for '{query}'.",
+                        color=discord.Color.red()
+                    )
+                    return await ctx.send(embed=embed)
                 
-                async with self.session.get(search_url, params=params) as response:
-                    if response.status != 200:
-                        embed = discord.Embed(
-                            title="❌ API Error",
-                            description="Could not connect to MangaDex API.",
-                            color=discord.Color.red()
-                        )
-                        return await ctx.send(embed=embed)
-                    
-                    data = await response.json()
-                    
-                    if not data.get('data'):
-                        embed = discord.Embed(
-                            title="❌ No Results",
-                            description=f"No manga found for '{query}'.",
-                            color=discord.Color.red()
-                        )
-                        return await ctx.send(embed=embed)
-                    
-                    manga = data['data'][0]
-                    await self.send_manga_info(ctx, manga)
-                    
+                await self.send_manga_info(ctx, manga)
+                
+            except MangaDexUnavailable:
+                embed = discord.Embed(
+                    title="❌ MangaDex Unavailable",
+                    description="MangaDex isn't responding right now. Please try again in a minute.",
+                    color=discord.Color.red()
+                )
+                await ctx.send(embed=embed)
+            except MangaDexError:
+                embed = discord.Embed(
+                    title="❌ API Error",
+                    description="Could not connect to MangaDex API.",
+                    color=discord.Color.red()
+                )
+                await ctx.send(embed=embed)
             except asyncio.TimeoutError:
                 embed = discord.Embed(
                     title="❌ Timeout",
@@ -65,6 +187,41 @@ class Manga(commands.Cog):
                 )
                 await ctx.send(embed=embed)
     
+    @commands.command(name='mangasuggest', aliases=['ms'])
+    @commands.cooldown(1, 2, commands.BucketType.user)
+    async def manga_suggest(self, ctx, *, partial):
+        """Suggest manga titles starting with what you typed"""
+        if self.index is None:
+            embed = discord.Embed(
+                title="❌ Suggestions Unavailable",
+                description="The local manga title index is not enabled.",
+                color=discord.Color.red()
+            )
+            return await ctx.send(embed=embed)
+        
+        hits = await self.index.autocomplete(partial, limit=10)
+        if not hits:
+            hits = await self.index.search(partial, limit=10)
+        if not hits:
+            embed = discord.Embed(
+                title="❌ No Results",
+                description=f"No manga titles match '{partial}'.",
+                color=discord.Color.red()
+            )
+            return await ctx.send(embed=embed)
+        
+        lines = [
+            f"{number}. [{hit.title}](https://mangadex.org/title/{hit.manga_id})"
+            for number, hit in enumerate(hits, 1)
+        ]
+        embed = discord.Embed(
+            title=f"📚 Titles matching '{partial}'",
+            description="\n".join(lines),
+            color=discord.Color.blue()
+        )
+        embed.set_footer(text=f"Use {ctx.prefix}manga <title or link> for details")
+        await ctx.send(embed=embed)
+    
     async def send_manga_info(self, ctx, manga_data):
         """Send formatted manga information"""
         try:
@@ -158,39 +315,31 @@ class Manga(commands.Cog):
             await ctx.send(embed=embed)
     
     @commands.command(name='randommanga')
-    @commands.cooldown(1, 10, commands.BucketType.user)
+    @commands.cooldown(1, 3, commands.BucketType.user)
     async def random_manga(self, ctx):
         """Get a random manga recommendation"""
         async with ctx.typing():
             try:
-                # Get random manga from MangaDex
-                search_url = "https://api.mangadex.org/manga/random"
-                params = {
-                    'includes[]': ['cover_art', 'author', 'artist']
-                }
+                # Prefetched, so this only waits if the pool ran dry
+                manga = await self.random_pool.get()
+                
+                if not manga:
+                    embed = discord.Embed(
+                        title="❌ No Results",
+                        description="Could not get random manga.",
+                        color=discord.Color.red()
+                    )
+                    return await ctx.send(embed=embed)
+                
+                await self.send_manga_info(ctx, manga)
                 
-                async with self.session.get(search_url, params=params) as response:
-                    if response.status != 200:
-                        embed = discord.Embed(
-                            title="❌ API Error",
-                            description="Could not connect to MangaDex API.",
-                            color=discord.Color.red()
-                        )
-                        return await ctx.send(embed=embed)
-                    
-                    data = await response.json()
-                    manga = data.get('data')
-                    
-                    if not manga:
-                        embed = discord.Embed(
-                            title="❌ No Results",
-                            description="Could not get random manga.",
-                            color=discord.Color.red()
-                        )
-                        return await ctx.send(embed=embed)
-                    
-                    await self.send_manga_info(ctx, manga)
-                    
+            except MangaDexError:
+                embed = discord.Embed(
+                    title="❌ API Error",
+                    description="Could not connect to MangaDex API.",
+                    color=discord.Color.red()
+                )
+                await ctx.send(embed=embed)
             except Exception as e:
                 embed = discord.Embed(
                     title="❌ Error",
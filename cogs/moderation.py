@@ -2,6 +2,25 @@ import discord
 from discord.ext import commands
 from datetime import datetime, timedelta
 import asyncio
+from utils.helpers import Paginator, get_or_fetch_member
+
+class WarningHistory:
+    """A member's warnings, newest first, as a sequence whose slices query one page"""
+    
+    def __init__(self, db, guild_id, user_id, count):
+        self.db = db
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.count = count
+    
+    def __len__(self):
+        return self.count
+    
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step not in (None, 1):
+            raise TypeError("WarningHistory only supports page slices")
+        start, stop, _ = index.indices(self.count)
+        return self.db.get_warnings_page(self.guild_id, self.user_id, start, max(stop - start, 0))
 
 class Moderation(commands.Cog):
     """Moderation commands for server management"""
@@ -36,7 +55,7 @@ class Moderation(commands.Cog):
                 return await ctx.send(embed=embed)
             
             # Check if member is bot owner or has higher role than command user
-            if member.top_role >= ctx.author.top_role and ctx.author != ctx.guild.owner:
+            if member.top_role >= ctx.author.top_role and ctx.author.id != ctx.guild.owner_id:
                 embed = discord.Embed(
                     title="❌ Cannot Ban Member",
                     description="You cannot ban this member due to role hierarchy.",
@@ -92,7 +111,7 @@ class Moderation(commands.Cog):
                 )
                 return await ctx.send(embed=embed)
             
-            if member.top_role >= ctx.author.top_role and ctx.author != ctx.guild.owner:
+            if member.top_role >= ctx.author.top_role and ctx.author.id != ctx.guild.owner_id:
                 embed = discord.Embed(
                     title="❌ Cannot Kick Member",
                     description="You cannot kick this member due to role hierarchy.",
@@ -180,9 +199,9 @@ class Moderation(commands.Cog):
     @commands.check(has_admin_role)
     async def check_warnings(self, ctx, member: discord.Member):
         """Check warnings for a member"""
-        warnings = await self.bot.db.get_warnings(ctx.guild.id, member.id)
+        warning_count = await self.bot.db.count_warnings(ctx.guild.id, member.id)
         
-        if not warnings:
+        if not warning_count:
             embed = discord.Embed(
                 title="📋 No Warnings",
                 description=f"{member.mention} has no warnings.",
@@ -190,23 +209,33 @@ class Moderation(commands.Cog):
             )
             return await ctx.send(embed=embed)
         
-        embed = discord.Embed(
-            title="📋 Warning History",
-            description=f"**Member:** {member.mention}\n**Total Warnings:** {len(warnings)}",
-            color=discord.Color.yellow()
-        )
+        # Newest first, 5 per page; only the pages that are shown are
+        # queried, and each moderator is looked up once
+        warnings = WarningHistory(self.bot.db, ctx.guild.id, member.id, warning_count)
+        moderators = {}  # members aren't all cached
         
-        for i, warning in enumerate(warnings[-5:], 1):  # Show last 5 warnings
-            moderator = ctx.guild.get_member(warning['moderator_id'])
-            mod_name = moderator.display_name if moderator else "Unknown"
-            
-            embed.add_field(
-                name=f"Warning {i}",
-                value=f"**Moderator:** {mod_name}\n**Reason:** {warning['reason']}\n**Date:** {warning['timestamp'][:10]}",
-                inline=False
+        async def render(page, start):
+            embed = discord.Embed(
+                title="📋 Warning History",
+                description=f"**Member:** {member.mention}\n**Total Warnings:** {warning_count}",
+                color=discord.Color.yellow()
             )
+            
+            for i, warning in enumerate(page, start + 1):
+                if warning.moderator_id not in moderators:
+                    moderators[warning.moderator_id] = await get_or_fetch_member(ctx.guild, warning.moderator_id)
+                moderator = moderators[warning.moderator_id]
+                mod_name = moderator.display_name if moderator else "Unknown"
+                date = datetime.fromtimestamp(warning.timestamp).strftime('%Y-%m-%d')
+                
+                embed.add_field(
+                    name=f"Warning {i}",
+                    value=f"**Moderator:** {mod_name}\n**Reason:** {warning.reason}\n**Date:** {date}",
+                    inline=False
+                )
+            return embed
         
-        await ctx.send(embed=embed)
+        await Paginator(warnings, render, per_page=5).start(ctx)
     
     @commands.command(name='quarantine')
     @commands.guild_only()
@@ -260,7 +289,7 @@ class Moderation(commands.Cog):
             user = await self.bot.fetch_user(user_id)
             
             # Check if user is already in guild
-            member = ctx.guild.get_member(user_id)
+            member = await get_or_fetch_member(ctx.guild, user_id)
             if member:
                 embed = discord.Embed(
                     title="❌ User in Server",
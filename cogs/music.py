@@ -1,12 +1,11 @@
 import discord
 from discord.ext import commands
 import asyncio
-import yt_dlp
 import os
+import threading
 from utils.music_queue import MusicQueue
-
-# Suppress noise about console usage from errors
-yt_dlp.utils.bug_reports_message = lambda: ''
+from utils.helpers import Paginator
+from utils.metrics import timed
 
 ytdl_format_options = {
     'format': 'bestaudio/best',
@@ -27,7 +26,20 @@ ffmpeg_options = {
     'options': '-vn'
 }
 
-ytdl = yt_dlp.YoutubeDL(ytdl_format_options)
+ytdl = None
+_ytdl_lock = threading.Lock()
+
+def get_ytdl():
+    """Shared YoutubeDL, created on first use (importing yt_dlp takes ~200 ms)"""
+    global ytdl
+    if ytdl is None:
+        with _ytdl_lock:
+            if ytdl is None:
+                import yt_dlp
+                # Suppress noise about console usage from errors
+                yt_dlp.utils.bug_reports_message = lambda: ''
+                ytdl = yt_dlp.YoutubeDL(ytdl_format_options)
+    return ytdl
 
 class YTDLSource(discord.PCMVolumeTransformer):
     def __init__(self, source, *, data, volume=0.5):
@@ -41,13 +53,14 @@ class YTDLSource(discord.PCMVolumeTransformer):
     @classmethod
     async def from_url(cls, url, *, loop=None, stream=False):
         loop = loop or asyncio.get_event_loop()
-        data = await loop.run_in_executor(None, lambda: ytdl.extract_info(url, download=not stream))
+        with timed("http"):
+            data = await loop.run_in_executor(None, lambda: get_ytdl().extract_info(url, download=not stream))
 
         if 'entries' in data:
             # Take first item from a playlist
             data = data['entries'][0]
 
-        filename = data['url'] if stream else ytdl.prepare_filename(data)
+        filename = data['url'] if stream else get_ytdl().prepare_filename(data)
         return cls(discord.FFmpegPCMAudio(filename, **ffmpeg_options), data=data)
 
 class Music(commands.Cog):
@@ -307,32 +320,28 @@ class Music(commands.Cog):
             )
             return await ctx.send(embed=embed)
         
-        embed = discord.Embed(
-            title="📝 Music Queue",
-            color=discord.Color.blue()
-        )
-        
-        # Show up to 10 songs
-        for i, song in enumerate(queue.songs[:10], 1):
-            duration_str = ""
-            if song['duration']:
-                minutes, seconds = divmod(song['duration'], 60)
-                duration_str = f" ({int(minutes)}:{int(seconds):02d})"
-            
-            embed.add_field(
-                name=f"{i}. {song['title']}{duration_str}",
-                value=f"Requested by {song['requester'].mention}",
-                inline=False
-            )
-        
-        if len(queue.songs) > 10:
-            embed.add_field(
-                name="...",
-                value=f"And {len(queue.songs) - 10} more songs",
-                inline=False
+        # Pages of 10 songs, built as they are viewed
+        def render(songs, start):
+            embed = discord.Embed(
+                title="📝 Music Queue",
+                description=f"{len(queue.songs)} songs queued",
+                color=discord.Color.blue()
             )
+            
+            for i, song in enumerate(songs, start + 1):
+                duration_str = ""
+                if song['duration']:
+                    minutes, seconds = divmod(song['duration'], 60)
+                    duration_str = f" ({int(minutes)}:{int(seconds):02d})"
+                
+                embed.add_field(
+                    name=f"{i}. {song['title']}{duration_str}",
+                    value=f"Requested by {song['requester'].mention}",
+                    inline=False
+                )
+            return embed
         
-        await ctx.send(embed=embed)
+        await Paginator(queue.songs, render, per_page=10).start(ctx)
     
     @commands.command(name='volume')
     @commands.guild_only()
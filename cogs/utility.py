@@ -2,7 +2,6 @@ import discord
 from discord.ext import commands
 import time
 import platform
-import psutil
 from datetime import datetime
 
 class Utility(commands.Cog):
@@ -135,14 +134,15 @@ class Utility(commands.Cog):
         embed.add_field(name="Account Created", value=member.created_at.strftime("%B %d, %Y"), inline=True)
         embed.add_field(name="Joined Server", value=member.joined_at.strftime("%B %d, %Y"), inline=True)
         
-        # Status
-        status_emoji = {
-            'online': '🟢',
-            'idle': '🟡',
-            'dnd': '🔴',
-            'offline': '⚫'
-        }
-        embed.add_field(name="Status", value=f"{status_emoji.get(str(member.status), '❓')} {str(member.status).title()}", inline=True)
+        # Status (only known with the presences intent)
+        if self.bot.intents.presences:
+            status_emoji = {
+                'online': '🟢',
+                'idle': '🟡',
+                'dnd': '🔴',
+                'offline': '⚫'
+            }
+            embed.add_field(name="Status", value=f"{status_emoji.get(str(member.status), '❓')} {str(member.status).title()}", inline=True)
         
         # Roles
         if len(member.roles) > 1:
@@ -190,7 +190,7 @@ class Utility(commands.Cog):
         
         # Basic info
         embed.add_field(name="Server ID", value=guild.id, inline=True)
-        embed.add_field(name="Owner", value=guild.owner.mention if guild.owner else "Unknown", inline=True)
+        embed.add_field(name="Owner", value=f"<@{guild.owner_id}>" if guild.owner_id else "Unknown", inline=True)
         embed.add_field(name="Created", value=guild.created_at.strftime("%B %d, %Y"), inline=True)
         
         # Counts
@@ -222,7 +222,14 @@ class Utility(commands.Cog):
         # Basic info
         embed.add_field(name="Bot Name", value=self.bot.user.name, inline=True)
         embed.add_field(name="Bot ID", value=self.bot.user.id, inline=True)
-        embed.add_field(name="Servers", value=len(self.bot.guilds), inline=True)
+        # Counted across every cluster process when sharded over several
+        cluster = self.bot.cluster
+        embed.add_field(name="Servers", value=cluster.total("guilds") if cluster else len(self.bot.guilds), inline=True)
+        if self.bot.shard_count:
+            shard = f"{ctx.guild.shard_id if ctx.guild else 0}/{self.bot.shard_count}"
+            if cluster:
+                shard += f" (cluster {cluster.cluster_id})"
+            embed.add_field(name="Shard", value=shard, inline=True)
         
         # System info
         embed.add_field(name="Python Version", value=platform.python_version(), inline=True)
@@ -231,6 +238,7 @@ class Utility(commands.Cog):
         
         # Performance
         try:
+            import psutil  # only needed here, so not imported at start-up
             cpu_percent = psutil.cpu_percent()
             memory = psutil.virtual_memory()
             embed.add_field(name="CPU Usage", value=f"{cpu_percent}%", inline=True)
@@ -273,7 +281,7 @@ class Utility(commands.Cog):
             if command.aliases:
                 embed.add_field(name="Aliases", value=", ".join(command.aliases), inline=False)
             
-            usage = f"{await self.bot.get_prefix(ctx.message)}{command.name}"
+            usage = f"{await self.bot.prefixes.resolve(ctx.message)}{command.name}"
             if command.signature:
                 usage += f" {command.signature}"
             embed.add_field(name="Usage", value=f"`{usage}`", inline=False)
@@ -282,7 +290,7 @@ class Utility(commands.Cog):
             return
         
         # Show general help
-        prefix = await self.bot.get_prefix(ctx.message)
+        prefix = await self.bot.prefixes.resolve(ctx.message)
         
         embed = discord.Embed(
             title="🤖 Bot Help",
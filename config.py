@@ -5,6 +5,7 @@ class Config:
     
     # Bot settings
     DEFAULT_PREFIX = "x!"
+    MENTION_PREFIX = True  # also accept commands starting with @bot
     BOT_NAME = "Multi-Purpose Bot"
     BOT_VERSION = "1.0.0"
     
@@ -24,13 +25,134 @@ class Config:
     MUSIC_COOLDOWN = 3
     UTILITY_COOLDOWN = 2
     
+    # Live paginators/confirmations; opening more expires the least recently used
+    UI_MAX_SESSIONS = 1000
+    
     # API URLs
     MANGADEX_API = "https://api.mangadex.org"
     
+    # MangaDex client. MangaDex allows about 5 requests per second per IP;
+    # clusters on one machine split that between them
+    MANGADEX_RATE_LIMIT = float(os.getenv('MANGADEX_RATE_LIMIT', '5'))
+    MANGADEX_TIMEOUT = 10  # seconds per request
+    MANGADEX_MAX_CONNECTIONS = 10
+    MANGADEX_MAX_RETRIES = 3  # for 429, 5xx and network errors
+    MANGADEX_BREAKER_THRESHOLD = 5  # consecutive failures before failing fast...
+    MANGADEX_BREAKER_RESET = 30  # ...for this many seconds
+    
+    # MangaDex search cache; stale results are served while being refreshed
+    MANGA_CACHE_ENTRIES = 2000
+    MANGA_CACHE_MAX_BYTES = 8 * 1024 * 1024  # approximate, as JSON
+    MANGA_CACHE_TTL = 3600  # fresh for an hour...
+    MANGA_CACHE_STALE_TTL = 86400  # ...then served stale for up to a day
+    MANGA_CACHE_NEGATIVE_TTL = 300  # "no results" is remembered for 5 minutes
+    
+    # Content ratings manga commands show (MangaDex's own default)
+    MANGA_CONTENT_RATINGS = ["safe", "suggestive", "erotica"]
+    
+    # x!randommanga serves from a buffer refilled in the background: below the
+    # low watermark, one request tops it up to the high one
+    MANGA_RANDOM_POOL_LOW = 5
+    MANGA_RANDOM_POOL_HIGH = 25
+    
+    # Local title index (SQLite FTS5) for instant search and suggestions. A
+    # background task mirrors MangaDex titles incrementally; with
+    # MANGA_INDEX_FIXTURE set it reads that JSON file instead (no network)
+    MANGA_INDEX_ENABLED = os.getenv('MANGA_INDEX_ENABLED', 'false').lower() == 'true'
+    MANGA_INDEX_FILE = "data/manga_index.db"
+    MANGA_INDEX_FIXTURE = os.getenv('MANGA_INDEX_FIXTURE', '')
+    MANGA_INDEX_PAGE_DELAY = 1.0  # seconds between pages while catching up, leaving room for commands
+    MANGA_INDEX_SYNC_INTERVAL = 900  # seconds between syncs once caught up
+    
     # File paths
     DATABASE_FILE = "data/bot_database.json"
     CONFIG_FILE = "data/server_configs.json"
     
+    # Database persistence
+    DATABASE_BACKEND = os.getenv('DATABASE_BACKEND', 'json')  # json, journal, sharded or sqlite
+    SQLITE_DATABASE_FILE = "data/bot_database.db"
+    DATABASE_SHARD_DIR = "data/guilds"
+    DATABASE_SHARD_MEMORY_BUDGET = int(os.getenv('DATABASE_SHARD_MEMORY_BUDGET', str(8 * 1024 * 1024)))  # bytes of loaded guild data
+    DATABASE_JOURNAL_FILE = "data/bot_database.journal"
+    DATABASE_JOURNAL_MAX_BYTES = 1024 * 1024  # compact once the journal passes 1 MB
+    DATABASE_JOURNAL_MAX_AGE = 3600  # ...or once its oldest record is an hour old
+    # json (indented), compact or msgpack. Files keep their .json names in every format: the format
+    # is read from the file itself, so switching it never leaves the old data behind under another name
+    DATABASE_FORMAT = os.getenv('DATABASE_FORMAT', 'compact')
+    DATABASE_FLUSH_DELAY = float(os.getenv('DATABASE_FLUSH_DELAY', '1.0'))  # seconds to merge bursts of writes
+    
+    # Logging
+    LOG_FILE = os.getenv('LOG_FILE', 'bot.log')  # launcher.py gives each cluster its own
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_MAX_BYTES = 5 * 1024 * 1024  # rotate (and gzip) once the log passes 5 MB
+    LOG_ROTATE_INTERVAL = 86400  # ...or once a day
+    LOG_BACKUP_COUNT = 7
+    # Noisy hot-path categories: keep one line in N...
+    LOG_SAMPLE_EVERY = {
+        "message": 100,
+    }
+    # ...or at most N lines per minute
+    LOG_RATE_LIMITS = {
+        "command_not_found": 30,
+        "command_error": 60,
+    }
+    
+    # Local status server (/healthz and Prometheus /metrics); port 0 disables it
+    STATUS_HOST = os.getenv('STATUS_HOST', '127.0.0.1')
+    STATUS_PORT = int(os.getenv('STATUS_PORT', '8080'))
+    
+    # Event loop watchdog (can also be toggled with the owner-only watchdog command)
+    WATCHDOG_ENABLED = os.getenv('WATCHDOG_ENABLED', 'true').lower() == 'true'
+    WATCHDOG_THRESHOLD = float(os.getenv('WATCHDOG_THRESHOLD', '0.5'))  # seconds the loop may be blocked
+    
+    # Gateway intents and cache policy. "full" caches every member and
+    # message; "lean" skips presences, doesn't chunk guilds at startup and
+    # only keeps members in voice (plus the bot), fetching others on demand
+    INTENTS_PROFILE = os.getenv('INTENTS_PROFILE', 'lean')
+    INTENT_PROFILES = {
+        "full": {
+            "intents": "all",
+            "member_cache": "all",
+            "max_messages": 1000,
+            "chunk_guilds_at_startup": True,
+        },
+        "lean": {
+            # members is still needed for member join/leave/update events
+            # and for resolving names in commands
+            "intents": [
+                "guilds",
+                "members",
+                "voice_states",
+                "guild_messages",
+                "dm_messages",
+                "message_content",
+                "guild_reactions",
+                "dm_reactions",
+            ],
+            "member_cache": ["voice"],
+            # Nothing reads the message cache: paginators and confirmations
+            # go through InteractionRouter, which uses raw reaction and
+            # interaction events. None turns it off
+            "max_messages": None,
+            "chunk_guilds_at_startup": False,
+        },
+    }
+
+    # Sharding: AUTO_SHARD runs an AutoShardedBot. SHARD_COUNT 0 lets Discord
+    # pick the count; SHARD_IDS (comma separated) limits this process to
+    # some of them. launcher.py sets these for each cluster process
+    AUTO_SHARD = os.getenv('AUTO_SHARD', 'false').lower() == 'true'
+    SHARD_COUNT = int(os.getenv('SHARD_COUNT', '0'))
+    SHARD_IDS = [int(shard_id) for shard_id in os.getenv('SHARD_IDS', '').split(',') if shard_id.strip()]
+    
+    # Clusters (one process per shard range, see launcher.py)
+    CLUSTER_ID = int(os.getenv('CLUSTER_ID', '0'))
+    CLUSTER_COUNT = int(os.getenv('CLUSTER_COUNT', '1'))
+    CLUSTER_IPC_PORT = int(os.getenv('CLUSTER_IPC_PORT', '8790'))  # launcher's local stats hub
+    CLUSTER_IPC_URL = os.getenv('CLUSTER_IPC_URL', '')  # set for cluster processes
+    CLUSTER_IPC_SECRET = os.getenv('CLUSTER_IPC_SECRET', '')
+    CLUSTER_STATS_INTERVAL = 10  # seconds between stats pushes
+    
     # Permissions
     ADMIN_PERMISSIONS = [
         "administrator",
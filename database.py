@@ -1,116 +1,456 @@
-import json
 import os
 import asyncio
+import logging
+import contextlib
+import contextvars
+import time
 from datetime import datetime
+from config import Config
+from utils.journal import Journal
+from utils.persistence import WriteBehind, atomic_write, file_lock
+from utils.records import GuildSettings, WarningEntry, to_timestamp
+from utils import serializers
+from utils.warnings_index import WarningsIndex
 
-class Database:
-    """Simple JSON-based database for bot data"""
+class Transaction:
+    """Changes made inside a database transaction, undone on rollback"""
+    
+    __slots__ = ("records", "undo")
     
     def __init__(self):
-        self.db_file = "data/bot_database.json"
+        self.records = []
+        self.undo = []
+    
+    def rollback(self):
+        """Undo every change, newest first"""
+        for undo in reversed(self.undo):
+            undo()
+        self.records.clear()
+        self.undo.clear()
+
+def empty_data():
+    """Structure of a new database file"""
+    return {
+        "guilds": {},
+        "users": {},
+        "warnings": {},
+        "music_queues": {}
+    }
+
+class Database:
+    """Simple JSON-based database for bot data
+    
+    By default every change schedules a full (coalesced) rewrite of the
+    JSON file. In journal mode changes are appended to a JSONL journal
+    instead and periodically folded into the JSON file as a snapshot.
+    In shared mode (several cluster processes on one file) changes are
+    replayed onto the file as it is on disk, under a lock, so processes
+    don't overwrite each other's guilds.
+    """
+    
+    def __init__(self, journal=False, shared=False):
+        if journal and shared:
+            raise ValueError("The journal backend can't be shared between processes; use json, sharded or sqlite")
+        
+        self.db_file = Config.DATABASE_FILE
+        self.shared = shared
+        self.serializer = serializers.get_serializer(Config.DATABASE_FORMAT)
         self.ensure_data_dir()
         self.data = self.load_data()
+        # Typed records in memory; plain dicts only at the persistence edge
+        self.guilds = {
+            guild_id: GuildSettings.from_dict(guild)
+            for guild_id, guild in self.data.pop("guilds", {}).items()
+        }
+        self.warnings = WarningsIndex.from_dict(self.data.pop("warnings", {}))
+        self._transaction = contextvars.ContextVar(f"database-transaction-{id(self)}", default=None)
+        self._write_lock = asyncio.Lock()
+        
+        # Mutations only mark the store dirty; the writer merges bursts
+        if shared:
+            self.lock_file = f"{self.db_file}.lock"
+            self.pending = []
+            self._unsaved = []
+            self.writer = WriteBehind(
+                self.take_records,
+                self.write_records,
+                delay=Config.DATABASE_FLUSH_DELAY,
+                name="bot database"
+            )
+        else:
+            self.writer = WriteBehind(
+                self.snapshot_data,
+                self.write_snapshot,
+                delay=Config.DATABASE_FLUSH_DELAY,
+                name="bot database"
+            )
+        
+        self.journal = None
+        if journal:
+            self.journal = Journal(
+                Config.DATABASE_JOURNAL_FILE,
+                self.snapshot_data,
+                self.write_snapshot,
+                max_bytes=Config.DATABASE_JOURNAL_MAX_BYTES,
+                max_age=Config.DATABASE_JOURNAL_MAX_AGE,
+                delay=Config.DATABASE_FLUSH_DELAY
+            )
+            for record in self.journal.replay(self.snapshot_seq):
+                self.apply_record(record)
     
     def ensure_data_dir(self):
         """Ensure data directory exists"""
         os.makedirs("data", exist_ok=True)
     
+    def read_file(self):
+        """Read the database file, or None if there is none yet
+        
+        Raises ValueError if the file can't be decoded, or
+        serializers.UnsupportedFormatError if a newer version wrote it.
+        """
+        try:
+            with open(self.db_file, 'rb') as f:
+                payload = f.read()
+        except FileNotFoundError:
+            return None
+        return serializers.loads(payload)
+    
     def load_data(self):
         """Load data from JSON file"""
-        if os.path.exists(self.db_file):
-            try:
-                with open(self.db_file, 'r') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, FileNotFoundError):
-                pass
+        self.snapshot_seq = 0
+        try:
+            data = self.read_file()
+        except serializers.UnsupportedFormatError as e:
+            # Starting empty would overwrite data a newer version can still read
+            logging.critical(f'Refusing to load {self.db_file}: {e}')
+            raise
+        except ValueError as e:
+            corrupt_file = f"{self.db_file}.corrupt-{int(time.time())}"
+            os.replace(self.db_file, corrupt_file)
+            logging.error(f'{self.db_file} is corrupt ({e}), moved it to {corrupt_file} and starting empty')
+            data = None
+        if data is None:
+            return empty_data()
         
-        # Default structure
+        # Last journal record folded into this snapshot
+        self.snapshot_seq = data.pop("journal_seq", 0)
+        return data
+    
+    def save_data(self):
+        """Schedule a background save of the data"""
+        self.writer.mark_dirty()
+    
+    def snapshot_data(self):
+        """Copy the mutable parts of the data so it can be written off the loop"""
         return {
-            "guilds": {},
-            "users": {},
-            "warnings": {},
-            "music_queues": {}
+            "guilds": {guild_id: guild.copy() for guild_id, guild in self.guilds.items()},
+            "users": dict(self.data["users"]),
+            "warnings": self.warnings.to_dict(),
+            "music_queues": dict(self.data["music_queues"])
         }
     
-    def save_data(self):
-        """Save data to JSON file"""
-        try:
-            with open(self.db_file, 'w') as f:
-                json.dump(self.data, f, indent=2)
-        except Exception as e:
-            print(f"Error saving database: {e}")
+    def write_snapshot(self, snapshot):
+        """Serialize a snapshot and atomically replace the database file"""
+        atomic_write(self.db_file, self.serializer.dumps(snapshot))
+    
+    def take_records(self):
+        """Hand the records persisted since the last write to the writer (shared mode)"""
+        records, self.pending = self.pending, []
+        return records
+    
+    def write_records(self, records):
+        """Replay records onto the file as it is on disk now (shared mode)
+        
+        Runs on the writer thread. Each process only changes its own
+        guilds, so merging its records into the latest file under the
+        lock keeps everyone's changes.
+        """
+        # Records from a failed write go out with the next one
+        records = self._unsaved = self._unsaved + records
+        
+        with file_lock(self.lock_file):
+            data = self.read_file() or empty_data()
+            data.pop("journal_seq", None)
+            guilds = {
+                guild_id: GuildSettings.from_dict(guild)
+                for guild_id, guild in data.pop("guilds", {}).items()
+            }
+            warnings = WarningsIndex.from_dict(data.pop("warnings", {}))
+            for record in records:
+                self.apply_record(record, guilds, warnings)
+            
+            data["guilds"] = guilds
+            data["warnings"] = warnings.to_dict()
+            atomic_write(self.db_file, self.serializer.dumps(data))
+        
+        self._unsaved = []
+    
+    async def flush(self):
+        """Write any pending changes to disk immediately"""
+        if self.journal:
+            await self.journal.writer.flush()
+        else:
+            await self.writer.flush()
+    
+    async def close(self):
+        """Flush pending changes and stop the background writer"""
+        if self.journal:
+            await self.journal.close()
+        await self.writer.close()
+    
+    @property
+    def stats(self):
+        """Persistence counters (requests, flushes, merged writes, errors)"""
+        if self.journal:
+            return self.journal.stats
+        return self.writer.stats
+    
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        """Group mutations: applied in memory as they happen, persisted once on
+        exit and rolled back if the block raises. Nested blocks join the outer one.
+        
+        One writer at a time: writes from other tasks wait until the
+        transaction ends, so it persists in the order it was applied and
+        rolling back can't undo anyone else's change. Reads are not isolated;
+        other tasks may see its changes before it commits.
+        """
+        if self._transaction.get() is not None:
+            yield
+            return
+        
+        async with self._write_lock:
+            transaction = Transaction()
+            token = self._transaction.set(transaction)
+            # Keep background writes from persisting half a transaction
+            if self.journal:
+                self.journal.holds += 1
+            else:
+                self.writer.hold()
+            
+            try:
+                yield
+            except BaseException:
+                transaction.rollback()
+                raise
+            finally:
+                self._transaction.reset(token)
+                if self.journal:
+                    self.journal.holds -= 1
+                else:
+                    self.writer.release()
+            
+            self.persist(transaction.records)
+    
+    batch = transaction
+    
+    async def apply(self, op, **fields):
+        """Apply a mutation to the in-memory data and persist it"""
+        record = dict(fields, op=op)
+        transaction = self._transaction.get()
+        
+        if transaction is not None:
+            transaction.undo.append(self.undo_for(record))
+            self.apply_record(record)
+            transaction.records.append(record)
+            return
+        
+        # Wait for another task's transaction to finish
+        async with self._write_lock:
+            self.apply_record(record)
+            self.persist([record])
+    
+    def persist(self, records):
+        """Persist applied records (a single journal line per call)"""
+        if not records:
+            return
+        
+        if not self.journal:
+            if self.shared:
+                self.pending.extend(records)
+            self.save_data()
+        elif len(records) == 1:
+            self.journal.append(records[0])
+        else:
+            self.journal.append({"op": "batch", "records": records})
+    
+    def undo_for(self, record):
+        """Build a callable that reverts a record, from the state before it is applied"""
+        op = record["op"]
+        guilds = self.guilds
+        
+        if op in ("add_guild", "remove_guild", "set_guild"):
+            guild_id = record["guild_id"]
+            guild = guilds.get(guild_id)
+            if op == "remove_guild":
+                if guild is None:
+                    return lambda: None
+                return lambda: guilds.__setitem__(guild_id, guild)
+            if guild is None:
+                # The guild is created by this change
+                return lambda: guilds.pop(guild_id, None)
+            if op == "add_guild":
+                return lambda: None
+            # Only the field this change sets
+            field, previous = record["field"], getattr(guild, record["field"], None)
+            return lambda: setattr(guild, field, previous)
+        
+        if op == "add_warning":
+            return lambda: self.warnings.discard(record["guild_id"], record["user_id"], record["warning"])
+        
+        if op == "clear_warnings":
+            previous = self.warnings.user(record["guild_id"], record["user_id"])
+            return lambda: self.warnings.restore(record["guild_id"], record["user_id"], previous)
+        
+        raise ValueError(f"Unknown database operation: {op}")
+    
+    def apply_record(self, record, guilds=None, warnings=None):
+        """Apply a mutation record (also used to replay the journal)
+        
+        Applies to the in-memory data unless other guilds/warnings are given.
+        """
+        op = record["op"]
+        guilds = self.guilds if guilds is None else guilds
+        warnings = self.warnings if warnings is None else warnings
+        
+        if op == "add_guild":
+            if record["guild_id"] not in guilds:
+                guilds[record["guild_id"]] = GuildSettings(created_at=record["created_at"])
+        elif op == "remove_guild":
+            guilds.pop(record["guild_id"], None)
+        elif op == "set_guild":
+            guild = guilds.get(record["guild_id"])
+            if guild is None:
+                guild = guilds[record["guild_id"]] = GuildSettings(created_at=record["created_at"])
+            if record["field"] not in GuildSettings.__slots__:
+                raise ValueError(f"Unknown guild setting: {record['field']}")
+            setattr(guild, record["field"], record["value"])
+        elif op == "add_warning":
+            warning = record["warning"]
+            if isinstance(warning, dict):
+                # Replayed from the journal
+                warning = record["warning"] = WarningEntry.from_dict(warning)
+            warnings.add(record["guild_id"], record["user_id"], warning)
+        elif op == "clear_warnings":
+            warnings.clear(record["guild_id"], record["user_id"])
+        elif op == "batch":
+            for nested in record["records"]:
+                self.apply_record(nested, guilds, warnings)
+        else:
+            raise ValueError(f"Unknown database operation: {op}")
     
     async def add_guild(self, guild_id):
         """Add a new guild to database"""
         guild_id = str(guild_id)
-        if guild_id not in self.data["guilds"]:
-            self.data["guilds"][guild_id] = {
-                "prefix": "x!",
-                "log_channel": None,
-                "created_at": datetime.now().isoformat()
-            }
-            self.save_data()
+        if guild_id not in self.guilds:
+            await self.apply("add_guild", guild_id=guild_id, created_at=datetime.now().isoformat())
     
     async def remove_guild(self, guild_id):
         """Remove guild from database"""
         guild_id = str(guild_id)
-        if guild_id in self.data["guilds"]:
-            del self.data["guilds"][guild_id]
-            self.save_data()
+        if guild_id in self.guilds:
+            await self.apply("remove_guild", guild_id=guild_id)
     
     async def get_guild_prefix(self, guild_id):
         """Get guild prefix"""
-        guild_id = str(guild_id)
-        return self.data["guilds"].get(guild_id, {}).get("prefix", "x!")
+        guild = self.guilds.get(str(guild_id))
+        return guild.prefix if guild is not None else "x!"
+    
+    async def get_guild_prefixes(self):
+        """Get every stored guild prefix as {guild_id: prefix}"""
+        return {int(guild_id): guild.prefix for guild_id, guild in self.guilds.items()}
     
     async def set_guild_prefix(self, guild_id, prefix):
         """Set guild prefix"""
-        guild_id = str(guild_id)
-        if guild_id not in self.data["guilds"]:
-            await self.add_guild(guild_id)
-        
-        self.data["guilds"][guild_id]["prefix"] = prefix
-        self.save_data()
+        await self.apply(
+            "set_guild",
+            guild_id=str(guild_id),
+            field="prefix",
+            value=prefix,
+            created_at=datetime.now().isoformat()
+        )
     
     async def get_log_channel(self, guild_id):
         """Get log channel for guild"""
-        guild_id = str(guild_id)
-        return self.data["guilds"].get(guild_id, {}).get("log_channel")
+        guild = self.guilds.get(str(guild_id))
+        return guild.log_channel if guild is not None else None
     
     async def set_log_channel(self, guild_id, channel_id):
         """Set log channel for guild"""
-        guild_id = str(guild_id)
-        if guild_id not in self.data["guilds"]:
-            await self.add_guild(guild_id)
-        
-        self.data["guilds"][guild_id]["log_channel"] = channel_id
-        self.save_data()
+        await self.apply(
+            "set_guild",
+            guild_id=str(guild_id),
+            field="log_channel",
+            value=channel_id,
+            created_at=datetime.now().isoformat()
+        )
     
     async def add_warning(self, guild_id, user_id, moderator_id, reason):
         """Add warning to user"""
-        key = f"{guild_id}_{user_id}"
-        if key not in self.data["warnings"]:
-            self.data["warnings"][key] = []
-        
-        warning = {
-            "moderator_id": moderator_id,
-            "reason": reason,
-            "timestamp": datetime.now().isoformat()
-        }
+        guild_id, user_id = str(guild_id), str(user_id)
+        warning = WarningEntry(moderator_id, reason, time.time())
         
-        self.data["warnings"][key].append(warning)
-        self.save_data()
+        await self.apply("add_warning", guild_id=guild_id, user_id=user_id, warning=warning)
         
-        return len(self.data["warnings"][key])
+        return len(self.warnings.user(guild_id, user_id))
     
     async def get_warnings(self, guild_id, user_id):
         """Get user warnings"""
-        key = f"{guild_id}_{user_id}"
-        return self.data["warnings"].get(key, [])
+        warnings = self.warnings.user(str(guild_id), str(user_id))
+        return warnings.entries if warnings else []
+    
+    async def get_recent_warnings(self, guild_id, user_id, limit=5):
+        """Get a user's most recent warnings, oldest first"""
+        warnings = self.warnings.user(str(guild_id), str(user_id))
+        return warnings.last(limit) if warnings else []
+    
+    async def get_warnings_page(self, guild_id, user_id, offset=0, limit=5):
+        """Get a page of a user's warnings, newest first"""
+        warnings = self.warnings.user(str(guild_id), str(user_id))
+        return warnings.newest(offset, limit) if warnings else []
+    
+    async def get_warnings_since(self, guild_id, user_id, since):
+        """Get a user's warnings issued at or after since (datetime or epoch seconds)"""
+        warnings = self.warnings.user(str(guild_id), str(user_id))
+        return warnings.since(to_timestamp(since)) if warnings else []
+    
+    async def count_warnings(self, guild_id, user_id, since=None, until=None):
+        """Count a user's warnings, optionally within [since, until)"""
+        warnings = self.warnings.user(str(guild_id), str(user_id))
+        return warnings.count(to_timestamp(since), to_timestamp(until)) if warnings else 0
+    
+    async def get_top_offenders(self, guild_id, limit=10, since=None):
+        """Get the most warned users in a guild as (user_id, count) pairs"""
+        guild = self.warnings.guild(str(guild_id))
+        if not guild:
+            return []
+        return [
+            (int(user_id), count)
+            for user_id, count in guild.top_offenders(limit, to_timestamp(since))
+        ]
     
     async def clear_warnings(self, guild_id, user_id):
         """Clear user warnings"""
-        key = f"{guild_id}_{user_id}"
-        if key in self.data["warnings"]:
-            del self.data["warnings"][key]
-            self.save_data()
+        guild_id, user_id = str(guild_id), str(user_id)
+        if self.warnings.user(guild_id, user_id):
+            await self.apply("clear_warnings", guild_id=guild_id, user_id=user_id)
+
+def create_database(backend=None):
+    """Create the database backend selected in the config"""
+    backend = (backend or Config.DATABASE_BACKEND).lower()
+    
+    # Cluster processes (see launcher.py) share the database files
+    shared = Config.CLUSTER_COUNT > 1
+    
+    if backend == "json":
+        return Database(shared=shared)
+    if backend == "journal":
+        return Database(journal=True, shared=shared)
+    if backend == "sharded":
+        from sharded_database import ShardedDatabase
+        return ShardedDatabase()
+    if backend == "sqlite":
+        from sqlite_database import SQLiteDatabase
+        return SQLiteDatabase()
+    
+    raise ValueError(f"Unknown database backend: {backend}")
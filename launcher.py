@@ -0,0 +1,179 @@
+"""Run the bot as several cluster processes, each with a range of shards
+
+Usage:
+    python launcher.py [--clusters N] [--shards N]
+
+Asks Discord for the recommended shard count (unless --shards is given),
+splits the shards into --clusters contiguous ranges and runs main.py
+once per range as an AutoShardedBot. Clusters are started one after
+another so their shards don't exceed Discord's identify rate limit, and
+restarted with a backoff if they exit. The launcher also runs the local
+hub clusters use to share stats (see utils/cluster.py).
+
+Each cluster logs to bot.cluster-<id>.log and, if the status server is
+enabled, listens on STATUS_PORT + <id>.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import secrets
+import signal
+import sys
+import time
+
+from config import Config
+from database import create_database
+from utils.cluster import ClusterHub, shard_ranges
+from utils.logs import setup_logging
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Discord allows max_concurrency identifies per 5 seconds
+IDENTIFY_INTERVAL = 5.0
+
+class ClusterProcess:
+    """Runs main.py for one shard range and restarts it when it exits"""
+
+    def __init__(self, cluster_id, shard_ids, shard_count, env):
+        self.cluster_id = cluster_id
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.env = env
+        self.process = None
+        self.restarts = 0
+        self.stopping = False
+
+    def cluster_env(self):
+        env = dict(self.env)
+        env.update({
+            "AUTO_SHARD": "true",
+            "SHARD_COUNT": str(self.shard_count),
+            "SHARD_IDS": ",".join(str(shard_id) for shard_id in self.shard_ids),
+            "CLUSTER_ID": str(self.cluster_id),
+            "LOG_FILE": f"bot.cluster-{self.cluster_id}.log",
+        })
+        if Config.STATUS_PORT:
+            env["STATUS_PORT"] = str(Config.STATUS_PORT + self.cluster_id)
+        return env
+
+    async def run(self):
+        backoff = 5
+        while not self.stopping:
+            logging.info(f'Starting cluster {self.cluster_id} (shards {self.shard_ids[0]}-{self.shard_ids[-1]})')
+            started = time.monotonic()
+            self.process = await asyncio.create_subprocess_exec(
+                sys.executable, os.path.join(ROOT, "main.py"),
+                env=self.cluster_env(),
+                # Keep Ctrl+C in the terminal from reaching clusters directly
+                start_new_session=True
+            )
+            code = await self.process.wait()
+            if self.stopping:
+                break
+
+            # Only back off further while it keeps crashing soon after starting
+            if time.monotonic() - started > 600:
+                backoff = 5
+            logging.error(f'Cluster {self.cluster_id} exited with code {code}, restarting in {backoff}s')
+            self.restarts += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 300)
+
+    def stop(self):
+        """Ask the cluster to shut down cleanly (discord.py handles SIGINT)"""
+        self.stopping = True
+        if self.process is not None and self.process.returncode is None:
+            self.process.send_signal(signal.SIGINT)
+
+async def gateway_info(token):
+    """Recommended shard count and identify concurrency for the bot"""
+    import discord
+
+    http = discord.http.HTTPClient(asyncio.get_running_loop())
+    try:
+        await http.static_login(token)
+        shards, _, limits = await http.get_bot_gateway()
+    finally:
+        await http.close()
+    return shards, limits.get("max_concurrency", 1)
+
+async def launch(args, token):
+    if args.shards:
+        shard_count, concurrency = args.shards, 1
+    else:
+        shard_count, concurrency = await gateway_info(token)
+    ranges = shard_ranges(shard_count, args.clusters)
+    logging.info(f'Running {shard_count} shards in {len(ranges)} clusters')
+    if len(ranges) > 1 and Config.DATABASE_BACKEND.lower() == "journal":
+        logging.error("The journal backend can't be shared between clusters; use json, sharded or sqlite")
+        return
+
+    # Migrations (JSON to shards/SQLite) happen once, here, before the
+    # clusters open the database
+    db = create_database()
+    await db.close()
+
+    secret = secrets.token_urlsafe(32)
+    hub = ClusterHub(secret, port=Config.CLUSTER_IPC_PORT)
+    await hub.start()
+
+    env = dict(os.environ)
+    env.update({
+        "CLUSTER_COUNT": str(len(ranges)),
+        "CLUSTER_IPC_URL": f"http://127.0.0.1:{Config.CLUSTER_IPC_PORT}",
+        "CLUSTER_IPC_SECRET": secret,
+    })
+    clusters = [
+        ClusterProcess(cluster_id, shard_ids, shard_count, env)
+        for cluster_id, shard_ids in enumerate(ranges)
+    ]
+
+    loop = asyncio.get_running_loop()
+    stopped = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopped.set)
+
+    tasks = []
+    for cluster in clusters:
+        tasks.append(loop.create_task(cluster.run()))
+        # Give this cluster's shards time to identify before starting the next
+        delay = len(cluster.shard_ids) * IDENTIFY_INTERVAL / concurrency
+        try:
+            await asyncio.wait_for(stopped.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+        if stopped.is_set():
+            break
+
+    await stopped.wait()
+    logging.info('Stopping clusters')
+    for cluster in clusters:
+        cluster.stop()
+    await asyncio.gather(*(
+        cluster.process.wait() for cluster in clusters if cluster.process is not None
+    ))
+    # Clusters waiting to be restarted are still sleeping
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await hub.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--clusters", type=int, default=2, help="number of cluster processes")
+    parser.add_argument("--shards", type=int, default=Config.SHARD_COUNT,
+                        help="total shard count (default: Discord's recommendation)")
+    args = parser.parse_args()
+
+    setup_logging(Config.LOG_FILE, level=Config.LOG_LEVEL)
+
+    token = os.getenv('DISCORD_TOKEN')
+    if not token:
+        logging.error('DISCORD_TOKEN environment variable not found!')
+        sys.exit(1)
+
+    asyncio.run(launch(args, token))
+
+if __name__ == "__main__":
+    main()
@@ -1,75 +1,163 @@
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 import asyncio
 import json
 import os
+import signal
+import sys
+import time
 import logging
 from datetime import datetime
 from config import Config
-from database import Database
+from database import create_database
+from utils.prefixes import PrefixResolver
+from utils.logs import setup_logging, set_log_context
+from utils.metrics import CommandMetrics, LoopLagMonitor, TimedDatabase
+from utils.status_server import StatusServer
+from utils.watchdog import LoopWatchdog
+from utils.startup import ExtensionImportTimer, profile_startup
+from utils.intents import client_options
+from utils.cluster import ClusterClient
+from utils.router import InteractionRouter
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('bot.log'),
-        logging.StreamHandler()
-    ]
+# Set up logging (written by a background thread, never on the event loop)
+log_listener, log_sampler = setup_logging(
+    Config.LOG_FILE,
+    level=Config.LOG_LEVEL,
+    max_bytes=Config.LOG_MAX_BYTES,
+    backup_count=Config.LOG_BACKUP_COUNT,
+    interval=Config.LOG_ROTATE_INTERVAL,
+    sample_every=Config.LOG_SAMPLE_EVERY,
+    rate_limits=Config.LOG_RATE_LIMITS
 )
 
+# Command errors caused by how the command was used, not by the bot; they
+# are answered but not counted as command failures in the metrics
+USAGE_ERRORS = (
+    commands.CommandNotFound,
+    commands.CheckFailure,  # includes MissingPermissions
+    commands.CommandOnCooldown,
+    commands.UserInputError,
+    commands.MaxConcurrencyReached,
+    commands.DisabledCommand,
+)
+
+# Extensions loaded at start-up; they don't depend on each other
+COGS = [
+    'cogs.moderation',
+    'cogs.music',
+    'cogs.manga',
+    'cogs.utility',
+    'cogs.admin'
+]
+
 async def get_custom_prefix(bot, message):
     """Get custom prefix for each guild"""
-    if not message.guild:
-        logging.info(f'Using DM prefix: x!')
-        return "x!"
-    
-    prefix = await bot.db.get_guild_prefix(message.guild.id)
-    final_prefix = prefix or "x!"
-    logging.info(f'Guild {message.guild.id} prefix: {final_prefix}')
-    return final_prefix
+    return await bot.prefixes.prefixes_for(message)
 
-class DiscordBot(commands.Bot):
+# One gateway connection, or every shard in Config.SHARD_IDS (see launcher.py)
+BotBase = commands.AutoShardedBot if Config.AUTO_SHARD else commands.Bot
+
+class DiscordBot(BotBase):
     def __init__(self):
-        # Get all intents
-        intents = discord.Intents.all()
+        # Intents and member/message caching come from Config.INTENTS_PROFILE
+        options = client_options()
+        if Config.AUTO_SHARD:
+            options["shard_count"] = Config.SHARD_COUNT or None
+            options["shard_ids"] = Config.SHARD_IDS or None
         
         # Initialize database first
-        self.db = Database()
+        self.db = TimedDatabase(create_database())
         self.config = Config()
+        self.metrics = CommandMetrics()
+        self.loop_lag = LoopLagMonitor()
+        self.log_sampler = log_sampler
+        self.watchdog = LoopWatchdog(threshold=Config.WATCHDOG_THRESHOLD)
+        self.status_server = None
+        self.prefixes = PrefixResolver(self.db)
+        
+        # Stats from the other cluster processes, when run by launcher.py
+        self.cluster = None
+        if Config.CLUSTER_IPC_URL:
+            self.cluster = ClusterClient(
+                self,
+                Config.CLUSTER_ID,
+                Config.CLUSTER_IPC_URL,
+                Config.CLUSTER_IPC_SECRET,
+                interval=Config.CLUSTER_STATS_INTERVAL
+            )
         
         # Initialize bot with default prefix
         super().__init__(
             command_prefix=get_custom_prefix,
-            intents=intents,
+            **options,
             help_command=None,  # We'll create custom help
             case_insensitive=True
         )
+        
+        self.before_invoke(self.before_command)
+        self.after_invoke(self.after_command)
+        
+        # Reactions and button presses for paginators and confirmations
+        self.router = InteractionRouter(self, max_sessions=Config.UI_MAX_SESSIONS)
+        self._shutdown_task = None
     
     async def setup_hook(self):
         """Load all cogs when bot starts"""
-        cogs = [
-            'cogs.moderation',
-            'cogs.music',
-            'cogs.manga',
-            'cogs.utility',
-            'cogs.admin'
-        ]
-        
-        for cog in cogs:
+        self.prefixes.set_user(self.user.id)
+        
+        # Hosts and container runtimes stop the bot with SIGTERM; close
+        # cleanly so buffered database writes are flushed first
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self.on_sigterm)
+        except (NotImplementedError, RuntimeError):
+            pass  # no signal handlers on Windows event loops
+        
+        started = time.perf_counter()
+        with ExtensionImportTimer(COGS) as import_timer:
+            await asyncio.gather(*(self.load_cog(cog, import_timer) for cog in COGS))
+        logging.info(f'Loaded {len(self.extensions)}/{len(COGS)} cogs in {(time.perf_counter() - started) * 1000:.1f}ms')
+        
+        # Health and metrics endpoints for the orchestrator
+        self.loop_lag.start()
+        if self.cluster is not None:
+            self.cluster.start()
+        if Config.WATCHDOG_ENABLED:
+            self.watchdog.start()
+        if Config.STATUS_PORT:
+            self.status_server = StatusServer(self, Config.STATUS_HOST, Config.STATUS_PORT)
             try:
-                await self.load_extension(cog)
-                logging.info(f'Loaded cog: {cog}')
-            except Exception as e:
-                logging.error(f'Failed to load cog {cog}: {e}')
+                await self.status_server.start()
+            except OSError as e:
+                logging.error(f'Failed to start status server: {e}')
+                self.status_server = None
+    
+    async def load_cog(self, cog, import_timer):
+        """Load one extension, logging its import and setup time"""
+        started = time.perf_counter()
+        try:
+            await self.load_extension(cog)
+        except Exception as e:
+            logging.error(f'Failed to load cog {cog}: {e}')
+            return
         
-        # Start keep alive task
-        self.keep_alive.start()
+        total = time.perf_counter() - started
+        imported = import_timer.timings.get(cog, 0.0)
+        logging.info(f'Loaded cog: {cog} in {total * 1000:.1f}ms (import {imported * 1000:.1f}ms, setup {(total - imported) * 1000:.1f}ms)')
     
     async def on_ready(self):
         """Called when bot is ready"""
         logging.info(f'{self.user} has connected to Discord!')
-        logging.info(f'Bot is in {len(self.guilds)} guilds')
+        logging.info(f'Bot is in {len(self.guilds)} guilds ({Config.INTENTS_PROFILE} intents profile)')
+        if Config.AUTO_SHARD:
+            logging.info(f'Cluster {Config.CLUSTER_ID} is running shards {sorted(self.shards)} of {self.shard_count}')
+        
+        # Warm the prefix map so messages don't wait on the database
+        try:
+            loaded = await self.prefixes.load()
+            logging.info(f'Loaded {loaded} guild prefixes')
+        except Exception as e:
+            logging.error(f'Failed to load guild prefixes: {e}')
         
         # Set bot status
         await self.change_presence(
@@ -86,31 +174,54 @@ class DiscordBot(commands.Bot):
         """Called when bot joins a new guild"""
         logging.info(f'Joined new guild: {guild.name} (ID: {guild.id})')
         await self.db.add_guild(guild.id)
+        self.prefixes.invalidate(guild.id)
     
     async def on_guild_remove(self, guild):
         """Called when bot leaves a guild"""
         logging.info(f'Left guild: {guild.name} (ID: {guild.id})')
         await self.db.remove_guild(guild.id)
+        self.prefixes.invalidate(guild.id)
     
     async def on_message(self, message):
         """Called when a message is sent"""
         if message.author.bot:
             return
         
-        # Log messages for debugging
-        logging.info(f'Message from {message.author}: "{message.content[:50]}"')
+        # Drop plain chat before building a Context
+        if not self.prefixes.accepts(message):
+            return
+        
+        # Tag every log line of this message with where it came from
+        set_log_context(
+            guild=message.guild.id if message.guild else None,
+            channel=message.channel.id,
+            user=message.author.id
+        )
         
-        # Get prefix for debugging
-        prefix = await get_custom_prefix(self, message)
-        logging.info(f'Expected prefix: "{prefix}" | Message starts with prefix: {message.content.startswith(prefix)}')
+        # Log messages for debugging
+        logging.debug(f'Message from {message.author}: "{message.content[:50]}"', extra={"category": "message"})
         
         # Process commands
         await self.process_commands(message)
     
+    async def before_command(self, ctx):
+        """Tag logs with the command and start timing it"""
+        set_log_context(command=ctx.command.qualified_name)
+        ctx.timing = self.metrics.start()
+    
+    async def after_command(self, ctx):
+        """Record how long the command took (runs even if it raised)"""
+        timing = getattr(ctx, 'timing', None)
+        if timing is not None:
+            self.metrics.finish(ctx.command.qualified_name, timing)
+    
     async def on_command_error(self, ctx, error):
         """Global error handler"""
+        if ctx.command is not None and not isinstance(error, USAGE_ERRORS):
+            self.metrics.record_error(ctx.command.qualified_name)
+        
         if isinstance(error, commands.CommandNotFound):
-            logging.info(f'Command not found: {ctx.message.content}')
+            logging.info(f'Command not found: {ctx.message.content}', extra={"category": "command_not_found"})
             return
         
         if isinstance(error, commands.MissingPermissions):
@@ -132,7 +243,11 @@ class DiscordBot(commands.Bot):
             return
         
         # Log other errors
-        logging.error(f'Command error in {ctx.command}: {error}')
+        logging.error(
+            f'Command error in {ctx.command}: {error}',
+            exc_info=error,
+            extra={"category": "command_error"}
+        )
         
         embed = discord.Embed(
             title="❌ An Error Occurred",
@@ -141,17 +256,32 @@ class DiscordBot(commands.Bot):
         )
         await ctx.send(embed=embed)
     
-    @tasks.loop(minutes=30)
-    async def keep_alive(self):
-        """Keep bot alive by logging status"""
-        logging.info(f'Bot is alive! Latency: {round(self.latency * 1000)}ms')
+    def on_sigterm(self):
+        """Shut down like Ctrl+C does, flushing the database on the way"""
+        if self._shutdown_task is None and not self.is_closed():
+            logging.info('Received SIGTERM, shutting down')
+            self._shutdown_task = asyncio.get_running_loop().create_task(self.close())
     
-    @keep_alive.before_loop
-    async def before_keep_alive(self):
-        await self.wait_until_ready()
+    async def close(self):
+        """Flush pending database writes before shutting down"""
+        if self.status_server is not None:
+            await self.status_server.stop()
+        self.loop_lag.stop()
+        self.watchdog.stop()
+        if self.cluster is not None:
+            await self.cluster.stop()
+        try:
+            await self.db.close()
+        except Exception as e:
+            logging.error(f'Failed to flush database: {e}')
+        await super().close()
 
 # Run the bot
 if __name__ == "__main__":
+    if "--profile-startup" in sys.argv:
+        # Print where import time goes, without connecting to Discord
+        exit(profile_startup(["main"] + COGS))
+    
     bot = DiscordBot()
     
     # Get token from environment
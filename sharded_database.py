@@ -0,0 +1,377 @@
+import asyncio
+import contextlib
+import contextvars
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from config import Config
+from database import Transaction
+from utils.persistence import WriteBehind, atomic_write
+from utils.records import GuildSettings, WarningEntry, to_timestamp
+from utils import serializers
+from utils.warnings_index import GuildWarnings
+
+# Rough serialized size of one guild's settings, used for the memory estimate
+GUILD_SIZE = 90
+# ...and of one warning, excluding its reason
+WARNING_SIZE = 70
+
+def empty_shard():
+    """Data stored for one guild"""
+    return {"guild": None, "warnings": GuildWarnings()}
+
+def new_guild():
+    """Default settings for a guild"""
+    return GuildSettings(created_at=datetime.now().isoformat())
+
+def split_json(json_file, shard_dir, serializer):
+    """Split the single-file JSON database into per-guild shards (one-shot)"""
+    with open(json_file, 'rb') as f:
+        data = serializers.loads(f.read())
+
+    shards = {}
+    for guild_id, guild in data.get("guilds", {}).items():
+        shards.setdefault(guild_id, {"guild": None, "warnings": {}})["guild"] = guild
+    for key, warnings in data.get("warnings", {}).items():
+        guild_id, user_id = key.split("_", 1)
+        shards.setdefault(guild_id, {"guild": None, "warnings": {}})["warnings"][user_id] = warnings
+
+    os.makedirs(shard_dir, exist_ok=True)
+    for guild_id, shard in shards.items():
+        atomic_write(os.path.join(shard_dir, f"{guild_id}.json"), serializer.dumps(shard))
+
+    return len(shards)
+
+class ShardedDatabase:
+    """JSON database split into one file per guild
+
+    Guild shards are loaded on first use and kept in an LRU cache. Once
+    the estimated size of the loaded shards passes the memory budget the
+    least recently used clean shards are evicted, so resident memory
+    follows the number of active guilds rather than the total.
+    """
+
+    def __init__(self, shard_dir=None, memory_budget=None):
+        self.shard_dir = shard_dir or Config.DATABASE_SHARD_DIR
+        self.memory_budget = memory_budget or Config.DATABASE_SHARD_MEMORY_BUDGET
+        self.serializer = serializers.get_serializer(Config.DATABASE_FORMAT)
+
+        if not os.path.isdir(self.shard_dir) and os.path.exists(Config.DATABASE_FILE):
+            split_json(Config.DATABASE_FILE, self.shard_dir, self.serializer)
+        os.makedirs(self.shard_dir, exist_ok=True)
+
+        self.shards = OrderedDict()
+        self.sizes = {}
+        self.dirty = set()
+        self.resident_bytes = 0
+        self.cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._loading = {}
+        self._transaction = contextvars.ContextVar(f"sharded-transaction-{id(self)}", default=None)
+        self._write_lock = asyncio.Lock()
+
+        self.writer = WriteBehind(
+            self.snapshot_dirty,
+            self.write_shards,
+            delay=Config.DATABASE_FLUSH_DELAY,
+            name="sharded database"
+        )
+
+    def shard_path(self, guild_id):
+        return os.path.join(self.shard_dir, f"{guild_id}.json")
+
+    def read_shard(self, guild_id):
+        """Read a shard from disk (runs on the writer thread)"""
+        try:
+            with open(self.shard_path(guild_id), 'rb') as f:
+                payload = f.read()
+        except FileNotFoundError:
+            return empty_shard(), 0
+
+        data = serializers.loads(payload)
+        shard = {
+            "guild": GuildSettings.from_dict(data["guild"]) if data["guild"] is not None else None,
+            "warnings": GuildWarnings.from_dict(data["warnings"])
+        }
+        return shard, len(payload)
+
+    async def _shard(self, guild_id):
+        """Get the shard for a guild, loading it if needed"""
+        guild_id = str(guild_id)
+        shard = self.shards.get(guild_id)
+        if shard is not None:
+            self.shards.move_to_end(guild_id)
+            self.cache_stats["hits"] += 1
+            return shard
+
+        # Concurrent lookups for a cold guild share one read
+        loading = self._loading.get(guild_id)
+        if loading is None:
+            self.cache_stats["misses"] += 1
+            # Reads go through the writer thread so they never overtake a pending write
+            loading = asyncio.ensure_future(self.writer.submit(self.read_shard, guild_id))
+            self._loading[guild_id] = loading
+            try:
+                shard, size = await loading
+            finally:
+                del self._loading[guild_id]
+
+            self.shards[guild_id] = shard
+            self._resize(guild_id, size)
+            self.evict()
+            return shard
+
+        await loading
+        return await self._shard(guild_id)
+
+    def _resize(self, guild_id, size):
+        self.resident_bytes += size - self.sizes.get(guild_id, 0)
+        self.sizes[guild_id] = size
+
+    def _changed(self, guild_id, delta=0):
+        """Mark a shard dirty and adjust its size estimate by delta bytes"""
+        self.dirty.add(guild_id)
+        if delta:
+            self._resize(guild_id, max(self.sizes.get(guild_id, 0) + delta, 0))
+        self.writer.mark_dirty()
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        """Group mutations: applied in memory as they happen, persisted once on
+        exit and rolled back if the block raises. Nested blocks join the outer one.
+
+        One writer at a time: writes from other tasks wait until the
+        transaction ends, so rolling back can't undo anyone else's change.
+        Reads are not isolated; other tasks may see its changes before it commits.
+        """
+        if self._transaction.get() is not None:
+            yield
+            return
+
+        async with self._write_lock:
+            transaction = Transaction()
+            token = self._transaction.set(transaction)
+            self.writer.hold()
+            try:
+                yield
+            except BaseException:
+                transaction.rollback()
+                raise
+            finally:
+                self._transaction.reset(token)
+                self.writer.release()
+
+    batch = transaction
+
+    @contextlib.asynccontextmanager
+    async def _writing(self):
+        """Make a write wait for another task's transaction to finish"""
+        if self._transaction.get() is not None:
+            yield
+            return
+        async with self._write_lock:
+            yield
+
+    def _track(self, undo):
+        """Remember how to revert a change if it happens inside a transaction"""
+        transaction = self._transaction.get()
+        if transaction is not None:
+            transaction.undo.append(undo)
+
+    def _track_guild(self, shard, field=None):
+        """Remember how to revert a change to a shard's guild (only field, if given)"""
+        guild = shard["guild"]
+        if guild is None or field is None:
+            self._track(lambda: shard.__setitem__("guild", guild))
+        else:
+            previous = getattr(guild, field)
+            self._track(lambda: setattr(guild, field, previous))
+
+    def evict(self):
+        """Drop least recently used clean shards until within the memory budget"""
+        if self.resident_bytes <= self.memory_budget:
+            return
+
+        # The most recently used shard is never evicted: a caller is about to use it
+        for guild_id in list(self.shards)[:-1]:
+            if self.resident_bytes <= self.memory_budget:
+                break
+            if guild_id in self.dirty:
+                continue
+            del self.shards[guild_id]
+            self.resident_bytes -= self.sizes.pop(guild_id, 0)
+            self.cache_stats["evictions"] += 1
+
+    def snapshot_dirty(self):
+        """Copy every dirty shard so it can be written off the loop"""
+        snapshot = {}
+        for guild_id in self.dirty:
+            shard = self.shards[guild_id]
+            snapshot[guild_id] = {
+                "guild": shard["guild"].copy() if shard["guild"] is not None else None,
+                "warnings": shard["warnings"].to_dict()
+            }
+        self.dirty = set()
+        return snapshot
+
+    def write_shards(self, snapshot):
+        """Write changed shards, removing the ones that became empty"""
+        for guild_id, shard in snapshot.items():
+            path = self.shard_path(guild_id)
+            if shard["guild"] is None and not shard["warnings"]:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+
+            atomic_write(path, self.serializer.dumps(shard))
+
+    def save_data(self):
+        """Schedule a background save of the dirty shards"""
+        self.writer.mark_dirty()
+
+    async def flush(self):
+        """Write any pending changes to disk immediately"""
+        await self.writer.flush()
+        self.evict()
+
+    async def close(self):
+        """Flush pending changes and stop the background writer"""
+        await self.writer.close()
+
+    @property
+    def stats(self):
+        """Persistence and shard cache counters"""
+        return dict(
+            self.writer.stats,
+            loaded_shards=len(self.shards),
+            resident_bytes=self.resident_bytes,
+            **self.cache_stats
+        )
+
+    async def add_guild(self, guild_id):
+        """Add a new guild to database"""
+        guild_id = str(guild_id)
+        async with self._writing():
+            shard = await self._shard(guild_id)
+            if shard["guild"] is None:
+                self._track_guild(shard)
+                shard["guild"] = new_guild()
+                self._changed(guild_id, GUILD_SIZE)
+
+    async def remove_guild(self, guild_id):
+        """Remove guild from database"""
+        guild_id = str(guild_id)
+        async with self._writing():
+            shard = await self._shard(guild_id)
+            if shard["guild"] is not None:
+                self._track_guild(shard)
+                shard["guild"] = None
+                self._changed(guild_id, -GUILD_SIZE)
+
+    async def get_guild_prefix(self, guild_id):
+        """Get guild prefix"""
+        guild = (await self._shard(guild_id))["guild"]
+        return guild.prefix if guild is not None else "x!"
+
+    async def get_guild_prefixes(self):
+        """Get the prefixes of guilds currently in memory as {guild_id: prefix}
+
+        Shards on disk are not loaded for this; their prefixes are read on first use.
+        """
+        return {
+            int(guild_id): shard["guild"].prefix
+            for guild_id, shard in self.shards.items()
+            if shard["guild"] is not None
+        }
+
+    async def set_guild_prefix(self, guild_id, prefix):
+        """Set guild prefix"""
+        guild_id = str(guild_id)
+        async with self._writing():
+            shard = await self._shard(guild_id)
+            self._track_guild(shard, "prefix")
+            delta = 0
+            if shard["guild"] is None:
+                shard["guild"] = new_guild()
+                delta = GUILD_SIZE
+            shard["guild"].prefix = prefix
+            self._changed(guild_id, delta)
+
+    async def get_log_channel(self, guild_id):
+        """Get log channel for guild"""
+        guild = (await self._shard(guild_id))["guild"]
+        return guild.log_channel if guild is not None else None
+
+    async def set_log_channel(self, guild_id, channel_id):
+        """Set log channel for guild"""
+        guild_id = str(guild_id)
+        async with self._writing():
+            shard = await self._shard(guild_id)
+            self._track_guild(shard, "log_channel")
+            delta = 0
+            if shard["guild"] is None:
+                shard["guild"] = new_guild()
+                delta = GUILD_SIZE
+            shard["guild"].log_channel = channel_id
+            self._changed(guild_id, delta)
+
+    async def add_warning(self, guild_id, user_id, moderator_id, reason):
+        """Add warning to user"""
+        guild_id = str(guild_id)
+        warning = WarningEntry(moderator_id, reason, time.time())
+        async with self._writing():
+            shard = await self._shard(guild_id)
+            count = shard["warnings"].add(str(user_id), warning)
+            self._track(lambda: shard["warnings"].discard(str(user_id), warning))
+            self._changed(guild_id, WARNING_SIZE + len(reason or ""))
+
+        return count
+
+    async def _user_warnings(self, guild_id, user_id):
+        shard = await self._shard(guild_id)
+        return shard["warnings"].get(str(user_id))
+
+    async def get_warnings(self, guild_id, user_id):
+        """Get user warnings"""
+        warnings = await self._user_warnings(guild_id, user_id)
+        return warnings.entries if warnings else []
+
+    async def get_recent_warnings(self, guild_id, user_id, limit=5):
+        """Get a user's most recent warnings, oldest first"""
+        warnings = await self._user_warnings(guild_id, user_id)
+        return warnings.last(limit) if warnings else []
+
+    async def get_warnings_page(self, guild_id, user_id, offset=0, limit=5):
+        """Get a page of a user's warnings, newest first"""
+        warnings = await self._user_warnings(guild_id, user_id)
+        return warnings.newest(offset, limit) if warnings else []
+
+    async def get_warnings_since(self, guild_id, user_id, since):
+        """Get a user's warnings issued at or after since (datetime or epoch seconds)"""
+        warnings = await self._user_warnings(guild_id, user_id)
+        return warnings.since(to_timestamp(since)) if warnings else []
+
+    async def count_warnings(self, guild_id, user_id, since=None, until=None):
+        """Count a user's warnings, optionally within [since, until)"""
+        warnings = await self._user_warnings(guild_id, user_id)
+        return warnings.count(to_timestamp(since), to_timestamp(until)) if warnings else 0
+
+    async def get_top_offenders(self, guild_id, limit=10, since=None):
+        """Get the most warned users in a guild as (user_id, count) pairs"""
+        shard = await self._shard(guild_id)
+        return [
+            (int(user_id), count)
+            for user_id, count in shard["warnings"].top_offenders(limit, to_timestamp(since))
+        ]
+
+    async def clear_warnings(self, guild_id, user_id):
+        """Clear user warnings"""
+        guild_id = str(guild_id)
+        async with self._writing():
+            shard = await self._shard(guild_id)
+            warnings = shard["warnings"].clear(str(user_id))
+            if warnings is not None:
+                self._track(lambda: shard["warnings"].restore(str(user_id), warnings))
+                self._changed(guild_id, -sum(WARNING_SIZE + len(entry.reason or "") for entry in warnings.entries))
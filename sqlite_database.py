@@ -0,0 +1,393 @@
+import asyncio
+import contextlib
+import contextvars
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from config import Config
+from utils.records import WarningEntry, to_timestamp
+from utils import serializers
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS guilds (
+    guild_id INTEGER PRIMARY KEY,
+    prefix TEXT NOT NULL DEFAULT 'x!',
+    log_channel INTEGER,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS warnings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    moderator_id INTEGER NOT NULL,
+    reason TEXT,
+    timestamp REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_warnings_member ON warnings (guild_id, user_id, timestamp);
+"""
+
+def connect(db_file):
+    """Open a connection with the pragmas the bot relies on"""
+    directory = os.path.dirname(db_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.executescript(SCHEMA)
+    return conn
+
+def migrate_json(conn, json_file):
+    """Copy guilds and warnings from the JSON database into SQLite (one-shot)"""
+    with open(json_file, 'rb') as f:
+        data = serializers.loads(f.read())
+
+    guild_rows = []
+    for guild_id, guild in data.get("guilds", {}).items():
+        guild_rows.append((
+            int(guild_id),
+            guild.get("prefix", "x!"),
+            guild.get("log_channel"),
+            guild.get("created_at") or datetime.now().isoformat()
+        ))
+
+    warning_rows = []
+    for key, warnings in data.get("warnings", {}).items():
+        guild_id, user_id = key.split("_", 1)
+        for warning in warnings:
+            warning_rows.append((
+                int(guild_id),
+                int(user_id),
+                warning["moderator_id"],
+                warning.get("reason"),
+                to_timestamp(warning["timestamp"])
+            ))
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(
+            "INSERT OR IGNORE INTO guilds (guild_id, prefix, log_channel, created_at) VALUES (?, ?, ?, ?)",
+            guild_rows
+        )
+        conn.executemany(
+            "INSERT INTO warnings (guild_id, user_id, moderator_id, reason, timestamp) VALUES (?, ?, ?, ?, ?)",
+            warning_rows
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from', ?)",
+            (os.path.abspath(json_file),)
+        )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+    return len(guild_rows), len(warning_rows)
+
+class SQLiteDatabase:
+    """SQLite-backed database with the same async API as Database
+
+    All queries run on a single dedicated thread that owns the
+    connections, so the event loop never waits on disk I/O.
+    """
+
+    def __init__(self, db_file=None, json_file=None):
+        self.db_file = db_file or Config.SQLITE_DATABASE_FILE
+        self.json_file = json_file or Config.DATABASE_FILE
+        self.stats = {
+            "requests": 0,
+            "flushes": 0,
+            "merged": 0,
+            "errors": 0,
+            "last_flush_ms": 0.0,
+            "flush_seconds": 0.0,
+        }
+
+        self._pending_writes = 0
+        self._write_lock = asyncio.Lock()
+        self._transaction = contextvars.ContextVar(f"sqlite-transaction-{id(self)}", default=False)
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-database")
+        self.conn = self._executor.submit(connect, self.db_file).result()
+        self._executor.submit(self._migrate_if_needed).result()
+        # Reads from outside a transaction use their own connection, so they
+        # only ever see committed rows (WAL lets it read while a write is open)
+        self.read_conn = self._executor.submit(connect, self.db_file).result()
+
+    def _migrate_if_needed(self):
+        """Import the JSON database the first time the SQLite file is used"""
+        if self.conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_from'").fetchone():
+            return
+        if self.conn.execute("SELECT 1 FROM guilds LIMIT 1").fetchone():
+            return
+        if os.path.exists(self.json_file):
+            migrate_json(self.conn, self.json_file)
+
+    async def _run(self, func, *args):
+        """Run a blocking function on the database thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def _read(self, func, *args):
+        """Run a query on the database thread, passing it the connection to read from"""
+        # Inside its own transaction a task reads its uncommitted writes
+        conn = self.conn if self._transaction.get() else self.read_conn
+        return await self._run(func, conn, *args)
+
+    async def _execute(self, func, *args):
+        """Run a write on the database thread; outside transactions writes take turns"""
+        if self._transaction.get():
+            return await self._run(func, *args)
+        async with self._write_lock:
+            return await self._run(func, *args)
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        """Group mutations into one SQLite transaction, committed once on exit
+        and rolled back if the block raises. Nested blocks join the outer one.
+
+        One writer at a time: writes from other tasks wait until the
+        transaction ends, and their reads don't see its changes before then.
+        """
+        if self._transaction.get():
+            yield
+            return
+
+        async with self._write_lock:
+            token = self._transaction.set(True)
+            await self._run(self.conn.execute, "BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                await self._run(self._rollback)
+                raise
+            finally:
+                self._transaction.reset(token)
+            await self._run(self._commit)
+
+    batch = transaction
+
+    def _commit(self):
+        started = time.perf_counter()
+        try:
+            self.conn.execute("COMMIT")
+        except sqlite3.Error:
+            self.stats["errors"] += 1
+            self.conn.execute("ROLLBACK")
+            raise
+        self.stats["flushes"] += 1
+        self.stats["merged"] += max(self._pending_writes - 1, 0)
+        self._record_flush(started)
+        self._pending_writes = 0
+
+    def _record_flush(self, started):
+        elapsed = time.perf_counter() - started
+        self.stats["last_flush_ms"] = elapsed * 1000
+        self.stats["flush_seconds"] += elapsed
+
+    def _rollback(self):
+        self.conn.execute("ROLLBACK")
+        self._pending_writes = 0
+
+    def _write(self, sql, params=()):
+        started = time.perf_counter()
+        self.stats["requests"] += 1
+        try:
+            cursor = self.conn.execute(sql, params)
+        except sqlite3.Error:
+            self.stats["errors"] += 1
+            raise
+
+        if self.conn.in_transaction:
+            # Persisted by the COMMIT at the end of the transaction
+            self._pending_writes += 1
+        else:
+            self.stats["flushes"] += 1
+            self._record_flush(started)
+        return cursor.rowcount
+
+    def _fetchone(self, conn, sql, params=()):
+        return conn.execute(sql, params).fetchone()
+
+    def _fetchall(self, conn, sql, params=()):
+        return conn.execute(sql, params).fetchall()
+
+    def _add_warning(self, guild_id, user_id, moderator_id, reason, timestamp):
+        self._write(
+            "INSERT INTO warnings (guild_id, user_id, moderator_id, reason, timestamp) VALUES (?, ?, ?, ?, ?)",
+            (guild_id, user_id, moderator_id, reason, timestamp)
+        )
+        row = self.conn.execute(
+            "SELECT COUNT(*) FROM warnings WHERE guild_id = ? AND user_id = ?",
+            (guild_id, user_id)
+        ).fetchone()
+        return row[0]
+
+    def _fetch_warnings(self, conn, sql, params):
+        return [
+            WarningEntry(row["moderator_id"], row["reason"], row["timestamp"])
+            for row in conn.execute(sql, params).fetchall()
+        ]
+
+    def _top_offenders(self, conn, guild_id, limit, since):
+        rows = conn.execute(
+            "SELECT user_id, COUNT(*) FROM warnings WHERE guild_id = ? AND timestamp >= ? "
+            "GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT ?",
+            (guild_id, since if since is not None else float('-inf'), limit)
+        ).fetchall()
+        return [(row[0], row[1]) for row in rows]
+
+    async def add_guild(self, guild_id):
+        """Add a new guild to database"""
+        await self._execute(
+            self._write,
+            "INSERT OR IGNORE INTO guilds (guild_id, prefix, log_channel, created_at) VALUES (?, 'x!', NULL, ?)",
+            (int(guild_id), datetime.now().isoformat())
+        )
+
+    async def remove_guild(self, guild_id):
+        """Remove guild from database"""
+        await self._execute(self._write, "DELETE FROM guilds WHERE guild_id = ?", (int(guild_id),))
+
+    async def get_guild_prefix(self, guild_id):
+        """Get guild prefix"""
+        row = await self._read(self._fetchone, "SELECT prefix FROM guilds WHERE guild_id = ?", (int(guild_id),))
+        return row["prefix"] if row else "x!"
+
+    async def get_guild_prefixes(self):
+        """Get every stored guild prefix as {guild_id: prefix}"""
+        rows = await self._read(self._fetchall, "SELECT guild_id, prefix FROM guilds")
+        return {row["guild_id"]: row["prefix"] for row in rows}
+
+    async def set_guild_prefix(self, guild_id, prefix):
+        """Set guild prefix"""
+        await self._execute(
+            self._write,
+            "INSERT INTO guilds (guild_id, prefix, log_channel, created_at) VALUES (?, ?, NULL, ?) "
+            "ON CONFLICT(guild_id) DO UPDATE SET prefix = excluded.prefix",
+            (int(guild_id), prefix, datetime.now().isoformat())
+        )
+
+    async def get_log_channel(self, guild_id):
+        """Get log channel for guild"""
+        row = await self._read(self._fetchone, "SELECT log_channel FROM guilds WHERE guild_id = ?", (int(guild_id),))
+        return row["log_channel"] if row else None
+
+    async def set_log_channel(self, guild_id, channel_id):
+        """Set log channel for guild"""
+        await self._execute(
+            self._write,
+            "INSERT INTO guilds (guild_id, prefix, log_channel, created_at) VALUES (?, 'x!', ?, ?) "
+            "ON CONFLICT(guild_id) DO UPDATE SET log_channel = excluded.log_channel",
+            (int(guild_id), channel_id, datetime.now().isoformat())
+        )
+
+    async def add_warning(self, guild_id, user_id, moderator_id, reason):
+        """Add warning to user"""
+        return await self._execute(
+            self._add_warning,
+            int(guild_id), int(user_id), moderator_id, reason, time.time()
+        )
+
+    async def get_warnings(self, guild_id, user_id):
+        """Get user warnings"""
+        return await self._read(
+            self._fetch_warnings,
+            "SELECT moderator_id, reason, timestamp FROM warnings "
+            "WHERE guild_id = ? AND user_id = ? ORDER BY timestamp, id",
+            (int(guild_id), int(user_id))
+        )
+
+    async def get_recent_warnings(self, guild_id, user_id, limit=5):
+        """Get a user's most recent warnings, oldest first"""
+        warnings = await self._read(
+            self._fetch_warnings,
+            "SELECT moderator_id, reason, timestamp FROM warnings "
+            "WHERE guild_id = ? AND user_id = ? ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (int(guild_id), int(user_id), limit)
+        )
+        warnings.reverse()
+        return warnings
+
+    async def get_warnings_page(self, guild_id, user_id, offset=0, limit=5):
+        """Get a page of a user's warnings, newest first"""
+        return await self._read(
+            self._fetch_warnings,
+            "SELECT moderator_id, reason, timestamp FROM warnings "
+            "WHERE guild_id = ? AND user_id = ? ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?",
+            (int(guild_id), int(user_id), limit, offset)
+        )
+
+    async def get_warnings_since(self, guild_id, user_id, since):
+        """Get a user's warnings issued at or after since (datetime or epoch seconds)"""
+        return await self._read(
+            self._fetch_warnings,
+            "SELECT moderator_id, reason, timestamp FROM warnings "
+            "WHERE guild_id = ? AND user_id = ? AND timestamp >= ? ORDER BY timestamp, id",
+            (int(guild_id), int(user_id), to_timestamp(since))
+        )
+
+    async def count_warnings(self, guild_id, user_id, since=None, until=None):
+        """Count a user's warnings, optionally within [since, until)"""
+        row = await self._read(
+            self._fetchone,
+            "SELECT COUNT(*) FROM warnings WHERE guild_id = ? AND user_id = ? AND timestamp >= ? AND timestamp < ?",
+            (
+                int(guild_id),
+                int(user_id),
+                to_timestamp(since) if since is not None else float('-inf'),
+                to_timestamp(until) if until is not None else float('inf')
+            )
+        )
+        return row[0]
+
+    async def get_top_offenders(self, guild_id, limit=10, since=None):
+        """Get the most warned users in a guild as (user_id, count) pairs"""
+        return await self._read(self._top_offenders, int(guild_id), limit, to_timestamp(since))
+
+    async def clear_warnings(self, guild_id, user_id):
+        """Clear user warnings"""
+        await self._execute(
+            self._write,
+            "DELETE FROM warnings WHERE guild_id = ? AND user_id = ?",
+            (int(guild_id), int(user_id))
+        )
+
+    async def flush(self):
+        """Checkpoint the WAL into the main database file"""
+        await self._run(self.conn.execute, "PRAGMA wal_checkpoint(PASSIVE)")
+
+    async def close(self):
+        """Checkpoint and close the connections"""
+        await self.flush()
+        await self._run(self.read_conn.close)
+        await self._run(self.conn.close)
+        self._executor.shutdown(wait=True)
+
+if __name__ == "__main__":
+    # python sqlite_database.py migrate [json_file] [sqlite_file]
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print("Usage: python sqlite_database.py migrate [json_file] [sqlite_file]")
+        sys.exit(1)
+
+    json_file = sys.argv[2] if len(sys.argv) > 2 else Config.DATABASE_FILE
+    sqlite_file = sys.argv[3] if len(sys.argv) > 3 else Config.SQLITE_DATABASE_FILE
+
+    conn = connect(sqlite_file)
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_from'").fetchone():
+        print(f"{sqlite_file} has already been migrated")
+        sys.exit(1)
+
+    guilds, warnings = migrate_json(conn, json_file)
+    conn.close()
+    print(f"Migrated {guilds} guilds and {warnings} warnings from {json_file} to {sqlite_file}")
@@ -0,0 +1,207 @@
+import asyncio
+import json
+import logging
+import sys
+import time
+from collections import OrderedDict
+
+def json_size(value):
+    """Approximate memory cost of an API payload: its compact JSON length"""
+    try:
+        return len(json.dumps(value, separators=(',', ':')))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """Lets concurrent callers asking for the same key share one call
+
+    The first caller for a key runs ``fetch()`` in a task. Callers that
+    arrive while it is running wait for the same task, and all of them
+    get its result or exception. A cancelled caller only cancels the
+    shared call if nobody else is still waiting for it.
+    """
+
+    def __init__(self):
+        self.flights = {}
+        self.stats = {"calls": 0, "shared": 0}
+
+    def __len__(self):
+        return len(self.flights)
+
+    async def do(self, key, fetch):
+        flight = self.flights.get(key)
+        if flight is None:
+            flight = self.flights[key] = _Flight(asyncio.get_running_loop().create_task(fetch()))
+            flight.task.add_done_callback(lambda task: self._done(key, flight))
+            self.stats["calls"] += 1
+        else:
+            self.stats["shared"] += 1
+
+        flight.waiters += 1
+        try:
+            # Shielded, so cancelling one waiter doesn't cancel the others' call
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                # Everyone gave up; later callers start a new call
+                self._done(key, flight)
+                flight.task.cancel()
+
+    def _done(self, key, flight):
+        if self.flights.get(key) is flight:
+            del self.flights[key]
+        if flight.task.done() and not flight.task.cancelled():
+            # Mark the exception as retrieved even if every waiter was cancelled
+            flight.task.exception()
+
+class CacheEntry:
+    __slots__ = ("value", "size", "fresh_until", "stale_until")
+
+    def __init__(self, value, size, fresh_until, stale_until):
+        self.value = value
+        self.size = size
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+class SWRCache:
+    """LRU + TTL cache that serves stale entries while refreshing them
+
+    An entry is fresh for ``ttl`` seconds. After that, and up to
+    ``stale_ttl`` seconds after it was stored, it is still returned
+    immediately while a background task fetches a new value. Results of
+    None ("nothing found") are cached for ``negative_ttl`` seconds and
+    are never served stale.
+
+    Memory is bounded by ``max_entries`` and ``max_bytes``, as measured
+    by ``sizeof``. The least recently used entries are evicted first.
+    Concurrent misses for the same key share a single fetch.
+    """
+
+    def __init__(self, max_entries=512, max_bytes=None, ttl=600, stale_ttl=3600, negative_ttl=120,
+                 sizeof=json_size, name="cache"):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.sizeof = sizeof
+        self.name = name
+
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "evictions": 0,
+        }
+        self._refreshing = {}
+        self.flights = SingleFlight()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """(found, value) for a fresh or stale entry, counting the hit; starts no refresh"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return False, None
+        if time.monotonic() >= entry.stale_until:
+            self._remove(key)
+            return False, None
+
+        self.entries.move_to_end(key)
+        if entry.value is None:
+            self.stats["negative_hits"] += 1
+        elif time.monotonic() < entry.fresh_until:
+            self.stats["hits"] += 1
+        else:
+            self.stats["stale_hits"] += 1
+        return True, entry.value
+
+    def set(self, key, value):
+        now = time.monotonic()
+        if value is None:
+            entry = CacheEntry(None, 0, now + self.negative_ttl, now + self.negative_ttl)
+        else:
+            entry = CacheEntry(value, self.sizeof(value), now + self.ttl, now + max(self.stale_ttl, self.ttl))
+
+        self._remove(key)
+        self.entries[key] = entry
+        self.bytes += entry.size
+        while self.entries and (
+            len(self.entries) > self.max_entries
+            or (self.max_bytes is not None and self.bytes > self.max_bytes)
+        ):
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            self.stats["evictions"] += 1
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything"""
+        if key is None:
+            self.entries.clear()
+            self.bytes = 0
+        else:
+            self._remove(key)
+
+    async def get_or_fetch(self, key, fetch):
+        """Cached value for key, calling ``await fetch()`` on a miss
+
+        Stale values are returned right away and refreshed in the
+        background with ``fetch``. Exceptions from fetch on a miss
+        propagate (to every caller sharing it) and nothing is cached.
+        """
+        found, value = self.get(key)
+        if found:
+            if value is not None and time.monotonic() >= self.entries[key].fresh_until:
+                self._refresh(key, fetch)
+            return value
+
+        self.stats["misses"] += 1
+
+        async def load():
+            value = await fetch()
+            self.set(key, value)
+            return value
+
+        return await self.flights.do(key, load)
+
+    def _refresh(self, key, fetch):
+        if key in self._refreshing:
+            return
+        self.stats["refreshes"] += 1
+        task = asyncio.get_running_loop().create_task(self._run_refresh(key, fetch))
+        self._refreshing[key] = task
+
+    async def _run_refresh(self, key, fetch):
+        try:
+            self.set(key, await fetch())
+        except Exception as e:
+            # Keep serving the stale value until it runs out
+            self.stats["refresh_errors"] += 1
+            logging.warning(f'Refreshing {self.name} entry {key!r} failed: {e}')
+        finally:
+            self._refreshing.pop(key, None)
+
+    def close(self):
+        """Cancel background refreshes"""
+        for task in self._refreshing.values():
+            task.cancel()
+        self._refreshing.clear()
@@ -0,0 +1,168 @@
+import asyncio
+import hmac
+import logging
+import math
+import time
+
+import aiohttp
+from aiohttp import web
+
+from utils.metrics import CommandMetrics
+
+def shard_ranges(shard_count, clusters):
+    """Split shard ids 0..shard_count-1 into ``clusters`` contiguous ranges"""
+    clusters = max(1, min(clusters, shard_count))
+    size, extra = divmod(shard_count, clusters)
+    ranges = []
+    start = 0
+    for cluster_id in range(clusters):
+        end = start + size + (1 if cluster_id < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+class ClusterHub:
+    """Local IPC endpoint run by the launcher
+
+    Each cluster POSTs its stats to /clusters/<id> and gets every
+    cluster's latest stats back in the response, so one request per
+    interval keeps everyone up to date. GET /clusters returns the same
+    view. Requests must carry the shared secret the launcher hands its
+    clusters; the hub only listens on localhost.
+    """
+
+    def __init__(self, secret, host="127.0.0.1", port=8790, stale_after=60):
+        self.secret = secret
+        self.host = host
+        self.port = port
+        self.stale_after = stale_after
+        self.clusters = {}
+        self.runner = None
+
+        self.app = web.Application(middlewares=[self.authenticate])
+        self.app.router.add_get("/clusters", self.get_clusters)
+        self.app.router.add_post("/clusters/{cluster_id}", self.post_cluster)
+
+    @web.middleware
+    async def authenticate(self, request, handler):
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if not hmac.compare_digest(token, self.secret):
+            return web.json_response({"error": "unauthorized"}, status=401)
+        return await handler(request)
+
+    async def start(self):
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        logging.info(f'Cluster hub listening on http://{self.host}:{self.port}')
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    def fresh(self):
+        """Stats of every cluster that reported recently, keyed by cluster id"""
+        cutoff = time.time() - self.stale_after
+        return {
+            cluster_id: stats for cluster_id, stats in self.clusters.items()
+            if stats["received"] >= cutoff
+        }
+
+    async def get_clusters(self, request):
+        return web.json_response({"clusters": self.fresh()})
+
+    async def post_cluster(self, request):
+        try:
+            stats = await request.json()
+        except ValueError:
+            return web.json_response({"error": "invalid JSON"}, status=400)
+        stats["received"] = time.time()
+        self.clusters[request.match_info["cluster_id"]] = stats
+        return web.json_response({"clusters": self.fresh()})
+
+class ClusterClient:
+    """Shares this cluster's stats with the others through the launcher's hub
+
+    Pushes local stats every ``interval`` seconds and keeps the latest
+    stats of every cluster, for totals (``total``) and cluster-wide
+    command metrics (``merged_metrics``). If the hub can't be reached
+    the numbers just go stale; nothing here blocks commands.
+    """
+
+    def __init__(self, bot, cluster_id, url, secret, interval=10):
+        self.bot = bot
+        self.cluster_id = str(cluster_id)
+        self.url = url.rstrip("/")
+        self.secret = secret
+        self.interval = interval
+        self.clusters = {}
+        self.session = None
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self.session = aiohttp.ClientSession(
+                headers={"Authorization": f"Bearer {self.secret}"},
+                timeout=aiohttp.ClientTimeout(total=5)
+            )
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.push()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logging.warning(f'Could not reach the cluster hub: {e}')
+            await asyncio.sleep(self.interval)
+
+    async def push(self):
+        """Send this cluster's stats and store everyone's"""
+        async with self.session.post(f"{self.url}/clusters/{self.cluster_id}", json=self.collect()) as response:
+            response.raise_for_status()
+            self.clusters = (await response.json())["clusters"]
+
+    def counts(self):
+        """Cheap local numbers, also used in place of this cluster's last push"""
+        bot = self.bot
+        latency = bot.latency
+        return {
+            "guilds": len(bot.guilds),
+            "users": sum(guild.member_count or 0 for guild in bot.guilds),
+            "voice": len(bot.voice_clients),
+            "shards": sorted(bot.shards) if hasattr(bot, "shards") else [],
+            "latency": latency if math.isfinite(latency) else None,
+        }
+
+    def collect(self):
+        stats = self.counts()
+        stats["commands"] = self.bot.metrics.to_state()
+        stats["sent"] = time.time()
+        return stats
+
+    def _current(self):
+        clusters = dict(self.clusters)
+        clusters[self.cluster_id] = dict(clusters.get(self.cluster_id, {}), **self.counts())
+        return clusters
+
+    def total(self, key):
+        """Sum a count (guilds, users, voice) across clusters"""
+        return sum(stats.get(key) or 0 for stats in self._current().values())
+
+    def merged_metrics(self):
+        """CommandMetrics combining every cluster's command histograms"""
+        merged = CommandMetrics()
+        clusters = dict(self.clusters)
+        clusters[self.cluster_id] = {"commands": self.bot.metrics.to_state()}
+        for stats in clusters.values():
+            merged.merge_state(stats.get("commands", {}))
+        return merged
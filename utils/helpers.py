@@ -1,7 +1,10 @@
 import discord
 from discord.ext import commands
 import asyncio
+import inspect
 import re
+from collections import OrderedDict
+from itertools import islice
 
 def format_duration(seconds):
     """Format duration in seconds to readable format"""
@@ -60,20 +63,25 @@ async def send_confirmation(ctx, message, timeout=30):
     await confirmation_msg.add_reaction("✅")
     await confirmation_msg.add_reaction("❌")
     
-    def check(reaction, user):
-        return (user == ctx.author and 
-                str(reaction.emoji) in ["✅", "❌"] and 
-                reaction.message.id == confirmation_msg.id)
+    # The bot's reaction router delivers the author's reactions on this message
+    answer = asyncio.get_running_loop().create_future()
     
+    async def on_reaction(payload):
+        emoji = str(payload.emoji)
+        if emoji in ("✅", "❌") and not answer.done():
+            answer.set_result(emoji == "✅")
+    
+    async def on_timeout():
+        if not answer.done():
+            answer.set_result(None)
+    
+    ctx.bot.router.open(confirmation_msg.id, ctx.author.id, on_reaction, timeout=timeout, on_timeout=on_timeout)
     try:
-        reaction, user = await ctx.bot.wait_for('reaction_add', timeout=timeout, check=check)
-        
-        if str(reaction.emoji) == "✅":
-            return True
-        else:
-            return False
-            
-    except asyncio.TimeoutError:
+        confirmed = await answer
+    finally:
+        ctx.bot.router.close(confirmation_msg.id)
+    
+    if confirmed is None:
         embed = discord.Embed(
             title="⏰ Timeout",
             description="Confirmation timed out.",
@@ -81,6 +89,19 @@ async def send_confirmation(ctx, message, timeout=30):
         )
         await confirmation_msg.edit(embed=embed)
         return False
+    
+    return confirmed
+
+async def get_or_fetch_member(guild, user_id):
+    """Get a member from the cache, fetching it from the API if it isn't cached"""
+    member = guild.get_member(user_id)
+    if member is not None:
+        return member
+    
+    try:
+        return await guild.fetch_member(user_id)
+    except (discord.NotFound, discord.HTTPException):
+        return None
 
 def has_higher_role(member1, member2):
     """Check if member1 has a higher role than member2"""
@@ -156,6 +177,148 @@ def get_status_emoji(status):
     }
     return status_emojis.get(str(status), '❓')
 
+class Paginator:
+    """Button paginator that renders pages only when they are shown
+    
+    ``source`` is a sequence of items or an async iterator yielding them
+    (pulled one page at a time, so the total is unknown until it runs
+    out). A sequence's slices may be awaitable, so pages can be queried
+    from the database only when shown. ``render(items, start)`` builds the embed for one page's items,
+    ``start`` being the index of the first one; it may be a coroutine
+    function. The last few rendered pages are kept in a small LRU.
+    
+    Button presses come through the bot's interaction router. A cached
+    page is answered with a single interaction response; one that has to
+    be rendered is deferred first and edited in once it is ready.
+    """
+    
+    def __init__(self, source, render, per_page=10, timeout=60, cache_size=4):
+        self.source = source
+        self.render = render
+        self.per_page = per_page
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.page = 0
+        self.message = None
+        self.pages = OrderedDict()
+        
+        self.is_async = hasattr(source, "__aiter__")
+        if self.is_async:
+            self._iterator = source.__aiter__()
+            self._buffer = []
+            self._exhausted = False
+    
+    @property
+    def page_count(self):
+        """Number of pages, or None while an async source hasn't been read to the end"""
+        if self.is_async:
+            if not self._exhausted:
+                return None
+            total = len(self._buffer)
+        else:
+            total = len(self.source)
+        return max((total - 1) // self.per_page + 1, 1)
+    
+    async def _items(self, page):
+        start = page * self.per_page
+        stop = start + self.per_page
+        if not self.is_async:
+            try:
+                items = self.source[start:stop]
+            except TypeError:  # e.g. deque
+                return list(islice(self.source, start, stop))
+            if inspect.isawaitable(items):
+                items = await items
+            return items
+        
+        # Read one item past the page so we know whether there is a next one
+        while not self._exhausted and len(self._buffer) <= stop:
+            try:
+                self._buffer.append(await self._iterator.__anext__())
+            except StopAsyncIteration:
+                self._exhausted = True
+        return self._buffer[start:stop]
+    
+    def _has_next(self):
+        if self.is_async and not self._exhausted:
+            return len(self._buffer) > (self.page + 1) * self.per_page
+        return self.page + 1 < self.page_count
+    
+    async def get_page(self, page):
+        """Rendered embed for a page, from the LRU if it was shown recently"""
+        embed = self.pages.get(page)
+        if embed is not None:
+            self.pages.move_to_end(page)
+            return embed
+        
+        embed = self.render(await self._items(page), page * self.per_page)
+        if inspect.isawaitable(embed):
+            embed = await embed
+        
+        total = self.page_count
+        footer = f"Page {page + 1}/{total if total is not None else '?'}"
+        if embed.footer.text:
+            footer = f"{embed.footer.text} • {footer}"
+        embed.set_footer(text=footer)
+        
+        # Footers of an async source's pages change once its end is known
+        if total is not None:
+            self.pages[page] = embed
+            if len(self.pages) > self.cache_size:
+                self.pages.popitem(last=False)
+        return embed
+    
+    def view(self):
+        """Buttons for the current page (layout only; presses go through the router)"""
+        view = discord.ui.View(timeout=None)
+        view.add_item(discord.ui.Button(emoji="◀️", custom_id="paginator:prev", disabled=self.page == 0))
+        view.add_item(discord.ui.Button(emoji="▶️", custom_id="paginator:next", disabled=not self._has_next()))
+        view.add_item(discord.ui.Button(emoji="⏹️", custom_id="paginator:stop", style=discord.ButtonStyle.danger))
+        # A finished view isn't registered with discord.py's own dispatcher
+        view.stop()
+        return view
+    
+    async def start(self, ctx):
+        """Send the first page and start listening for button presses"""
+        embed = await self.get_page(0)
+        if not self._has_next():
+            self.message = await ctx.send(embed=embed)
+            return self.message
+        
+        self.message = await ctx.send(embed=embed, view=self.view())
+        ctx.bot.router.open(self.message.id, ctx.author.id, self.on_event, timeout=self.timeout, on_timeout=self.on_timeout)
+        return self.message
+    
+    async def on_event(self, event):
+        if not isinstance(event, discord.Interaction):
+            return
+        
+        action = (event.data or {}).get("custom_id")
+        if action == "paginator:stop":
+            event.client.router.close(self.message.id)
+            return await event.response.edit_message(view=None)
+        
+        if action == "paginator:next" and self._has_next():
+            self.page += 1
+        elif action == "paginator:prev" and self.page > 0:
+            self.page -= 1
+        
+        if self.page in self.pages:
+            embed = await self.get_page(self.page)
+            return await event.response.edit_message(embed=embed, view=self.view())
+        
+        # Rendering may query the database; acknowledge within Discord's 3 s deadline first
+        await event.response.defer()
+        embed = await self.get_page(self.page)
+        await event.edit_original_response(embed=embed, view=self.view())
+    
+    async def on_timeout(self):
+        # Remove the buttons once nobody is using them
+        try:
+            await self.message.edit(view=None)
+        except discord.HTTPException:
+            pass
+
 async def paginate_content(ctx, content_list, title="Content", items_per_page=10):
     """Paginate content across multiple embeds"""
     if not content_list:
@@ -166,58 +329,18 @@ async def paginate_content(ctx, content_list, title="Content", items_per_page=10
         )
         return await ctx.send(embed=embed)
     
-    pages = []
-    for i in range(0, len(content_list), items_per_page):
-        page_content = content_list[i:i + items_per_page]
-        
+    def render(items, start):
         embed = discord.Embed(
             title=title,
             color=discord.Color.blue()
         )
         
-        for j, item in enumerate(page_content, start=i + 1):
+        for j, item in enumerate(items, start=start + 1):
             embed.add_field(
                 name=f"{j}. {item.get('name', 'Item')}",
                 value=item.get('value', 'No description'),
                 inline=False
             )
-        
-        embed.set_footer(text=f"Page {len(pages) + 1}/{(len(content_list) - 1) // items_per_page + 1}")
-        pages.append(embed)
-    
-    if len(pages) == 1:
-        return await ctx.send(embed=pages[0])
+        return embed
     
-    # Multi-page pagination
-    current_page = 0
-    message = await ctx.send(embed=pages[current_page])
-    
-    await message.add_reaction("◀️")
-    await message.add_reaction("▶️")
-    
-    def check(reaction, user):
-        return (user == ctx.author and 
-                str(reaction.emoji) in ["◀️", "▶️"] and 
-                reaction.message.id == message.id)
-    
-    while True:
-        try:
-            reaction, user = await ctx.bot.wait_for('reaction_add', timeout=60, check=check)
-            
-            if str(reaction.emoji) == "▶️" and current_page < len(pages) - 1:
-                current_page += 1
-                await message.edit(embed=pages[current_page])
-            elif str(reaction.emoji) == "◀️" and current_page > 0:
-                current_page -= 1
-                await message.edit(embed=pages[current_page])
-            
-            await message.remove_reaction(reaction, user)
-            
-        except asyncio.TimeoutError:
-            break
-    
-    # Remove reactions after timeout
-    try:
-        await message.clear_reactions()
-    except:
-        pass
+    return await Paginator(content_list, render, per_page=items_per_page).start(ctx)
@@ -0,0 +1,36 @@
+import discord
+from config import Config
+
+def _flags(cls, names):
+    """Build ``cls`` (Intents or MemberCacheFlags) from "all" or a list of flag names"""
+    if names == "all":
+        return cls.all()
+    flags = cls.none()
+    for name in names:
+        setattr(flags, name, True)
+    return flags
+
+def client_options(profile=None):
+    """Client keyword arguments for one of Config.INTENT_PROFILES
+
+    Returns intents, member_cache_flags, max_messages and
+    chunk_guilds_at_startup, ready to pass to commands.Bot.
+    """
+    profile = profile or Config.INTENTS_PROFILE
+    if profile not in Config.INTENT_PROFILES:
+        raise ValueError(f"Unknown intents profile {profile!r} (expected one of {', '.join(Config.INTENT_PROFILES)})")
+    settings = Config.INTENT_PROFILES[profile]
+
+    intents = _flags(discord.Intents, settings["intents"])
+    if settings["member_cache"] == "all":
+        # Everything the intents allow (voice needs voice_states, joined needs members)
+        member_cache_flags = discord.MemberCacheFlags.from_intents(intents)
+    else:
+        member_cache_flags = _flags(discord.MemberCacheFlags, settings["member_cache"])
+
+    return {
+        "intents": intents,
+        "member_cache_flags": member_cache_flags,
+        "max_messages": settings["max_messages"],
+        "chunk_guilds_at_startup": settings["chunk_guilds_at_startup"] and intents.members,
+    }
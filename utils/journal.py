@@ -0,0 +1,193 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from utils.persistence import WriteBehind
+from utils.records import encode_record
+
+class Journal:
+    """Append-only JSONL journal of database mutations
+
+    Every mutation is appended as one small record tagged with a sequence
+    number and the time it was written. Once the journal grows past ``max_bytes`` or its oldest record
+    is older than ``max_age`` seconds, it is folded into a fresh snapshot
+    (written by ``write_snapshot``) and truncated. Snapshots store the
+    last sequence number they contain, so records that survive a crash
+    between the two steps are skipped on replay.
+    """
+
+    def __init__(self, path, snapshot, write_snapshot, max_bytes=1024 * 1024,
+                 max_age=3600, delay=1.0, check_interval=60):
+        self.path = path
+        self.snapshot = snapshot
+        self.write_snapshot = write_snapshot
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.check_interval = check_interval
+
+        self.seq = 0
+        # Bytes in the journal file plus those queued for it; only changed on the event loop
+        self.size = 0
+        self.oldest_record_at = None
+        self.compactions = 0
+        self.pending = []
+        # Open transactions; compaction waits until they are committed
+        self.holds = 0
+
+        self.writer = WriteBehind(self._take_pending, self._append, delay=delay, name="database journal")
+        self._compactor = None
+        self._compacting = False
+
+    def replay(self, after_seq=0):
+        """Yield journal records newer than the snapshot, dropping a torn tail"""
+        self.seq = after_seq
+        if not os.path.exists(self.path):
+            return
+
+        valid_bytes = 0
+        oldest = None
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+
+                valid_bytes += len(line)
+                if oldest is None:
+                    # Records from older journals have no timestamp; use the file's last change
+                    oldest = record.get("ts") or os.path.getmtime(self.path)
+                if record["seq"] <= after_seq:
+                    continue
+                self.seq = record["seq"]
+                yield record
+
+        if valid_bytes != os.path.getsize(self.path):
+            logging.warning(f'Discarding torn record at the end of {self.path}')
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_bytes)
+
+        self.size = valid_bytes
+        self.oldest_record_at = oldest
+
+    def append(self, record):
+        """Queue a mutation record for the next journal write"""
+        now = time.time()
+        self.seq += 1
+        record["seq"] = self.seq
+        record["ts"] = int(now)
+        line = json.dumps(record, separators=(',', ':'), default=encode_record) + "\n"
+        payload = line.encode('utf-8')
+        self.pending.append(payload)
+        self.size += len(payload)
+        if self.oldest_record_at is None:
+            self.oldest_record_at = now
+
+        self.writer.mark_dirty()
+        self._ensure_compactor()
+
+        if self.size >= self.max_bytes:
+            self._schedule_compaction()
+
+    def _take_pending(self):
+        payload = b"".join(self.pending)
+        self.pending = []
+        return payload
+
+    def _append(self, payload):
+        """Append records to the journal file (runs on the writer thread)"""
+        if not payload:
+            return
+        with open(self.path, 'ab') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _ensure_compactor(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._compactor is None or self._compactor.done():
+            self._compactor = loop.create_task(self._run_compactor())
+
+    def _schedule_compaction(self):
+        if self._compacting:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._compacting = True
+        loop.create_task(self.compact())
+
+    def needs_compaction(self):
+        """Whether the journal has passed its size or age threshold"""
+        if self.size >= self.max_bytes:
+            return True
+        return (self.oldest_record_at is not None and
+                time.time() - self.oldest_record_at >= self.max_age)
+
+    async def _run_compactor(self):
+        """Background task folding the journal into a snapshot when due"""
+        while True:
+            await asyncio.sleep(self.check_interval)
+            if self.needs_compaction() and not self._compacting:
+                self._compacting = True
+                await self.compact()
+
+    def _compact(self, snapshot):
+        """Write the snapshot, then truncate the journal (runs on the writer thread)"""
+        self.write_snapshot(snapshot)
+        with open(self.path, 'wb') as f:
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def compact(self):
+        """Fold every record so far into a new snapshot and reset the journal"""
+        if self.holds:
+            # A transaction is open; its changes must not be half in the snapshot
+            self._compacting = False
+            return
+
+        self._compacting = True
+        # What stays in the file if the compaction fails (queued records are dropped either way)
+        file_size = self.size - sum(len(line) for line in self.pending)
+        oldest_record_at = self.oldest_record_at
+        try:
+            snapshot = self.snapshot()
+            snapshot["journal_seq"] = self.seq
+            # Queued records are already part of the snapshot
+            self.pending = []
+            self.oldest_record_at = None
+            self.size = 0
+            await self.writer.submit(self._compact, snapshot)
+            self.compactions += 1
+        except Exception as e:
+            self.size += file_size
+            if self.oldest_record_at is None:
+                self.oldest_record_at = oldest_record_at
+            logging.error(f'Error compacting database journal: {e}')
+        finally:
+            self._compacting = False
+
+    @property
+    def stats(self):
+        """Journal counters"""
+        return dict(self.writer.stats, compactions=self.compactions, journal_bytes=self.size)
+
+    async def close(self):
+        """Fold the journal into a final snapshot and stop background tasks"""
+        if self._compactor is not None:
+            self._compactor.cancel()
+            try:
+                await self._compactor
+            except asyncio.CancelledError:
+                pass
+            self._compactor = None
+
+        await self.compact()
+        await self.writer.close()
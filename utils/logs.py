@@ -0,0 +1,199 @@
+import asyncio
+import atexit
+import contextvars
+import copy
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import time
+from datetime import datetime, timezone
+
+# Guild/channel/user/command of the event or command being handled.
+# discord.py runs every event in its own task, so values never leak
+# between messages.
+log_context = contextvars.ContextVar("log_context", default=None)
+
+def set_log_context(**fields):
+    """Attach fields (guild, channel, user, command, ...) to every log line of the current task"""
+    context = log_context.get()
+    context = dict(context, **fields) if context else fields
+    log_context.set(context)
+    # Also on the task itself, so other threads (the loop watchdog) can read it
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is not None:
+        task.log_context = context
+
+class ContextFilter(logging.Filter):
+    """Copy the task's log context onto the record before it leaves the event loop thread"""
+
+    def filter(self, record):
+        # Records may carry their own context (e.g. the watchdog reporting another task)
+        if getattr(record, "context", None) is None:
+            record.context = log_context.get()
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Sampling and rate limits for noisy log categories
+
+    Records opt in with ``extra={"category": "..."}``. A category in
+    ``sample_every`` keeps one record in N; a category in ``rate_limits``
+    keeps at most that many records per minute. Kept records carry how
+    many were dropped before them, so counts can be recovered.
+    """
+
+    def __init__(self, sample_every=None, rate_limits=None):
+        super().__init__()
+        self.sample_every = sample_every or {}
+        self.rate_limits = rate_limits or {}
+        self.seen = {}
+        self.windows = {}
+        self.dropped = {}
+
+    def filter(self, record):
+        category = getattr(record, "category", None)
+        if category is None:
+            return True
+
+        every = self.sample_every.get(category)
+        if every and every > 1:
+            seen = self.seen.get(category, 0)
+            self.seen[category] = seen + 1
+            if seen % every:
+                self.dropped[category] = self.dropped.get(category, 0) + 1
+                return False
+            record.sample_every = every
+
+        limit = self.rate_limits.get(category)
+        if limit is not None:
+            now = time.monotonic()
+            window = self.windows.get(category)
+            if window is None or now - window[0] >= 60:
+                window = self.windows[category] = [now, 0, 0]
+            if window[1] >= limit:
+                window[2] += 1
+                self.dropped[category] = self.dropped.get(category, 0) + 1
+                return False
+            window[1] += 1
+            if window[2]:
+                record.suppressed = window[2]
+                window[2] = 0
+
+        return True
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, including the guild/command context"""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in ("category", "sample_every", "suppressed"):
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        context = getattr(record, "context", None)
+        if context:
+            entry.update(context)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    """The original console format, followed by the context fields"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    def formatMessage(self, record):
+        line = super().formatMessage(record)
+        context = getattr(record, "context", None)
+        if context:
+            line += " [" + " ".join(f"{key}={value}" for key, value in context.items()) + "]"
+        return line
+
+def gzip_rotator(source, dest):
+    """Compress a rotated log file"""
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+class RotatingLogHandler(logging.handlers.RotatingFileHandler):
+    """Rotates once the file passes ``max_bytes`` or every ``interval`` seconds, gzipping old files"""
+
+    def __init__(self, filename, max_bytes, backup_count, interval):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        self.interval = interval
+        self.rollover_at = time.time() + interval if interval else None
+        self.namer = lambda name: name + ".gz"
+        self.rotator = gzip_rotator
+
+    def shouldRollover(self, record):
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+                return True
+            self.rollover_at = time.time() + self.interval
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        if self.interval:
+            self.rollover_at = time.time() + self.interval
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps ``extra`` fields and exceptions separate from the message"""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def setup_logging(log_file, level="INFO", max_bytes=5 * 1024 * 1024, backup_count=7,
+                  interval=86400, sample_every=None, rate_limits=None):
+    """Route all logging through a queue drained by a background thread
+
+    Only the queue put happens on the caller's thread; formatting, the
+    console and the (rotating, gzipped, JSON lines) log file are handled
+    by the listener thread. Returns the started QueueListener and the
+    SamplingFilter (for its ``dropped`` counters).
+    """
+    file_handler = RotatingLogHandler(log_file, max_bytes, backup_count, interval)
+    file_handler.setFormatter(JSONFormatter())
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = LogQueueHandler(log_queue)
+    sampler = SamplingFilter(sample_every, rate_limits)
+    queue_handler.addFilter(sampler)
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(
+        log_queue, file_handler, console_handler, respect_handler_level=True
+    )
+    listener.start()
+    # Drain whatever is still queued when the process exits
+    atexit.register(listener.stop)
+    return listener, sampler
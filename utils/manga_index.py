@@ -0,0 +1,365 @@
+import asyncio
+import bisect
+import difflib
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.mangadex import trim_manga
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS titles (
+    id INTEGER PRIMARY KEY,
+    manga_id TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    alt_titles TEXT NOT NULL,
+    content_rating TEXT,
+    updated_at TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS titles_fts USING fts5(
+    title, alt_titles, content='titles', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS titles_trigram USING fts5(
+    title, alt_titles, content='titles', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS titles_insert AFTER INSERT ON titles BEGIN
+    INSERT INTO titles_fts (rowid, title, alt_titles) VALUES (new.id, new.title, new.alt_titles);
+    INSERT INTO titles_trigram (rowid, title, alt_titles) VALUES (new.id, new.title, new.alt_titles);
+END;
+CREATE TRIGGER IF NOT EXISTS titles_delete AFTER DELETE ON titles BEGIN
+    INSERT INTO titles_fts (titles_fts, rowid, title, alt_titles) VALUES ('delete', old.id, old.title, old.alt_titles);
+    INSERT INTO titles_trigram (titles_trigram, rowid, title, alt_titles) VALUES ('delete', old.id, old.title, old.alt_titles);
+END;
+CREATE TRIGGER IF NOT EXISTS titles_update AFTER UPDATE ON titles BEGIN
+    INSERT INTO titles_fts (titles_fts, rowid, title, alt_titles) VALUES ('delete', old.id, old.title, old.alt_titles);
+    INSERT INTO titles_trigram (titles_trigram, rowid, title, alt_titles) VALUES ('delete', old.id, old.title, old.alt_titles);
+    INSERT INTO titles_fts (rowid, title, alt_titles) VALUES (new.id, new.title, new.alt_titles);
+    INSERT INTO titles_trigram (rowid, title, alt_titles) VALUES (new.id, new.title, new.alt_titles);
+END;
+"""
+
+WORD_PATTERN = re.compile(r"\w+")
+
+def title_row(manga):
+    """(manga_id, title, alt_titles, content_rating, updated_at) for a MangaDex entity"""
+    attributes = manga.get("attributes", {})
+    titles = attributes.get("title") or {}
+    title = titles.get("en") or titles.get("ja-ro") or next(iter(titles.values()), "")
+    alt_titles = []
+    for alt in attributes.get("altTitles") or []:
+        for text in alt.values():
+            if text and text != title and text not in alt_titles:
+                alt_titles.append(text)
+    return (
+        manga["id"],
+        title,
+        "\n".join(alt_titles),
+        attributes.get("contentRating"),
+        attributes.get("updatedAt") or "",
+    )
+
+def _quote(word):
+    return '"' + word.replace('"', '""') + '"'
+
+def match_query(text, prefix=True):
+    """FTS5 query matching every word of text, the last one as a prefix"""
+    words = WORD_PATTERN.findall(text)
+    if not words:
+        return None
+    terms = [_quote(word) for word in words]
+    if prefix:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+def trigram_query(text):
+    """FTS5 query matching any three-letter run of text, for fuzzy search"""
+    grams = set()
+    for word in WORD_PATTERN.findall(text.casefold()):
+        grams.update(word[i:i + 3] for i in range(len(word) - 2))
+    if not grams:
+        return None
+    return " OR ".join(_quote(gram) for gram in sorted(grams))
+
+class TitleHit:
+    __slots__ = ("manga_id", "title", "score")
+
+    def __init__(self, manga_id, title, score=1.0):
+        self.manga_id = manga_id
+        self.title = title
+        self.score = score
+
+    def __repr__(self):
+        return f"TitleHit({self.manga_id!r}, {self.title!r}, {self.score:.2f})"
+
+class MangaIndex:
+    """Local full-text index of MangaDex titles and alt titles (SQLite FTS5)
+
+    Only titles are stored; details are fetched from MangaDex when a
+    result is shown. Like SQLiteDatabase, every query runs on one
+    dedicated thread that owns the connection, so lookups never block
+    the event loop. Several processes can share the file (WAL); only one
+    should write to it.
+    """
+
+    def __init__(self, db_file, content_ratings=None):
+        self.db_file = db_file
+        self.content_ratings = list(content_ratings) if content_ratings else None
+        self.stats = {"titles": 0, "searches": 0, "fuzzy_searches": 0, "last_sync": 0.0}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="manga-index")
+        # Raises sqlite3.OperationalError if SQLite was built without FTS5
+        self.conn = self._executor.submit(self._connect).result()
+        self.stats["titles"] = self.conn.execute("SELECT COUNT(*) FROM titles").fetchone()[0]
+
+    def _connect(self):
+        directory = os.path.dirname(self.db_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.db_file, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.executescript(SCHEMA)
+        return conn
+
+    async def _run(self, func, *args):
+        """Run a blocking function on the index thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def close(self):
+        self._executor.submit(self.conn.close).result()
+        self._executor.shutdown()
+
+    def _rating_filter(self):
+        if not self.content_ratings:
+            return "", ()
+        placeholders = ", ".join("?" for _ in self.content_ratings)
+        return f" AND (t.content_rating IS NULL OR t.content_rating IN ({placeholders}))", tuple(self.content_ratings)
+
+    # Sync
+
+    def _get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _upsert(self, rows, cursor):
+        """Store a page of title rows and the sync cursor in one transaction"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.executemany(
+                "INSERT INTO titles (manga_id, title, alt_titles, content_rating, updated_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (manga_id) DO UPDATE SET title = excluded.title, alt_titles = excluded.alt_titles, "
+                "content_rating = excluded.content_rating, updated_at = excluded.updated_at "
+                "WHERE excluded.updated_at > titles.updated_at OR excluded.title != titles.title "
+                "OR excluded.alt_titles != titles.alt_titles",
+                rows
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('cursor', ?)",
+                (json.dumps(cursor),)
+            )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.stats["titles"] = self.conn.execute("SELECT COUNT(*) FROM titles").fetchone()[0]
+
+    async def cursor(self):
+        """Where the last sync stopped: {"since": updatedAt, "offset": n}"""
+        value = await self._run(self._get_meta, "cursor")
+        return json.loads(value) if value else {"since": None, "offset": 0}
+
+    async def upsert(self, mangas, cursor):
+        await self._run(self._upsert, [title_row(manga) for manga in mangas], cursor)
+
+    async def remove(self, manga_id):
+        """Forget a title (e.g. MangaDex no longer has it)"""
+        await self._run(self.conn.execute, "DELETE FROM titles WHERE manga_id = ?", (manga_id,))
+
+    # Lookups
+
+    def _search(self, text, limit, prefix):
+        query = match_query(text, prefix=prefix)
+        if query is None:
+            return []
+        rating_sql, rating_params = self._rating_filter()
+        # Exact title matches first, then bm25 with titles weighted over alt titles
+        rows = self.conn.execute(
+            "SELECT t.manga_id, t.title FROM titles_fts f JOIN titles t ON t.id = f.rowid "
+            f"WHERE titles_fts MATCH ?{rating_sql} "
+            "ORDER BY lower(t.title) = lower(?) DESC, bm25(titles_fts, 10.0, 1.0), length(t.title) "
+            "LIMIT ?",
+            (query, *rating_params, text.strip(), limit)
+        ).fetchall()
+        return [TitleHit(manga_id, title) for manga_id, title in rows]
+
+    def _fuzzy(self, text, limit, candidates=50, cutoff=0.6):
+        query = trigram_query(text)
+        if query is None:
+            return []
+        rating_sql, rating_params = self._rating_filter()
+        rows = self.conn.execute(
+            "SELECT t.manga_id, t.title, t.alt_titles FROM titles_trigram g JOIN titles t ON t.id = g.rowid "
+            f"WHERE titles_trigram MATCH ?{rating_sql} "
+            "ORDER BY bm25(titles_trigram, 10.0, 1.0) LIMIT ?",
+            (query, *rating_params, candidates)
+        ).fetchall()
+
+        # Rerank the trigram candidates by how close the best of their titles is
+        wanted = text.casefold().strip()
+        hits = []
+        for manga_id, title, alt_titles in rows:
+            score = max(
+                difflib.SequenceMatcher(None, wanted, name.casefold()).ratio()
+                for name in [title, *alt_titles.split("\n")] if name
+            )
+            if score >= cutoff:
+                hits.append(TitleHit(manga_id, title, score))
+        hits.sort(key=lambda hit: -hit.score)
+        return hits[:limit]
+
+    def _lookup(self, text, limit):
+        hits = self._search(text, limit, prefix=False)
+        if not hits:
+            self.stats["fuzzy_searches"] += 1
+            hits = self._fuzzy(text, limit)
+        return hits
+
+    async def search(self, text, limit=1):
+        """Best matching titles: full words first, then fuzzy matches for typos"""
+        self.stats["searches"] += 1
+        return await self._run(self._lookup, text, limit)
+
+    async def autocomplete(self, text, limit=10):
+        """Titles matching text as it's being typed (the last word is a prefix)"""
+        return await self._run(self._search, text, limit, True)
+
+class APISource:
+    """Pages of MangaDex titles ordered by updatedAt, from the API"""
+
+    def __init__(self, client, content_ratings=None):
+        self.client = client
+        self.content_ratings = content_ratings
+
+    async def page(self, since, offset, limit):
+        params = {
+            "limit": limit,
+            "offset": offset,
+            "order[updatedAt]": "asc",
+        }
+        if since:
+            # MangaDex wants YYYY-MM-DDTHH:MM:SS, without a timezone
+            params["updatedAtSince"] = since[:19]
+        if self.content_ratings:
+            params["contentRating[]"] = self.content_ratings
+        data = await self.client.get("/manga", params)
+        return (data or {}).get("data", [])
+
+    async def manga(self, manga_id):
+        return await self.client.manga(manga_id)
+
+class FixtureSource:
+    """Serves MangaDex entities from a JSON file the same way as APISource
+
+    The file holds a /manga list response ({"data": [...]}) or a plain
+    list of entities. Lets the index, its sync and the commands run
+    without network access, e.g. for benchmarks and local testing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.mangas = []
+        self.by_id = {}
+        self.reload()
+
+    def reload(self):
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get("data", [])
+        self.mangas = sorted(data, key=lambda manga: manga["attributes"].get("updatedAt") or "")
+        self.updated = [(manga["attributes"].get("updatedAt") or "")[:19] for manga in self.mangas]
+        self.by_id = {manga["id"]: manga for manga in self.mangas}
+
+    async def page(self, since, offset, limit):
+        start = bisect.bisect_left(self.updated, since[:19]) if since else 0
+        return self.mangas[start + offset:start + offset + limit]
+
+    async def manga(self, manga_id):
+        manga = self.by_id.get(manga_id)
+        return trim_manga(manga) if manga is not None else None
+
+class MangaIndexSync:
+    """Keeps a MangaIndex up to date from a source, incrementally
+
+    Pages through titles in updatedAt order starting at the stored
+    cursor, so after the first full pass only changed titles are
+    fetched. When a whole page shares the cursor's timestamp the offset
+    moves forward instead, so the sync can't get stuck on it.
+    """
+
+    def __init__(self, index, source, page_size=100, page_delay=1.0, interval=900):
+        self.index = index
+        self.source = source
+        self.page_size = page_size
+        self.page_delay = page_delay
+        self.interval = interval
+        self.stats = {"pages": 0, "titles": 0, "errors": 0}
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                count = await self.sync_once()
+                if count:
+                    logging.info(f'Manga index: fetched {count} updated titles ({self.index.stats["titles"]} indexed)')
+            except Exception as e:
+                self.stats["errors"] += 1
+                logging.warning(f'Manga index sync failed: {e}')
+            await asyncio.sleep(self.interval)
+
+    async def sync_once(self):
+        """Fetch everything updated since the cursor; returns how many titles were fetched"""
+        cursor = await self.index.cursor()
+        synced = 0
+        while True:
+            mangas = await self.source.page(cursor["since"], cursor["offset"], self.page_size)
+            if not mangas:
+                break
+
+            last = mangas[-1]["attributes"].get("updatedAt") or cursor["since"]
+            if cursor["since"] and last[:19] == cursor["since"][:19]:
+                cursor = {"since": cursor["since"], "offset": cursor["offset"] + len(mangas)}
+            else:
+                cursor = {"since": last, "offset": 0}
+            await self.index.upsert(mangas, cursor)
+            self.stats["pages"] += 1
+            synced += len(mangas)
+
+            if len(mangas) < self.page_size:
+                break
+            if self.page_delay:
+                await asyncio.sleep(self.page_delay)
+
+        self.stats["titles"] += synced
+        self.index.stats["last_sync"] = time.time()
+        return synced
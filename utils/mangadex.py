@@ -0,0 +1,403 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+import aiohttp
+
+# Related entities send_manga_info shows (names, cover file)
+MANGA_INCLUDES = ["cover_art", "author", "artist"]
+
+class MangaDexError(Exception):
+    """MangaDex answered with an error status or couldn't be reached"""
+
+class MangaDexUnavailable(MangaDexError):
+    """The circuit breaker is open: MangaDex has been failing, so we don't try"""
+
+def retry_after(headers):
+    """Seconds to wait according to a 429/503 response, or None
+
+    Understands Retry-After (seconds or an HTTP date) and MangaDex's
+    X-RateLimit-Retry-After (a Unix timestamp).
+    """
+    value = headers.get("Retry-After")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    value = headers.get("X-RateLimit-Retry-After")
+    if value:
+        try:
+            return max(0.0, float(value) - time.time())
+        except ValueError:
+            pass
+    return None
+
+def _pick(localized, languages=("en", "ja-ro")):
+    """Keep only the language the embed will show from a {lang: text} dict"""
+    if not localized:
+        return {}
+    for language in languages:
+        if localized.get(language):
+            return {language: localized[language]}
+    language, text = next(iter(localized.items()))
+    return {language: text}
+
+def trim_manga(manga):
+    """Strip a manga entity down to the fields the bot renders
+
+    MangaDex has no sparse fieldsets, so the full entity (every
+    translated description, alt title and link) is always sent. Trimming
+    it keeps cached results small.
+    """
+    attributes = manga.get("attributes", {})
+    relationships = []
+    for relationship in manga.get("relationships", []):
+        related = {"id": relationship.get("id"), "type": relationship.get("type")}
+        related_attributes = relationship.get("attributes") or {}
+        if relationship.get("type") in ("author", "artist") and "name" in related_attributes:
+            related["attributes"] = {"name": related_attributes["name"]}
+        elif relationship.get("type") == "cover_art" and "fileName" in related_attributes:
+            related["attributes"] = {"fileName": related_attributes["fileName"]}
+        relationships.append(related)
+
+    trimmed = {
+        "title": _pick(attributes.get("title")),
+        "description": _pick(attributes.get("description")),
+        "tags": [
+            {"attributes": {"name": {"en": tag["attributes"]["name"].get("en", "Unknown")}}}
+            for tag in attributes.get("tags", [])[:5]
+            if "name" in tag.get("attributes", {})
+        ],
+    }
+    for key in ("status", "year", "contentRating"):
+        if attributes.get(key) is not None:
+            trimmed[key] = attributes[key]
+
+    return {
+        "id": manga["id"],
+        "type": manga.get("type", "manga"),
+        "attributes": trimmed,
+        "relationships": relationships,
+    }
+
+class TokenBucket:
+    """Allows ``rate`` requests per second on average, in bursts of up to ``burst``
+
+    Callers queue on a lock, so they are served in order. ``pause``
+    holds everyone back, e.g. after a 429.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+class CircuitBreaker:
+    """Fails fast after ``threshold`` consecutive failures
+
+    Once open, calls are refused for ``reset_timeout`` seconds. Then a
+    single trial call is let through: if it succeeds the breaker closes,
+    if it fails the breaker opens again.
+    """
+
+    def __init__(self, threshold=5, reset_timeout=30):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started = None
+        self.opens = 0
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() < self.opened_at + self.reset_timeout:
+            return "open"
+        return "half-open"
+
+    def allow(self):
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "open":
+            return False
+        # Half-open: one trial at a time (a stuck trial gives way after reset_timeout)
+        now = time.monotonic()
+        if self.trial_started is None or now - self.trial_started > self.reset_timeout:
+            self.trial_started = now
+            return True
+        return False
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started = None
+
+    def failure(self):
+        self.failures += 1
+        self.trial_started = None
+        if self.opened_at is not None or self.failures >= self.threshold:
+            if self.state != "open":
+                self.opens += 1
+                logging.warning(f'MangaDex failed {self.failures} times in a row, pausing requests for {self.reset_timeout}s')
+            self.opened_at = time.monotonic()
+
+class MangaDexClient:
+    """MangaDex API client shared by every manga command
+
+    One connection pool (with cached DNS lookups) and one token bucket,
+    so all commands together stay under MangaDex's rate limit. 429 and
+    5xx responses and network errors are retried with jittered backoff,
+    waiting as long as Retry-After asks when that's short enough. After
+    repeated failures the circuit breaker makes requests fail at once
+    until MangaDex recovers.
+    """
+
+    def __init__(self, base_url, rate=5, burst=None, timeout=10, connections=10, max_retries=3,
+                 max_retry_wait=10, breaker_threshold=5, breaker_reset=30, user_agent=None,
+                 trace_configs=None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.connections = connections
+        self.max_retries = max_retries
+        self.max_retry_wait = max_retry_wait
+        self.user_agent = user_agent
+        self.trace_configs = trace_configs or []
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+        self.stats = {"retries": 0, "rate_limited": 0, "short_circuited": 0}
+        self._session = None
+
+    @property
+    def session(self):
+        """HTTP session, created on the first request (inside the running loop)"""
+        if self._session is None or self._session.closed:
+            headers = {"User-Agent": self.user_agent} if self.user_agent else None
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connections, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.timeout, connect=min(5, self.timeout)),
+                headers=headers,
+                trace_configs=self.trace_configs
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def backoff(self, attempt):
+        """Exponential backoff with jitter: between half and all of 0.5s * 2^attempt"""
+        delay = min(self.max_retry_wait, 0.5 * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def get(self, path, params=None):
+        """Decoded JSON body of GET ``path``, or None on 404
+
+        Raises MangaDexError (MangaDexUnavailable while the breaker is
+        open) or asyncio.TimeoutError once retries run out.
+        """
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                self.stats["short_circuited"] += 1
+                raise MangaDexUnavailable("MangaDex is unavailable right now")
+            await self.bucket.acquire()
+
+            wait = None
+            try:
+                async with self.session.get(self.base_url + path, params=params) as response:
+                    status = response.status
+                    if status == 200:
+                        data = await response.json()
+                        self.breaker.success()
+                        return data
+                    if status == 404:
+                        self.breaker.success()
+                        return None
+
+                    error = MangaDexError(f"MangaDex returned HTTP {status}")
+                    if status == 429:
+                        # Not an outage, so the breaker isn't told; everyone waits instead
+                        self.stats["rate_limited"] += 1
+                        wait = retry_after(response.headers)
+                        if wait is None:
+                            wait = self.backoff(attempt)
+                        self.bucket.pause(wait)
+                    elif status >= 500:
+                        self.breaker.failure()
+                        wait = retry_after(response.headers)
+                    else:
+                        # Our request is wrong; retrying won't help
+                        self.breaker.success()
+                        raise error
+            except aiohttp.ClientError as e:
+                self.breaker.failure()
+                error = MangaDexError(f"Could not reach MangaDex: {e}")
+            except asyncio.TimeoutError as e:
+                self.breaker.failure()
+                error = e
+
+            if attempt == self.max_retries:
+                break
+            if wait is None:
+                wait = self.backoff(attempt)
+            if wait > self.max_retry_wait:
+                # Too long to keep a command waiting
+                break
+            self.stats["retries"] += 1
+            await asyncio.sleep(wait)
+
+        raise error
+
+    async def search(self, title, limit=1):
+        """Manga matching title, best match first"""
+        data = await self.get("/manga", {
+            "title": title,
+            "limit": limit,
+            "includes[]": MANGA_INCLUDES,
+        })
+        return [trim_manga(manga) for manga in (data or {}).get("data", [])]
+
+    async def manga(self, manga_id):
+        """Manga with this id, or None"""
+        data = await self.get(f"/manga/{manga_id}", {"includes[]": MANGA_INCLUDES})
+        return trim_manga(data["data"]) if data and data.get("data") else None
+
+    async def random(self):
+        """A random manga, or None"""
+        data = await self.get("/manga/random", {"includes[]": MANGA_INCLUDES})
+        return trim_manga(data["data"]) if data and data.get("data") else None
+
+class RandomMangaPool:
+    """Random manga fetched ahead of time, so x!randommanga doesn't wait on MangaDex
+
+    Manga are taken from a buffer. Once it drops below ``low`` a
+    background refill tops it up to ``high`` with a single /manga request
+    at a random offset and ordering, instead of one /manga/random call
+    per manga. Refills go through the client, so they share its rate
+    limit, and only ask for ``content_ratings``. Recently served manga
+    are skipped so repeats are rare.
+    """
+
+    ORDERS = ("createdAt", "updatedAt", "latestUploadedChapter")
+    # MangaDex refuses offset + limit past this
+    MAX_WINDOW = 10000
+
+    def __init__(self, client, low=5, high=25, content_ratings=None, recent=500):
+        self.client = client
+        self.low = low
+        self.high = high
+        self.content_ratings = content_ratings
+        self.buffer = deque()
+        self.recent = deque(maxlen=recent)
+        self.total = None
+        self.last_error = None
+        self.stats = {"served": 0, "waited": 0, "refills": 0, "refill_errors": 0}
+        self._refill_task = None
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def start(self):
+        """Fill the buffer in the background"""
+        self._schedule()
+
+    def stop(self):
+        if self._refill_task is not None:
+            self._refill_task.cancel()
+            self._refill_task = None
+
+    def _schedule(self):
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.get_running_loop().create_task(self._refill())
+        return self._refill_task
+
+    async def _refill(self):
+        self.last_error = None
+        try:
+            await self.fill()
+        except Exception as e:
+            self.stats["refill_errors"] += 1
+            self.last_error = e
+            logging.warning(f'Refilling the random manga pool failed: {e}')
+
+    async def fill(self):
+        """Fetch one batch into the buffer; returns how many manga were added"""
+        limit = max(1, min(100, self.high - len(self.buffer)))
+        # Until the first response tells us the total, start at the beginning
+        window = min(self.total, self.MAX_WINDOW) if self.total is not None else limit
+        params = {
+            "limit": limit,
+            "offset": random.randint(0, max(0, window - limit)),
+            f"order[{random.choice(self.ORDERS)}]": random.choice(("asc", "desc")),
+            "includes[]": MANGA_INCLUDES,
+        }
+        if self.content_ratings:
+            params["contentRating[]"] = self.content_ratings
+
+        data = await self.client.get("/manga", params) or {}
+        self.stats["refills"] += 1
+        self.total = data.get("total", self.total)
+
+        mangas = data.get("data", [])
+        random.shuffle(mangas)
+        skip = set(self.recent)
+        skip.update(manga["id"] for manga in self.buffer)
+        added = 0
+        for manga in mangas:
+            if manga["id"] in skip:
+                continue
+            self.buffer.append(trim_manga(manga))
+            added += 1
+        return added
+
+    async def get(self):
+        """A random manga, or None; waits for a refill only if the buffer is empty
+
+        Raises the refill's MangaDexError if that refill failed.
+        """
+        if not self.buffer:
+            self.stats["waited"] += 1
+            # Shielded: a cancelled command shouldn't cancel the refill
+            await asyncio.shield(self._schedule())
+            if not self.buffer:
+                if self.last_error is not None:
+                    raise self.last_error
+                return None
+
+        manga = self.buffer.popleft()
+        self.recent.append(manga["id"])
+        self.stats["served"] += 1
+        if len(self.buffer) < self.low:
+            self._schedule()
+        return manga
@@ -0,0 +1,292 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+import aiohttp
+
+# Histogram bucket upper bounds in seconds: 0.1 ms to ~2 min, 25% apart
+BUCKET_BOUNDS = []
+_bound = 0.0001
+while _bound < 120:
+    BUCKET_BOUNDS.append(_bound)
+    _bound *= 1.25
+BUCKET_BOUNDS.append(float("inf"))
+
+class Histogram:
+    """Fixed-size latency histogram with exponential buckets
+
+    Percentiles are reported as the upper bound of the bucket they fall
+    in (so within 25%), capped at the largest value seen.
+    """
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKET_BOUNDS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """Approximate q-th percentile (0-100) in seconds"""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(BUCKET_BOUNDS[index], self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+    def to_state(self):
+        """Raw (non-empty) buckets, so histograms from other processes can be merged"""
+        return {
+            "buckets": {index: count for index, count in enumerate(self.counts) if count},
+            "sum": self.total,
+            "max": self.max,
+        }
+
+    def merge_state(self, state):
+        """Add a histogram exported with to_state()"""
+        for index, count in state["buckets"].items():
+            # JSON turns the bucket indexes into strings
+            self.counts[int(index)] += count
+            self.count += count
+        self.total += state["sum"]
+        self.max = max(self.max, state["max"])
+
+class Timing:
+    """Time a single command spent waiting on the database and on outbound HTTP"""
+
+    __slots__ = ("started", "db", "http")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db = 0.0
+        self.http = 0.0
+
+# Timing of the command running in the current task (None outside commands)
+current_timing = contextvars.ContextVar("current_timing", default=None)
+
+@contextmanager
+def timed(kind):
+    """Add the time spent in the block to the current command's ``db`` or ``http`` total"""
+    timing = current_timing.get()
+    if timing is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(timing, kind, getattr(timing, kind) + time.perf_counter() - started)
+
+class RequestStats:
+    """Counters and latency for calls to one outbound HTTP service"""
+
+    __slots__ = ("requests", "errors", "statuses", "latency")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.statuses = {}
+        self.latency = Histogram()
+
+    def to_dict(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "statuses": dict(self.statuses),
+            "latency": self.latency.to_dict(),
+        }
+
+def http_trace_config(stats=None):
+    """aiohttp TraceConfig that counts request time towards the current command
+
+    If ``stats`` (a RequestStats) is given, every request is also recorded there.
+    """
+    async def on_request_start(session, context, params):
+        context.started = time.perf_counter()
+
+    async def on_request_end(session, context, params):
+        elapsed = time.perf_counter() - context.started
+        timing = current_timing.get()
+        if timing is not None:
+            timing.http += elapsed
+        if stats is not None:
+            stats.requests += 1
+            stats.latency.add(elapsed)
+            response = getattr(params, "response", None)
+            if response is None:
+                stats.errors += 1
+            else:
+                status = response.status
+                stats.statuses[status] = stats.statuses.get(status, 0) + 1
+                if status >= 500 or status == 429:
+                    stats.errors += 1
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_end)
+    return trace_config
+
+class LoopLagMonitor:
+    """Measures event loop lag: how late a short sleep wakes up"""
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.last = 0.0
+        self.max = 0.0
+        self.lag = Histogram()
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - started - self.interval, 0.0)
+            self.last = lag
+            if lag > self.max:
+                self.max = lag
+            self.lag.add(lag)
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+class CommandStats:
+    """Histograms and counters for one command"""
+
+    __slots__ = ("wall", "db", "http", "errors")
+
+    def __init__(self):
+        self.wall = Histogram()
+        self.db = Histogram()
+        self.http = Histogram()
+        self.errors = 0
+
+    def to_dict(self):
+        return {
+            "calls": self.wall.count,
+            "errors": self.errors,
+            "wall": self.wall.to_dict(),
+            "db": self.db.to_dict(),
+            "http": self.http.to_dict(),
+        }
+
+    def to_state(self):
+        return {
+            "errors": self.errors,
+            "wall": self.wall.to_state(),
+            "db": self.db.to_state(),
+            "http": self.http.to_state(),
+        }
+
+    def merge_state(self, state):
+        self.errors += state["errors"]
+        self.wall.merge_state(state["wall"])
+        self.db.merge_state(state["db"])
+        self.http.merge_state(state["http"])
+
+class CommandMetrics:
+    """Per-command latency histograms, filled by the bot's invoke hooks"""
+
+    def __init__(self):
+        self.commands = {}
+        self.http = {}
+        self.started_at = time.time()
+
+    def http_stats(self, service):
+        """RequestStats for an outbound service (e.g. "mangadex")"""
+        stats = self.http.get(service)
+        if stats is None:
+            stats = self.http[service] = RequestStats()
+        return stats
+
+    def stats_for(self, name):
+        stats = self.commands.get(name)
+        if stats is None:
+            stats = self.commands[name] = CommandStats()
+        return stats
+
+    def start(self):
+        """Begin timing a command in the current task"""
+        timing = Timing()
+        current_timing.set(timing)
+        return timing
+
+    def finish(self, name, timing):
+        """Record a finished command"""
+        stats = self.stats_for(name)
+        stats.wall.add(time.perf_counter() - timing.started)
+        stats.db.add(timing.db)
+        stats.http.add(timing.http)
+        current_timing.set(None)
+
+    def record_error(self, name):
+        self.stats_for(name).errors += 1
+
+    def to_dict(self):
+        """Machine-readable dump of every command's stats (times in seconds)"""
+        return {
+            "since": self.started_at,
+            "commands": {name: stats.to_dict() for name, stats in sorted(self.commands.items())},
+            "http": {service: stats.to_dict() for service, stats in sorted(self.http.items())},
+        }
+
+    def to_state(self):
+        """Per-command histograms in a form other processes can merge (see merge_state)"""
+        return {name: stats.to_state() for name, stats in self.commands.items()}
+
+    def merge_state(self, state):
+        """Fold in command stats exported by another process's to_state()"""
+        for name, stats in state.items():
+            self.stats_for(name).merge_state(stats)
+
+class TimedDatabase:
+    """Wraps a database so awaiting any of its coroutines counts as command DB time"""
+
+    def __init__(self, db):
+        self._db = db
+
+    def __getattr__(self, name):
+        value = getattr(self._db, name)
+        if not inspect.iscoroutinefunction(value):
+            return value
+
+        @functools.wraps(value)
+        async def wrapper(*args, **kwargs):
+            with timed("db"):
+                return await value(*args, **kwargs)
+
+        # Cache on the instance so __getattr__ only runs once per method
+        setattr(self, name, wrapper)
+        return wrapper
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+def atomic_write(path, payload):
+    """Write bytes to path via temp file + fsync + atomic rename"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates 0600 files; keep the permissions of the file we replace
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except FileNotFoundError:
+            mode = 0o644
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    # Persist the rename itself (not supported on every platform)
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive advisory lock on ``path`` (created if missing)
+
+    Serializes read-modify-write cycles between processes sharing a file.
+    Blocks, so call it from a writer thread rather than the event loop.
+    Without fcntl (Windows) it doesn't lock anything.
+    """
+    if fcntl is None:
+        yield
+        return
+
+    with open(path, 'a') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+class WriteBehind:
+    """Coalesces bursts of save requests into a single background write
+
+    ``prepare`` runs on the event loop and must return a self-contained
+    snapshot of the data; ``write`` receives that snapshot and runs on a
+    dedicated writer thread, so serialization and disk I/O never block
+    the loop and writes are always applied in order.
+    """
+
+    def __init__(self, prepare, write, delay=1.0, name="database"):
+        self.prepare = prepare
+        self.write = write
+        self.delay = delay
+        self.name = name
+
+        self.dirty = False
+        self.holds = 0
+        self.stats = {
+            "requests": 0,
+            "flushes": 0,
+            "merged": 0,
+            "errors": 0,
+            "last_flush_ms": 0.0,
+            "flush_seconds": 0.0,
+        }
+
+        self._pending_requests = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{name}-writer")
+        self._task = None
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._retry_delay = 0
+        self._closed = False
+
+    def mark_dirty(self):
+        """Schedule a write; repeated calls before the flush are merged"""
+        self.dirty = True
+        self.stats["requests"] += 1
+        self._pending_requests += 1
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop yet (e.g. during start-up) - write right away
+            self.flush_sync()
+            return
+
+        self._schedule()
+
+    def _schedule(self):
+        """Wake the background flusher, starting it if needed"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        self._wakeup.set()
+
+    def hold(self):
+        """Defer writes (e.g. while a transaction is open) until release()"""
+        self.holds += 1
+
+    def release(self):
+        """Allow writes again, scheduling one if changes piled up meanwhile"""
+        self.holds -= 1
+        if not self.holds and self.dirty:
+            self._wakeup.set()
+
+    async def _run(self):
+        """Background flusher loop"""
+        while True:
+            await self._wakeup.wait()
+            # Give the burst a chance to finish before serializing
+            # (or the disk a chance to recover after a failed write)
+            await asyncio.sleep(max(self.delay, self._retry_delay))
+            self._wakeup.clear()
+            await self.flush()
+
+    def _take_snapshot(self):
+        merged = max(self._pending_requests - 1, 0)
+        self._pending_requests = 0
+        self.dirty = False
+        return self.prepare(), merged
+
+    def _record_flush(self, started, merged):
+        self.stats["flushes"] += 1
+        self.stats["merged"] += merged
+        elapsed = time.perf_counter() - started
+        self.stats["last_flush_ms"] = elapsed * 1000
+        self.stats["flush_seconds"] += elapsed
+
+    async def flush(self):
+        """Write pending changes now and wait for them to reach disk"""
+        async with self._lock:
+            if not self.dirty or self.holds:
+                return False
+
+            snapshot, merged = self._take_snapshot()
+            started = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(self._executor, self.write, snapshot)
+            except Exception as e:
+                self.stats["errors"] += 1
+                self.dirty = True
+                if self._closed:
+                    logging.error(f'Error saving {self.name}: {e}')
+                    return False
+                # Retry in the background, backing off while the write keeps failing
+                self._retry_delay = min(max(self._retry_delay * 2, 1.0), 60.0)
+                logging.error(f'Error saving {self.name}: {e} (retrying in {self._retry_delay:.0f}s)')
+                self._schedule()
+                return False
+
+            self._retry_delay = 0
+            self._record_flush(started, merged)
+            return True
+
+    def flush_sync(self):
+        """Blocking flush for use outside of the event loop"""
+        if not self.dirty or self.holds:
+            return False
+
+        snapshot, merged = self._take_snapshot()
+        started = time.perf_counter()
+        try:
+            self._executor.submit(self.write, snapshot).result()
+        except Exception as e:
+            self.stats["errors"] += 1
+            self.dirty = True
+            logging.error(f'Error saving {self.name}: {e}')
+            return False
+
+        self._record_flush(started, merged)
+        return True
+
+    async def submit(self, func, *args):
+        """Run func on the writer thread, after every write queued before it"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def close(self):
+        """Flush outstanding writes and stop the background flusher"""
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self.flush()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,94 @@
+from config import Config
+
+class PrefixResolver:
+    """Guild -> prefix map consulted for every message
+
+    Prefixes are read from the database once per guild and then served
+    from memory without awaiting anything. The map is only invalidated
+    when a prefix changes (``set``) or the bot joins/leaves a guild.
+    """
+
+    def __init__(self, db, default=Config.DEFAULT_PREFIX, mentions=Config.MENTION_PREFIX):
+        self.db = db
+        self.default = default
+        self.mentions = mentions
+        self.mention_prefixes = ()
+        self.prefixes = {}
+        self.stats = {"hits": 0, "misses": 0, "accepted": 0, "rejected": 0}
+
+    def set_user(self, user_id):
+        """Enable mention prefixes for the bot user once it has logged in"""
+        if self.mentions:
+            self.mention_prefixes = (f"<@{user_id}> ", f"<@!{user_id}> ")
+
+    def accepts(self, message):
+        """Cheap check whether a message can be a command at all
+
+        Runs before any Context is built: messages that cannot start with
+        the guild's prefix or a bot mention are rejected here. Guilds whose
+        prefix has not been resolved yet are let through (once resolved,
+        the next message is filtered).
+        """
+        content = message.content
+        if not content:
+            self.stats["rejected"] += 1
+            return False
+
+        if message.guild is None:
+            prefix = self.default
+        else:
+            prefix = self.prefixes.get(message.guild.id)
+            if prefix is None:
+                self.stats["accepted"] += 1
+                return True
+
+        # First character first: most chat messages fail here
+        if (content[0] == prefix[0] and content.startswith(prefix)) or (
+                content[0] == "<" and content.startswith(self.mention_prefixes)):
+            self.stats["accepted"] += 1
+            return True
+
+        self.stats["rejected"] += 1
+        return False
+
+    def get_cached(self, guild_id):
+        """Cached prefix for a guild, or None if it has not been resolved yet"""
+        return self.prefixes.get(guild_id)
+
+    async def prefixes_for(self, message):
+        """Everything a command may start with: the guild prefix, then mention prefixes"""
+        prefix = await self.resolve(message)
+        if self.mention_prefixes:
+            return [prefix, *self.mention_prefixes]
+        return prefix
+
+    async def resolve(self, message):
+        """Prefix for the guild a message was sent in"""
+        if message.guild is None:
+            return self.default
+
+        guild_id = message.guild.id
+        prefix = self.prefixes.get(guild_id)
+        if prefix is not None:
+            self.stats["hits"] += 1
+            return prefix
+
+        self.stats["misses"] += 1
+        prefix = await self.db.get_guild_prefix(guild_id) or self.default
+        # A set() that ran while we were waiting on the database wins
+        return self.prefixes.setdefault(guild_id, prefix)
+
+    async def load(self):
+        """Pre-fill the map with every prefix the database already has in memory or on hand"""
+        prefixes = await self.db.get_guild_prefixes()
+        for guild_id, prefix in prefixes.items():
+            self.prefixes.setdefault(guild_id, prefix or self.default)
+        return len(prefixes)
+
+    def set(self, guild_id, prefix):
+        """Record a prefix change"""
+        self.prefixes[guild_id] = prefix
+
+    def invalidate(self, guild_id):
+        """Forget a guild's prefix (it is read again on the next message)"""
+        self.prefixes.pop(guild_id, None)
@@ -0,0 +1,68 @@
+from datetime import datetime
+
+def to_timestamp(value):
+    """Convert a datetime, ISO string or number to epoch seconds"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return datetime.fromisoformat(value).timestamp()
+
+class GuildSettings:
+    """Per-guild settings kept in memory by the database"""
+
+    __slots__ = ("prefix", "log_channel", "created_at")
+
+    def __init__(self, prefix="x!", log_channel=None, created_at=None):
+        self.prefix = prefix
+        self.log_channel = log_channel
+        self.created_at = created_at
+
+    def __repr__(self):
+        return f"GuildSettings(prefix={self.prefix!r}, log_channel={self.log_channel!r})"
+
+    def copy(self):
+        return GuildSettings(self.prefix, self.log_channel, self.created_at)
+
+    def to_dict(self):
+        return {
+            "prefix": self.prefix,
+            "log_channel": self.log_channel,
+            "created_at": self.created_at
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("prefix", "x!"), data.get("log_channel"), data.get("created_at"))
+
+class WarningEntry:
+    """A single warning; never modified once created"""
+
+    __slots__ = ("moderator_id", "reason", "timestamp")
+
+    def __init__(self, moderator_id, reason, timestamp):
+        self.moderator_id = moderator_id
+        self.reason = reason
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return f"WarningEntry(moderator_id={self.moderator_id!r}, reason={self.reason!r}, timestamp={self.timestamp!r})"
+
+    def to_dict(self):
+        return {
+            "moderator_id": self.moderator_id,
+            "reason": self.reason,
+            "timestamp": self.timestamp
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["moderator_id"], data.get("reason"), to_timestamp(data["timestamp"]))
+
+def encode_record(value):
+    """``default=`` hook so json.dumps can serialize records directly"""
+    if isinstance(value, (GuildSettings, WarningEntry)):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
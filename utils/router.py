@@ -0,0 +1,115 @@
+import asyncio
+import logging
+from collections import OrderedDict
+
+import discord
+
+class Session:
+    """A message whose reactions and components go to one handler until it expires"""
+
+    __slots__ = ("message_id", "user_id", "handler", "on_timeout", "timeout", "handle")
+
+    def __init__(self, message_id, user_id, handler, timeout, on_timeout):
+        self.message_id = message_id
+        self.user_id = user_id
+        self.handler = handler
+        self.timeout = timeout
+        self.on_timeout = on_timeout
+        self.handle = None
+
+class InteractionRouter:
+    """Routes reactions and component interactions to live sessions by message id
+
+    One pair of listeners serves the whole bot instead of a wait_for
+    predicate per paginator or confirmation, so each event costs a dict
+    lookup no matter how many sessions are open. Raw reaction events are
+    used, so messages don't have to be in the message cache.
+
+    A session expires once it has been idle for its timeout. At most
+    ``max_sessions`` are live; opening another expires the least
+    recently used one early.
+    """
+
+    def __init__(self, bot, max_sessions=1000):
+        self.bot = bot
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+        self.stats = {"opened": 0, "routed": 0, "expired": 0, "evicted": 0}
+        self._tasks = set()
+
+        bot.add_listener(self.on_raw_reaction_add)
+        bot.add_listener(self.on_interaction)
+
+    def open(self, message_id, user_id, handler, timeout=60, on_timeout=None):
+        """Send ``user_id``'s reactions/button presses on ``message_id`` to ``handler``
+
+        ``handler`` is a coroutine function called with the
+        RawReactionActionEvent or Interaction. ``on_timeout`` (also a
+        coroutine function) runs when the session expires.
+        """
+        self.close(message_id)
+        while len(self.sessions) >= self.max_sessions:
+            _, oldest = self.sessions.popitem(last=False)
+            self.stats["evicted"] += 1
+            self._expired(oldest)
+
+        session = Session(message_id, user_id, handler, timeout, on_timeout)
+        session.handle = asyncio.get_running_loop().call_later(timeout, self._expire, message_id)
+        self.sessions[message_id] = session
+        self.stats["opened"] += 1
+        return session
+
+    def close(self, message_id):
+        """End a session without running its timeout callback"""
+        session = self.sessions.pop(message_id, None)
+        if session is not None:
+            session.handle.cancel()
+        return session
+
+    def _touch(self, session):
+        """Restart the idle timer of a session that just saw activity"""
+        self.sessions.move_to_end(session.message_id)
+        session.handle.cancel()
+        session.handle = asyncio.get_running_loop().call_later(session.timeout, self._expire, session.message_id)
+
+    def _expire(self, message_id):
+        session = self.sessions.pop(message_id, None)
+        if session is not None:
+            self.stats["expired"] += 1
+            self._expired(session)
+
+    def _expired(self, session):
+        session.handle.cancel()
+        if session.on_timeout is not None:
+            self._spawn(session.on_timeout())
+
+    def _spawn(self, coro):
+        # Keep a reference so the task isn't garbage collected mid-run
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, session, event):
+        self.stats["routed"] += 1
+        self._touch(session)
+        try:
+            await session.handler(event)
+        except Exception as e:
+            logging.error(f'Error handling event for message {session.message_id}: {e}', exc_info=e)
+
+    async def on_raw_reaction_add(self, payload):
+        session = self.sessions.get(payload.message_id)
+        if session is None or payload.user_id != session.user_id:
+            return
+        await self._dispatch(session, payload)
+
+    async def on_interaction(self, interaction):
+        if interaction.type is not discord.InteractionType.component or interaction.message is None:
+            return
+        session = self.sessions.get(interaction.message.id)
+        if session is None:
+            return
+        if interaction.user.id != session.user_id:
+            await interaction.response.send_message("These controls belong to someone else.", ephemeral=True)
+            return
+        await self._dispatch(session, interaction)
@@ -0,0 +1,87 @@
+import json
+import logging
+from utils.records import encode_record
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Bumped whenever the layout of stored data changes
+FORMAT_VERSION = 1
+
+# Binary formats start with this magic, then the format version and a format id
+MAGIC = b"XDB"
+MSGPACK_ID = b"M"
+
+class UnsupportedFormatError(ValueError):
+    """The data was written by a newer version of the bot or in a format this one can't read"""
+
+class JSONSerializer:
+    """Indented JSON (human readable, largest and slowest)"""
+
+    name = "json"
+
+    def dumps(self, data):
+        data = {"format_version": FORMAT_VERSION, **data}
+        return json.dumps(data, indent=2, default=encode_record).encode('utf-8')
+
+class CompactJSONSerializer:
+    """JSON without whitespace, encoded by orjson when it is installed"""
+
+    name = "compact"
+
+    def dumps(self, data):
+        data = {"format_version": FORMAT_VERSION, **data}
+        if orjson is not None:
+            return orjson.dumps(data, default=encode_record)
+        return json.dumps(data, separators=(',', ':'), default=encode_record).encode('utf-8')
+
+class MsgpackSerializer:
+    """Binary MessagePack, prefixed with a format header"""
+
+    name = "msgpack"
+
+    def dumps(self, data):
+        header = MAGIC + bytes([FORMAT_VERSION]) + MSGPACK_ID
+        return header + msgpack.packb(data, default=encode_record, use_bin_type=True)
+
+SERIALIZERS = {
+    "json": JSONSerializer,
+    "compact": CompactJSONSerializer,
+    "msgpack": MsgpackSerializer,
+}
+
+def get_serializer(name):
+    """Get a serializer by name, falling back to compact JSON if its dependency is missing"""
+    name = name.lower()
+    if name not in SERIALIZERS:
+        raise ValueError(f"Unknown database format: {name}")
+    if name == "msgpack" and msgpack is None:
+        logging.warning('msgpack is not installed, using compact JSON for the database')
+        name = "compact"
+    return SERIALIZERS[name]()
+
+def loads(payload):
+    """Decode data written by any serializer (or a legacy JSON file), detected from its header"""
+    if payload.startswith(MAGIC):
+        version = payload[len(MAGIC)]
+        format_id = payload[len(MAGIC) + 1:len(MAGIC) + 2]
+        if version > FORMAT_VERSION:
+            raise UnsupportedFormatError(f"Database format version {version} is newer than supported ({FORMAT_VERSION})")
+        if format_id != MSGPACK_ID:
+            raise UnsupportedFormatError(f"Unknown database format id: {format_id!r}")
+        if msgpack is None:
+            raise RuntimeError("The database is stored as msgpack but msgpack is not installed")
+        return msgpack.unpackb(payload[len(MAGIC) + 2:], raw=False, strict_map_key=False)
+
+    data = orjson.loads(payload) if orjson is not None else json.loads(payload)
+    version = data.pop("format_version", 0)
+    if version > FORMAT_VERSION:
+        raise UnsupportedFormatError(f"Database format version {version} is newer than supported ({FORMAT_VERSION})")
+    return data
@@ -0,0 +1,112 @@
+import importlib.abc
+import importlib.machinery
+import os
+import re
+import subprocess
+import sys
+import time
+
+class _TimedLoader(importlib.abc.Loader):
+    """Delegates to the real loader, recording how long the module body takes to run"""
+
+    def __init__(self, loader, name, timings):
+        self.loader = loader
+        self.name = name
+        self.timings = timings
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        started = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.timings[self.name] = time.perf_counter() - started
+
+class ExtensionImportTimer(importlib.abc.MetaPathFinder):
+    """Times the import (module execution) of specific extensions
+
+    While installed, specs found for the watched names get a loader that
+    records how long executing the module took, so extension load time
+    can be split into import and setup.
+    """
+
+    def __init__(self, names):
+        self.names = set(names)
+        self.timings = {}
+
+    def find_spec(self, fullname, path=None, target=None):
+        if fullname not in self.names:
+            return None
+        spec = importlib.machinery.PathFinder.find_spec(fullname, path)
+        if spec is not None and spec.loader is not None:
+            spec.loader = _TimedLoader(spec.loader, fullname, self.timings)
+        return spec
+
+    def __enter__(self):
+        sys.meta_path.insert(0, self)
+        return self
+
+    def __exit__(self, *exc):
+        sys.meta_path.remove(self)
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+def parse_importtime(output):
+    """Build a tree from ``python -X importtime`` output
+
+    Returns root nodes as (name, self_us, cumulative_us, children).
+    Modules are reported after their children, so children are collected
+    per depth until their parent's line shows up.
+    """
+    pending = {}
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        depth = len(indent) // 2
+        node = (name, int(self_us), int(cumulative_us), pending.pop(depth + 1, []))
+        pending.setdefault(depth, []).append(node)
+    return pending.get(0, [])
+
+def format_import_tree(roots, min_ms=1.0, max_depth=6):
+    """Indented tree of imports slower than ``min_ms``, slowest first"""
+    lines = []
+
+    def walk(nodes, depth):
+        for name, self_us, cumulative_us, children in sorted(nodes, key=lambda node: -node[2]):
+            if cumulative_us / 1000 < min_ms:
+                continue
+            lines.append(f"{cumulative_us / 1000:9.1f} ms {self_us / 1000:8.1f} ms  {'  ' * depth}{name}")
+            if depth + 1 < max_depth:
+                walk(children, depth + 1)
+
+    walk(roots, 0)
+    return lines
+
+def profile_startup(modules, min_ms=1.0):
+    """Import ``modules`` in a fresh interpreter with -X importtime and print the tree"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = f"import importlib, sys\nsys.path.insert(0, {root!r})\n"
+    code += "".join(f"importlib.import_module({name!r})\n" for name in modules)
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        print(result.stderr, file=sys.stderr)
+        return result.returncode
+
+    roots = parse_importtime(result.stderr)
+    total_us = sum(node[2] for node in roots)
+    print(f"Imported {', '.join(modules)} in {total_us / 1000:.1f} ms "
+          f"(interpreter run {elapsed * 1000:.0f} ms)")
+    print(f"{'cumulative':>12} {'self':>11}  module")
+    for line in format_import_tree(roots, min_ms=min_ms):
+        print(line)
+    return 0
@@ -0,0 +1,237 @@
+import logging
+import math
+from aiohttp import web
+
+# Database stats that only ever grow; the rest (sizes, last flush time) are levels
+DB_COUNTERS = {
+    "requests", "flushes", "merged", "errors", "flush_seconds", "compactions",
+    "hits", "misses", "evictions",
+}
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+class MetricsWriter:
+    """Builds a Prometheus text-format (0.0.4) exposition
+
+    Samples are grouped per metric family, as the format requires, in the
+    order families were first used.
+    """
+
+    def __init__(self):
+        self.families = {}
+
+    def _family(self, name, kind, help_text):
+        family = self.families.get(name)
+        if family is None:
+            family = self.families[name] = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        return family
+
+    def _sample(self, family, name, value, labels):
+        if labels:
+            label_text = ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+            name = f"{name}{{{label_text}}}"
+        if isinstance(value, float) and math.isinf(value):
+            value = "+Inf" if value > 0 else "-Inf"
+        family.append(f"{name} {value}")
+
+    def gauge(self, name, value, help_text, **labels):
+        self._sample(self._family(name, "gauge", help_text), name, value, labels)
+
+    def counter(self, name, value, help_text, **labels):
+        self._sample(self._family(name, "counter", help_text), name, value, labels)
+
+    def summary(self, name, histogram, help_text, **labels):
+        """Export a metrics.Histogram as a summary (p50/p95/p99, sum, count)"""
+        family = self._family(name, "summary", help_text)
+        for quantile in (50, 95, 99):
+            self._sample(family, name, histogram.percentile(quantile), dict(labels, quantile=str(quantile / 100)))
+        self._sample(family, f"{name}_sum", histogram.total, labels)
+        self._sample(family, f"{name}_count", histogram.count, labels)
+
+    def render(self):
+        return "\n".join(line for family in self.families.values() for line in family) + "\n"
+
+class StatusServer:
+    """Small local HTTP server for health checks and Prometheus scraping
+
+    GET /healthz returns 200 once the bot is connected and the event loop
+    is responsive (503 otherwise); GET /metrics returns Prometheus text.
+    Everything is read from the bot on request, so the server only needs
+    a bot-like object and can be exercised offline against localhost.
+    """
+
+    def __init__(self, bot, host="127.0.0.1", port=8080, max_loop_lag=5.0):
+        self.bot = bot
+        self.host = host
+        self.port = port
+        self.max_loop_lag = max_loop_lag
+        self.runner = None
+
+        self.app = web.Application()
+        self.app.router.add_get("/healthz", self.healthz)
+        self.app.router.add_get("/metrics", self.metrics)
+
+    async def start(self):
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        logging.info(f'Status server listening on http://{self.host}:{self.port}')
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    def _loop_lag(self):
+        monitor = getattr(self.bot, "loop_lag", None)
+        return monitor.last if monitor is not None else 0.0
+
+    async def healthz(self, request):
+        ready = self.bot.is_ready() and not self.bot.is_closed()
+        latency = self.bot.latency
+        loop_lag = self._loop_lag()
+
+        problems = []
+        if not ready:
+            problems.append("not connected")
+        if math.isinf(latency) or math.isnan(latency):
+            problems.append("no heartbeat")
+        if loop_lag > self.max_loop_lag:
+            problems.append("event loop stalled")
+
+        body = {
+            "status": "ok" if not problems else "unhealthy",
+            "problems": problems,
+            "ready": ready,
+            "latency_ms": round(latency * 1000, 1) if math.isfinite(latency) else None,
+            "loop_lag_ms": round(loop_lag * 1000, 1),
+            "guilds": len(self.bot.guilds),
+        }
+        return web.json_response(body, status=200 if not problems else 503)
+
+    async def metrics(self, request):
+        writer = MetricsWriter()
+        try:
+            self.collect(writer)
+        except Exception as e:
+            logging.error(f'Error collecting metrics: {e}')
+            return web.Response(status=500, text="error collecting metrics\n")
+        return web.Response(text=writer.render(), content_type="text/plain", charset="utf-8")
+
+    def collect(self, writer):
+        """Gather every metric from the bot into ``writer``"""
+        bot = self.bot
+
+        latency = bot.latency
+        if math.isfinite(latency):
+            writer.gauge("bot_gateway_latency_seconds", latency, "Discord gateway heartbeat latency")
+        writer.gauge("bot_up", int(bot.is_ready() and not bot.is_closed()), "Whether the bot is connected")
+        writer.gauge("bot_guilds", len(bot.guilds), "Guilds the bot is in")
+
+        monitor = getattr(bot, "loop_lag", None)
+        if monitor is not None:
+            writer.gauge("bot_event_loop_lag_seconds", monitor.last, "Most recent event loop lag")
+            writer.gauge("bot_event_loop_lag_max_seconds", monitor.max, "Largest event loop lag seen")
+            writer.summary("bot_event_loop_lag", monitor.lag, "Event loop lag distribution (seconds)")
+
+        watchdog = getattr(bot, "watchdog", None)
+        if watchdog is not None:
+            writer.gauge("bot_watchdog_enabled", int(watchdog.enabled), "Whether the loop stall watchdog is running")
+            writer.counter("bot_loop_stalls_total", watchdog.stalls, "Event loop stalls over the watchdog threshold")
+            writer.gauge("bot_loop_stall_longest_seconds", watchdog.longest, "Longest event loop stall seen")
+
+        prefixes = getattr(bot, "prefixes", None)
+        if prefixes is not None:
+            for result in ("accepted", "rejected"):
+                writer.counter("bot_messages_total", prefixes.stats[result],
+                               "Messages received, by pre-filter result", result=result)
+
+        metrics = getattr(bot, "metrics", None)
+        if metrics is not None:
+            for name, stats in sorted(metrics.commands.items()):
+                writer.counter("bot_command_calls_total", stats.wall.count, "Commands run", command=name)
+                writer.counter("bot_command_errors_total", stats.errors,
+                               "Commands that failed (not counting cooldowns, failed checks or bad input)",
+                               command=name)
+                writer.summary("bot_command_duration_seconds", stats.wall, "Command wall time", command=name)
+                writer.summary("bot_command_db_seconds", stats.db, "Command time awaiting the database", command=name)
+                writer.summary("bot_command_http_seconds", stats.http, "Command time in outbound HTTP", command=name)
+
+            for service, stats in sorted(metrics.http.items()):
+                writer.counter("bot_http_requests_total", stats.requests, "Outbound HTTP requests", service=service)
+                writer.counter("bot_http_errors_total", stats.errors,
+                               "Outbound HTTP requests that failed, were throttled or got a 5xx", service=service)
+                for status, count in sorted(stats.statuses.items()):
+                    writer.counter("bot_http_responses_total", count, "Outbound HTTP responses by status",
+                                   service=service, status=status)
+                writer.summary("bot_http_request_seconds", stats.latency, "Outbound HTTP request latency",
+                               service=service)
+
+        sampler = getattr(bot, "log_sampler", None)
+        if sampler is not None:
+            for category, count in sorted(sampler.dropped.items()):
+                writer.counter("bot_log_lines_dropped_total", count,
+                               "Log lines sampled out or rate limited", category=category)
+
+        router = getattr(bot, "router", None)
+        if router is not None:
+            writer.gauge("bot_ui_sessions", len(router.sessions), "Live paginator and confirmation sessions")
+            for event in ("expired", "evicted"):
+                writer.counter("bot_ui_sessions_closed_total", router.stats[event],
+                               "Sessions that timed out or were evicted to stay under the limit", reason=event)
+
+        db = getattr(bot, "db", None)
+        if db is not None:
+            for key, value in sorted(db.stats.items()):
+                if not isinstance(value, (int, float)):
+                    continue
+                if key in DB_COUNTERS:
+                    writer.counter(f"bot_db_{key}_total", value, f"Database {key.replace('_', ' ')} since start-up")
+                else:
+                    writer.gauge(f"bot_db_{key}", value, f"Database {key.replace('_', ' ')}")
+
+        writer.gauge("bot_voice_sessions", len(bot.voice_clients), "Connected voice clients")
+        music = bot.get_cog("Music")
+        if music is not None:
+            writer.gauge("bot_music_queued_songs", sum(len(queue.songs) for queue in music.queues.values()),
+                         "Songs waiting in all music queues")
+            writer.gauge("bot_music_queues", len(music.queues), "Guilds with a music queue")
+
+        manga = bot.get_cog("Manga")
+        if manga is not None:
+            cache = manga.search_cache
+            for result in ("hits", "stale_hits", "negative_hits", "misses"):
+                writer.counter("bot_manga_cache_lookups_total", cache.stats[result],
+                               "MangaDex search cache lookups, by result", result=result)
+            writer.counter("bot_manga_cache_refreshes_total", cache.stats["refreshes"],
+                           "Stale MangaDex search results refreshed in the background")
+            writer.counter("bot_manga_cache_evictions_total", cache.stats["evictions"],
+                           "MangaDex search results evicted to stay under the memory bound")
+            writer.counter("bot_manga_requests_coalesced_total", cache.flights.stats["shared"],
+                           "MangaDex lookups that joined an identical request already in flight")
+            api = manga.api
+            writer.counter("bot_mangadex_retries_total", api.stats["retries"],
+                           "MangaDex requests retried after a 429, 5xx or network error")
+            writer.counter("bot_mangadex_rate_limited_total", api.stats["rate_limited"],
+                           "MangaDex responses with HTTP 429")
+            writer.counter("bot_mangadex_short_circuited_total", api.stats["short_circuited"],
+                           "MangaDex requests refused because the circuit breaker was open")
+            writer.gauge("bot_mangadex_circuit_open", int(api.breaker.state != "closed"),
+                         "1 while the MangaDex circuit breaker is open or half-open")
+            pool = manga.random_pool
+            writer.gauge("bot_manga_random_pool_size", len(pool), "Prefetched random manga ready to serve")
+            writer.counter("bot_manga_random_served_total", pool.stats["served"], "Random manga served")
+            writer.counter("bot_manga_random_waited_total", pool.stats["waited"],
+                           "Random manga requests that found the pool empty and waited for a refill")
+            writer.counter("bot_manga_random_refills_total", pool.stats["refills"],
+                           "Batched requests made to refill the random manga pool")
+            if manga.index is not None:
+                writer.gauge("bot_manga_index_titles", manga.index.stats["titles"], "Titles in the local manga index")
+                writer.counter("bot_manga_index_searches_total", manga.index.stats["searches"],
+                               "Manga searches answered from the local index")
+                writer.counter("bot_manga_index_fuzzy_searches_total", manga.index.stats["fuzzy_searches"],
+                               "Local manga searches that fell back to fuzzy matching")
+            writer.gauge("bot_manga_cache_entries", len(cache), "Cached MangaDex searches")
+            writer.gauge("bot_manga_cache_bytes", cache.bytes, "Approximate size of cached MangaDex searches")
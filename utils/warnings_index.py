@@ -0,0 +1,185 @@
+import heapq
+from bisect import bisect_left, bisect_right
+from utils.records import WarningEntry
+
+class UserWarnings:
+    """One member's warnings in time order, with a parallel timestamp list for bisecting"""
+
+    __slots__ = ("timestamps", "entries")
+
+    def __init__(self):
+        self.timestamps = []
+        self.entries = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def append(self, entry):
+        """Add a warning, keeping time order"""
+        timestamp = entry.timestamp
+        if not self.timestamps or timestamp >= self.timestamps[-1]:
+            self.timestamps.append(timestamp)
+            self.entries.append(entry)
+        else:
+            index = bisect_right(self.timestamps, timestamp)
+            self.timestamps.insert(index, timestamp)
+            self.entries.insert(index, entry)
+
+    def discard(self, entry):
+        """Remove a specific warning (matched by identity)"""
+        for index in range(len(self.entries) - 1, -1, -1):
+            if self.entries[index] is entry:
+                del self.entries[index]
+                del self.timestamps[index]
+                return True
+        return False
+
+    def last(self, limit):
+        """The most recent ``limit`` warnings, oldest first"""
+        if limit <= 0:
+            return []
+        return self.entries[-limit:]
+
+    def newest(self, offset, limit):
+        """``limit`` warnings, newest first, skipping the ``offset`` newest"""
+        end = len(self.entries) - offset
+        if limit <= 0 or end <= 0:
+            return []
+        return self.entries[max(end - limit, 0):end][::-1]
+
+    def since(self, start):
+        """Warnings issued at or after ``start``"""
+        return self.entries[bisect_left(self.timestamps, start):]
+
+    def count(self, start=None, end=None):
+        """Number of warnings in [start, end)"""
+        if start is None and end is None:
+            return len(self.entries)
+        low = 0 if start is None else bisect_left(self.timestamps, start)
+        high = len(self.timestamps) if end is None else bisect_left(self.timestamps, end)
+        return max(high - low, 0)
+
+class GuildWarnings:
+    """Warnings of one guild, keyed by user id"""
+
+    __slots__ = ("users",)
+
+    def __init__(self):
+        self.users = {}
+
+    def __len__(self):
+        return len(self.users)
+
+    def add(self, user_id, entry):
+        """Add a warning and return the member's warning count"""
+        warnings = self.users.get(user_id)
+        if warnings is None:
+            warnings = self.users[user_id] = UserWarnings()
+        warnings.append(entry)
+        return len(warnings)
+
+    def get(self, user_id):
+        return self.users.get(user_id)
+
+    def clear(self, user_id):
+        """Remove and return a member's warnings"""
+        return self.users.pop(user_id, None)
+
+    def discard(self, user_id, entry):
+        """Remove a single warning, dropping the member once they have none left"""
+        warnings = self.users.get(user_id)
+        if warnings is None or not warnings.discard(entry):
+            return False
+        if not warnings:
+            del self.users[user_id]
+        return True
+
+    def restore(self, user_id, warnings):
+        """Put back warnings previously returned by clear()"""
+        self.users[user_id] = warnings
+
+    def top_offenders(self, limit=10, start=None, end=None):
+        """Members with the most warnings as (user_id, count), highest first"""
+        counts = (
+            (user_id, warnings.count(start, end))
+            for user_id, warnings in self.users.items()
+        )
+        return [
+            (user_id, count)
+            for user_id, count in heapq.nlargest(limit, counts, key=lambda item: item[1])
+            if count
+        ]
+
+    def to_dict(self):
+        """Copy as {user_id: [WarningEntry, ...]} (serialize with records.encode_record)"""
+        return {user_id: list(warnings.entries) for user_id, warnings in self.users.items()}
+
+    @classmethod
+    def from_dict(cls, data):
+        guild = cls()
+        for user_id, entries in data.items():
+            for entry in entries:
+                guild.add(user_id, WarningEntry.from_dict(entry))
+        return guild
+
+class WarningsIndex:
+    """Warnings indexed per guild, then per user"""
+
+    __slots__ = ("guilds",)
+
+    def __init__(self):
+        self.guilds = {}
+
+    def guild(self, guild_id, create=False):
+        guild = self.guilds.get(guild_id)
+        if guild is None and create:
+            guild = self.guilds[guild_id] = GuildWarnings()
+        return guild
+
+    def user(self, guild_id, user_id):
+        guild = self.guilds.get(guild_id)
+        return guild.get(user_id) if guild else None
+
+    def add(self, guild_id, user_id, entry):
+        """Add a warning and return the member's warning count"""
+        return self.guild(guild_id, create=True).add(user_id, entry)
+
+    def clear(self, guild_id, user_id):
+        """Remove and return a member's warnings"""
+        guild = self.guilds.get(guild_id)
+        if guild is None:
+            return None
+        removed = guild.clear(user_id)
+        if not guild:
+            del self.guilds[guild_id]
+        return removed
+
+    def discard(self, guild_id, user_id, entry):
+        """Remove a single warning"""
+        guild = self.guilds.get(guild_id)
+        if guild is None or not guild.discard(user_id, entry):
+            return False
+        if not guild:
+            del self.guilds[guild_id]
+        return True
+
+    def restore(self, guild_id, user_id, warnings):
+        """Put back warnings previously returned by clear()"""
+        self.guild(guild_id, create=True).restore(user_id, warnings)
+
+    def to_dict(self):
+        """Copy in the flat {"<guild_id>_<user_id>": [WarningEntry, ...]} layout"""
+        return {
+            f"{guild_id}_{user_id}": list(warnings.entries)
+            for guild_id, guild in self.guilds.items()
+            for user_id, warnings in guild.users.items()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls()
+        for key, entries in data.items():
+            guild_id, user_id = key.split("_", 1)
+            for entry in entries:
+                index.add(guild_id, user_id, WarningEntry.from_dict(entry))
+        return index
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+class LoopWatchdog:
+    """Detects event loop stalls from a separate thread and reports where the loop is stuck
+
+    The loop bumps a heartbeat every ``interval`` seconds. The watchdog
+    thread checks it on the same schedule; once the heartbeat is more
+    than ``threshold`` seconds late it grabs the loop thread's current
+    stack, plus the log context (guild/command) of the task that is
+    running, and logs it. Recovery is logged with the stall's duration.
+    """
+
+    def __init__(self, threshold=0.5, interval=0.1, history=20):
+        self.threshold = threshold
+        self.interval = interval
+
+        self.stalls = 0
+        self.longest = 0.0
+        self.recent = deque(maxlen=history)
+
+        self.loop = None
+        self._loop_thread_id = None
+        self._last_beat = 0.0
+        self._handle = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._current = None
+
+    @property
+    def enabled(self):
+        return self._thread is not None
+
+    def start(self):
+        """Start watching the running loop (call from the loop thread)"""
+        if self.enabled:
+            return
+        self.loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._current = None
+        self._beat()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching (call from the loop thread)"""
+        if not self.enabled:
+            return
+        self._stop.set()
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._thread.join()
+        self._thread = None
+
+    def _beat(self):
+        self._last_beat = time.monotonic()
+        if not self._stop.is_set():
+            self._handle = self.loop.call_later(self.interval, self._beat)
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            late = time.monotonic() - self._last_beat - self.interval
+            if late > self.threshold:
+                if self._current is None:
+                    self._current = self._capture(late)
+            elif self._current is not None:
+                self._recovered()
+
+    def _capture(self, late):
+        """Record what the loop thread is doing right now"""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.extract_stack(frame) if frame is not None else []
+        location = f"{stack[-1].filename}:{stack[-1].lineno} in {stack[-1].name}" if stack else "unknown"
+
+        task = asyncio.current_task(self.loop)
+        task_name = task.get_name() if task is not None else None
+        # Set by utils.logs.set_log_context for the task being handled
+        context = getattr(task, "log_context", None)
+
+        stall = {
+            "started": time.time() - late - self.interval,
+            "duration": None,
+            "location": location,
+            "task": task_name,
+            "context": context,
+        }
+        self.stalls += 1
+        self.recent.append(stall)
+
+        logging.warning(
+            f'Event loop stalled for {late:.2f}s at {location} (task: {task_name})\n'
+            + "".join(traceback.format_list(stack)).rstrip(),
+            extra={"category": "loop_stall", "context": context}
+        )
+        return stall
+
+    def _recovered(self):
+        stall = self._current
+        self._current = None
+        stall["duration"] = time.time() - stall["started"]
+        self.longest = max(self.longest, stall["duration"])
+        logging.warning(
+            f'Event loop recovered after {stall["duration"]:.2f}s (stalled at {stall["location"]})',
+            extra={"category": "loop_stall", "context": stall["context"]}
+        )